@@ -0,0 +1,188 @@
+"""
+批量分析多个同人圈（非交互）。
+
+用法（在 RateYourFandom 目录下）:
+    python batch.py URL1 URL2 ...
+    python batch.py --file tags.txt --output-root ao3_batch --rate 0.5
+
+tags.txt 每行一个标签页地址，空行和 # 开头的行忽略。
+每个任务有自己的目录 <output-root>/<标签名>/，其中 html/ 为下载的页面，csv/ 为报表。
+所有任务共享一个令牌桶（全局限速）和一个抓取器池；一个任务下载完后，
+它的解析和导出在后台进行，同时下一个任务已经开始下载。
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import contextlib
+import threading
+import logging
+from urllib.parse import urlsplit, unquote
+from concurrent.futures import ThreadPoolExecutor
+
+from download.downloader import download_ao3_pages
+from download.fetcher import FetcherPool
+from parser_folder.analyzer import analyze_folder
+from output.csv_writer import write_csv
+from utils.file_utils import ensure_folder
+from utils.rate_limiter import TokenBucket
+from utils.metrics import METRICS
+from utils.log import setup_logging, add_log_level_argument
+from utils.profiling import PROFILER, add_profile_argument, profile_modes
+
+logger = logging.getLogger(__name__)
+
+
+def read_tag_urls(urls, file_path=None):
+    """合并命令行和文件中的地址，去重并保持顺序"""
+    all_urls = list(urls)
+    if file_path:
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    all_urls.append(line)
+    return list(dict.fromkeys(all_urls))
+
+
+def job_name(tag_url):
+    """由标签页地址得到目录名：/tags/Harry%20Potter/works -> Harry Potter"""
+    path = unquote(urlsplit(tag_url).path)
+    m = re.search(r"/tags/([^/]+)", path)
+    name = m.group(1) if m else path.strip("/") or "job"
+    # AO3 标签名中的 *s* 表示 /，Windows 不允许的字符一律替换成 _
+    name = name.replace("*s*", "／")
+    return re.sub(r'[\\/:*?"<>|]+', "_", name).strip(" .") or "job"
+
+
+def job_folders(output_root, tag_url, used):
+    name = job_name(tag_url)
+    # 不同地址得到同一个名字时加序号，避免互相覆盖
+    unique = name
+    index = 2
+    while unique in used:
+        unique = f"{name}_{index}"
+        index += 1
+    used.add(unique)
+    root = os.path.join(output_root, unique)
+    return root, os.path.join(root, "html"), os.path.join(root, "csv")
+
+
+def run_batch(tag_urls, output_root="ao3_batch", backend="selenium", workers=2, rate=0.5,
+              parallel_jobs=1, analysis_workers=1, download_options=None, db_path=None):
+    """
+    依次（或 parallel_jobs 个并行）下载各标签，下载完的任务交给后台线程解析和导出。
+    返回每个任务的结果列表，并写出 <output-root>/batch_summary.json。
+    """
+    ensure_folder(output_root)
+    download_options = download_options or {}
+    pool = FetcherPool(backend, size=workers)
+    limiter = TokenBucket(rate=rate, burst=workers)
+    used_names = set()
+    results = []
+    results_lock = threading.Lock()
+    # SQLite 同一时间只允许一个写入者：写作品库时各任务的分析依次进行，避免 "database is locked"
+    db_lock = threading.Lock() if db_path else contextlib.nullcontext()
+
+    def analyze_job(result, html_folder, csv_folder):
+        started = time.time()
+        try:
+            with db_lock:
+                stats = analyze_folder(html_folder, db_path=db_path)
+            write_csv(stats, csv_folder)
+            result["status"] = "ok"
+        except Exception as e:
+            logger.error(f"[{result['name']}] 分析失败: {e}")
+            result["status"] = "analyze_failed"
+            result["error"] = str(e)
+        result["analyze_seconds"] = round(time.time() - started, 1)
+
+    def download_job(tag_url, analysis_executor, analysis_futures):
+        with results_lock:
+            job_root, html_folder, csv_folder = job_folders(output_root, tag_url, used_names)
+            result = {"tag_url": tag_url, "name": os.path.basename(job_root), "folder": job_root}
+            results.append(result)
+        logger.info(f"[{result['name']}] 开始下载")
+        started = time.time()
+        try:
+            info = download_ao3_pages(tag_url, html_folder, workers=workers, backend=backend,
+                                      pool=pool, limiter=limiter, **download_options)
+            result["downloaded_pages"] = info.get("downloaded_pages")
+        except Exception as e:
+            logger.error(f"[{result['name']}] 下载失败: {e}")
+            result["status"] = "download_failed"
+            result["error"] = str(e)
+            return
+        finally:
+            result["download_seconds"] = round(time.time() - started, 1)
+        # 解析导出不占用抓取器，交给后台线程，下载线程立即去做下一个任务
+        analysis_futures.append(analysis_executor.submit(analyze_job, result, html_folder, csv_folder))
+
+    analysis_futures = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, analysis_workers)) as analysis_executor:
+            with ThreadPoolExecutor(max_workers=max(1, parallel_jobs)) as download_executor:
+                futures = [download_executor.submit(download_job, tag_url, analysis_executor, analysis_futures)
+                           for tag_url in tag_urls]
+                for future in futures:
+                    future.result()
+            for future in list(analysis_futures):
+                future.result()
+    finally:
+        pool.close()
+        with open(os.path.join(output_root, "batch_summary.json"), "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    failed = [result for result in results if result.get("status") != "ok"]
+    logger.info(f"批量任务完成: {len(results) - len(failed)}/{len(results)} 个成功")
+    for result in failed:
+        logger.warning(f"  失败: {result['tag_url']}（{result.get('status')}: {result.get('error', '')}）")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量分析多个 AO3 标签（非交互）")
+    parser.add_argument("urls", nargs="*", help="标签页地址")
+    parser.add_argument("--file", help="地址列表文件，每行一个")
+    parser.add_argument("--output-root", default="ao3_batch", help="输出根目录，每个标签一个子目录")
+    parser.add_argument("--backend", default="selenium", help="抓取后端（selenium / http）")
+    parser.add_argument("--workers", type=int, default=2, help="抓取器池大小，所有任务共享")
+    parser.add_argument("--rate", type=float, default=0.5, help="全局限速，每秒请求数，所有任务共享")
+    parser.add_argument("--parallel-jobs", type=int, default=1, help="同时下载的任务数")
+    parser.add_argument("--analysis-workers", type=int, default=1, help="同时解析导出的任务数")
+    parser.add_argument("--sampling", default="uniform", choices=("uniform", "adaptive", "stratified"))
+    parser.add_argument("--storage", default="gzip", choices=("gzip", "zstd", "raw"), help="页面保存格式")
+    parser.add_argument("--db", default=None, help="同时写入的 SQLite 作品库路径（各任务的分析会依次进行）")
+    parser.add_argument("--prom-file", default=None,
+                        help="Prometheus 文本文件路径（例如 node_exporter 的 textfile 目录），默认写在输出目录")
+    add_log_level_argument(parser)
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+    setup_logging(args.log_level)
+    METRICS.reset()
+
+    tag_urls = read_tag_urls(args.urls, args.file)
+    if not tag_urls:
+        parser.error("没有要处理的标签页地址")
+    if profile_modes(args):
+        # 所有任务的同名阶段合并记录
+        PROFILER.start(os.path.join(args.output_root, "profile"), profile_modes(args))
+    try:
+        results = run_batch(tag_urls, args.output_root, backend=args.backend, workers=args.workers,
+                            rate=args.rate, parallel_jobs=args.parallel_jobs,
+                            analysis_workers=args.analysis_workers,
+                            download_options={"sampling": args.sampling, "storage": args.storage},
+                            db_path=args.db)
+    finally:
+        PROFILER.stop()
+    # 所有任务共用一份指标：抓取预算和进程内存本来就是共享的
+    METRICS.write_report(args.output_root, labels={"entry": "batch"}, prom_path=args.prom_file,
+                         extra={"jobs": len(results),
+                                "failed_jobs": sum(1 for result in results if result.get("status") != "ok")})
+    return 0 if all(result.get("status") == "ok" for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
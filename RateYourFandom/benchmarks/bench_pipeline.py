@@ -0,0 +1,186 @@
+"""
+端到端基准：合成的 AO3 列表页 -> 解析 -> 汇总统计 -> 标签统计 -> 导出报表。
+
+用法（在 RateYourFandom 目录下）:
+    python -m benchmarks.bench_pipeline [--sizes 1000 10000 100000 1000000] [--workers 1]
+        [--baseline bench_baseline.json] [--save-baseline] [--tolerance 0.2]
+        [--works-per-page 20 --tags-per-work 8 --vocab-size 5000 --zipf-s 1.1 --years 2009-2024]
+
+合成页面（见 benchmarks.synthetic_ao3）缓存在 --data-dir 中，参数不变时不会重新生成。
+每个规模在单独的子进程里测量，峰值内存互不影响。各阶段:
+  parse          extract_works_data 解析页面（--workers 1 时为纯解析时间，多进程时为等待解析结果的时间）
+  aggregate      WorkAggregator 逐个作品汇总并生成 stats
+  tag_statistics analyze_characters_relationships_fandoms 对全部作品重新计数
+  export         write_csv 写出全部报表
+与基准文件比较时，任何阶段耗时或峰值内存超出基准 tolerance 以上（且差值大于噪声下限）即视为退化，返回非零退出码。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+
+from benchmarks.synthetic_ao3 import write_pages, add_generator_arguments, generator_options
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+STAGES = ("parse", "aggregate", "tag_statistics", "export")
+DEFAULT_BASELINE = "bench_baseline.json"
+# 短于这个差值的耗时变化视为测量噪声
+NOISE_FLOOR_SECONDS = 0.05
+NOISE_FLOOR_BYTES = 16 * 1024 * 1024
+
+
+def measure(folder, workers=1, parser_backend=None):
+    """在当前进程中测量一个数据目录，返回结果 dict（只应在新进程中调用一次，峰值内存才有意义）"""
+    from parser_folder.analyzer import analyze_folder
+    from parser_folder.tag_statistics import analyze_characters_relationships_fandoms
+    from output.csv_writer import write_csv
+    from utils.metrics import METRICS, peak_rss_bytes
+    from utils.page_storage import list_pages, find_page_file
+
+    METRICS.reset()
+    start = time.perf_counter()
+    stats = analyze_folder(folder, workers=workers, parser_backend=parser_backend, use_cache=False)
+    tag_start = time.perf_counter()
+    analyze_characters_relationships_fandoms(stats["works"], stats["download_info"], stats["filter_stats"])
+    tag_seconds = time.perf_counter() - tag_start
+    with tempfile.TemporaryDirectory() as output_folder:
+        write_csv(stats, output_folder)
+    total = time.perf_counter() - start
+
+    snapshot = METRICS.snapshot()
+    seconds = {stage: snapshot["stages"][stage]["seconds"] for stage in ("parse", "aggregate", "export")}
+    seconds["tag_statistics"] = round(tag_seconds, 3)
+    seconds["total"] = round(total, 3)
+    works = snapshot["counters"]["works_parsed"]
+    pages = list_pages(folder)
+    input_bytes = sum(os.path.getsize(find_page_file(folder, name)) for name in pages)
+    return {
+        "works": works,
+        "pages": len(pages),
+        "input_bytes": input_bytes,
+        "seconds": seconds,
+        "works_per_second": {stage: round(works / value) if value else None for stage, value in seconds.items()},
+        "peak_rss_bytes": peak_rss_bytes(),
+        "children_peak_rss_bytes": peak_rss_bytes(children=True),
+    }
+
+
+def run_size(folder, workers, parser_backend):
+    """在子进程中测量，返回结果 dict"""
+    command = [sys.executable, "-m", "benchmarks.bench_pipeline", "--child", folder, "--workers", str(workers)]
+    if parser_backend:
+        command += ["--parser", parser_backend]
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run(command, cwd=root, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(f"测量 {folder} 失败:\n{out.stderr}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def compare(current, baseline, tolerance):
+    """返回退化项列表 [(规模, 指标, 当前值, 基准值)]"""
+    regressions = []
+    for size, result in current.items():
+        base = baseline.get(size)
+        if not base:
+            continue
+        for stage in STAGES:
+            now, before = result["seconds"].get(stage), base["seconds"].get(stage)
+            if now is None or not before:
+                continue
+            if now > before * (1 + tolerance) and now - before > NOISE_FLOOR_SECONDS:
+                regressions.append((size, stage, now, before))
+        now, before = result.get("peak_rss_bytes"), base.get("peak_rss_bytes")
+        if now and before and now > before * (1 + tolerance) and now - before > NOISE_FLOOR_BYTES:
+            regressions.append((size, "peak_rss_bytes", now, before))
+    return regressions
+
+
+def _change(now, before):
+    if not before:
+        return ""
+    return f"{(now - before) / before:+.0%}"
+
+
+def print_results(results, baseline):
+    print(f"{'作品数':>9} {'页数':>6} {'解析(s)':>9} {'汇总(s)':>9} {'标签统计(s)':>11} {'导出(s)':>9} "
+          f"{'总计(s)':>9} {'作品/秒':>9} {'峰值内存(MB)':>12}")
+    for size, result in results.items():
+        seconds = result["seconds"]
+        rss = (result["peak_rss_bytes"] or 0) / 1024 / 1024
+        print(f"{result['works']:>9} {result['pages']:>6} {seconds['parse']:>9.2f} {seconds['aggregate']:>9.2f} "
+              f"{seconds['tag_statistics']:>11.2f} {seconds['export']:>9.2f} {seconds['total']:>9.2f} "
+              f"{result['works_per_second']['total'] or 0:>9} {rss:>12.1f}")
+        base = baseline.get(size)
+        if base:
+            changes = [f"{stage} {_change(seconds[stage], base['seconds'].get(stage))}" for stage in STAGES]
+            changes.append(f"内存 {_change(result['peak_rss_bytes'] or 0, base.get('peak_rss_bytes'))}")
+            print(f"{'':>9} 相对基准: {', '.join(changes)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="解析 / 统计 / 导出的端到端基准测试（合成数据）")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="作品数")
+    parser.add_argument("--workers", type=int, default=1, help="解析进程数；1 表示串行，测的是纯解析时间")
+    parser.add_argument("--parser", default=None, help="解析后端，默认自动选择")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "ryf_bench_data"),
+                        help="合成页面的缓存目录")
+    parser.add_argument("--storage", default="gzip", choices=("raw", "gzip", "zstd"), help="合成页面的保存格式")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基准结果文件")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果写入基准文件")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的相对退化幅度")
+    parser.add_argument("--output", default=None, help="本次结果另存为 JSON")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    add_generator_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.workers, args.parser)))
+        return 0
+
+    options = generator_options(args)
+    config = dict(options, years=list(options["years"]), workers=args.workers, parser=args.parser,
+                  storage=args.storage)
+    results = {}
+    for size in args.sizes:
+        folder = os.path.join(args.data_dir, f"works_{size}_{args.storage}")
+        start = time.perf_counter()
+        write_pages(folder, size, args.storage, **options)
+        print(f"准备 {size} 个作品的合成页面: {time.perf_counter() - start:.1f}s（{folder}）")
+        results[str(size)] = run_size(folder, args.workers, args.parser)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get("config") == config:
+            baseline = saved.get("results", {})
+        else:
+            print(f"基准文件 {args.baseline} 的参数与本次不同，不做比较")
+
+    print_results(results, baseline)
+    report = {"config": config, "python": platform.python_version(), "machine": platform.machine(),
+              "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    regressions = compare(results, baseline, args.tolerance)
+    for size, metric, now, before in regressions:
+        print(f"退化: {size} 个作品 {metric} {before} -> {now}（{_change(now, before)}）")
+
+    if args.save_baseline:
+        # 只更新本次测过的规模，其他规模的基准保留
+        merged = dict(baseline, **results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(dict(report, results=merged), f, indent=2)
+        print(f"已写入基准 {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+启动开销预算：测量各入口模块的导入耗时，并检查分析入口没有导入抓取或导出用的重量级依赖。
+
+用法（在 RateYourFandom 目录下）:
+    python -m benchmarks.bench_startup [--runs 7] [--budget-ms 80]
+每个入口在新的解释器里导入 runs 次，取导入耗时的中位数（不含解释器本身的启动）。
+report 超出预算或导入了 HEAVY_MODULES 中的模块时返回非零退出码，可以直接放进 CI。
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# 只分析已下载目录的命令在导入时不应碰到的模块
+HEAVY_MODULES = ("selenium", "bs4", "pandas", "numpy", "requests", "lxml", "pyarrow")
+# (入口模块, 是否受预算约束)
+ENTRY_POINTS = (("report", True), ("output.work_db", True), ("main", False), ("batch", False))
+DEFAULT_BUDGET_MS = 80
+
+_PROBE = """
+import sys, json, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "modules": sorted(m for m in {heavy!r} if m in sys.modules)}}))
+"""
+
+
+def measure(module, runs):
+    """在新的解释器中导入 runs 次，返回 (中位数毫秒, 导入的重量级模块)"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = _PROBE.format(module=module, heavy=HEAVY_MODULES)
+    timings = []
+    loaded = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True)
+        if out.returncode != 0:
+            # 依赖没装时（例如没有 selenium）记为不可导入，不算超预算
+            return None, out.stderr.strip().splitlines()[-1:]
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        timings.append(result["ms"])
+        loaded = result["modules"]
+    return statistics.median(timings), loaded
+
+
+def run(runs=7, budget_ms=DEFAULT_BUDGET_MS):
+    print(f"{'入口':<16} {'导入耗时(ms)':>12} {'预算(ms)':>9}  重量级模块")
+    failed = False
+    for module, budgeted in ENTRY_POINTS:
+        ms, loaded = measure(module, runs)
+        if ms is None:
+            print(f"{module:<16} {'无法导入':>12} {'':>9}  {' '.join(loaded)}")
+            failed = failed or budgeted
+            continue
+        over = budgeted and (ms > budget_ms or bool(loaded))
+        failed = failed or over
+        budget = f"{budget_ms}" if budgeted else "-"
+        print(f"{module:<16} {ms:>12.1f} {budget:>9}  {', '.join(loaded) or '无'}{'  超出预算' if over else ''}")
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="测量各入口的导入耗时")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    args = parser.parse_args(argv)
+    return 1 if run(args.runs, args.budget_ms) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+角色 / 关系 / 同人圈计数的基准测试：逐个作品计数 vs numpy 批量计数。
+
+用法（在 RateYourFandom 目录下）:
+    python -m benchmarks.bench_tag_counting [作品数 ...]
+默认依次测试 10k、100k、1M 个作品，并检查两种实现结果完全一致。
+"""
+import io
+import sys
+import time
+import random
+import contextlib
+
+from parser_folder.tag_statistics import analyze_characters_relationships_fandoms
+from parser_folder.work_store import WorkStore
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+
+def synthetic_works(n, vocab_size=5000, seed=0):
+    """按 Zipf 分布抽取标签的合成作品（只填计数用到的字段）"""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(vocab_size)]
+    characters = [f"Character {i}" for i in range(vocab_size)]
+    relationships = [f"Character {i}/Character {i + 1}" for i in range(vocab_size)]
+    fandoms = [f"Fandom {i}" for i in range(50)]
+    works = []
+    for _ in range(n):
+        works.append({
+            "year": str(rng.randint(2009, 2024)),
+            "characters": rng.choices(characters, weights, k=rng.randint(1, 6)),
+            "relationships": rng.choices(relationships, weights, k=rng.randint(0, 3)),
+            "fandoms": rng.choices(fandoms, weights[:50], k=rng.randint(1, 2)),
+            "warnings": [], "categories": [], "freeforms": [],
+            "words": 0, "kudos": 0, "hits": 0, "bookmarks": 0, "comments": 0,
+            "source_file": "page_1.html", "title": "", "author": "", "url": "",
+            "rating": "", "chapters": "1/1",
+        })
+    return works
+
+
+def _timed(func, *args, **kwargs):
+    # 屏蔽计数函数自身的进度输出
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        return result, time.perf_counter() - start
+
+
+def run(sizes=DEFAULT_SIZES):
+    print(f"{'作品数':>10} {'逐个计数(s)':>12} {'批量-dict(s)':>13} {'批量-列存(s)':>13} {'加速比':>8}")
+    for n in sizes:
+        works = synthetic_works(n)
+        store = WorkStore(works)
+        expected, t_python = _timed(analyze_characters_relationships_fandoms, works, engine='python')
+        from_dicts, t_dicts = _timed(analyze_characters_relationships_fandoms, works, engine='vectorized')
+        from_store, t_store = _timed(analyze_characters_relationships_fandoms, store, engine='vectorized')
+        for result in (from_dicts, from_store):
+            for key in ('characters', 'relationships', 'fandoms', 'yearly_stats'):
+                if result[key] != expected[key]:
+                    raise AssertionError(f"{n} 个作品时 {key} 计数不一致")
+        print(f"{n:>10} {t_python:>12.3f} {t_dicts:>13.3f} {t_store:>13.3f} {t_python / t_store:>7.1f}x")
+
+
+if __name__ == "__main__":
+    run([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,240 @@
+"""
+合成的 AO3 作品列表页，用于在不访问 AO3 的情况下测量解析、统计和导出。
+
+页面结构与真实列表页相同（作品 blurb、标题、分页、第一页的筛选栏），各解析后端都能解析。
+标签按 Zipf 分布从固定词表中抽取：排名第 k 的标签出现概率正比于 1 / k^zipf_s，
+和真实同人圈里少数热门角色 / 关系占大多数作品的情况一致。
+
+用法（在 RateYourFandom 目录下）:
+    python -m benchmarks.synthetic_ao3 输出目录 作品数 [--works-per-page 20] [--tags-per-work 8]
+        [--vocab-size 5000] [--zipf-s 1.1] [--years 2009-2024] [--seed 0] [--storage gzip]
+"""
+import os
+import json
+import random
+import argparse
+from html import escape
+from itertools import accumulate, islice
+
+from utils.page_storage import PageStorage
+from utils.file_utils import ensure_folder
+
+DEFAULTS = {
+    "works_per_page": 20,
+    "tags_per_work": 8,
+    "vocab_size": 5000,
+    "zipf_s": 1.1,
+    "years": (2009, 2024),
+    "seed": 0,
+}
+CONFIG_NAME = "synthetic.json"
+
+RATINGS = (("general-audience", "General Audiences"), ("teen", "Teen And Up Audiences"),
+           ("mature", "Mature"), ("explicit", "Explicit"), ("notrated", "Not Rated"))
+RATING_WEIGHTS = (30, 35, 15, 15, 5)
+WARNINGS = (("No Archive Warnings Apply",), ("Creator Chose Not To Use Archive Warnings",),
+            ("Graphic Depictions Of Violence",), ("Major Character Death", "Graphic Depictions Of Violence"))
+WARNING_WEIGHTS = (55, 30, 10, 5)
+CATEGORIES = ("M/M", "F/M", "Gen", "F/F", "Multi", "Other")
+CATEGORY_WEIGHTS = (40, 25, 20, 10, 4, 1)
+FANDOMS = ("Fandom A", "Fandom B (TV)", "Fandom C & Friends", "Fandom D - Author")
+MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+class _Vocab:
+    """Zipf 分布的标签词表；cum_weights 预先算好，抽样时 random.choices 只需二分查找"""
+
+    def __init__(self, names, zipf_s):
+        self.names = names
+        self.cum_weights = list(accumulate(1 / (rank + 1) ** zipf_s for rank in range(len(names))))
+
+    def sample(self, rng, k):
+        # 同一作品内重复的标签只保留一次，与 AO3 一致
+        return list(dict.fromkeys(rng.choices(self.names, cum_weights=self.cum_weights, k=k)))
+
+
+def _vocabularies(vocab_size, zipf_s):
+    characters = [f"Character {i}" if i % 10 else f"Character {i} & Co" for i in range(vocab_size)]
+    relationships = [f"Character {i}/Character {i + 1}" if i % 3 else f"Character {i} & Character {i + 2}"
+                     for i in range(vocab_size)]
+    freeforms = [f"Trope {i}" if i % 7 else f"Trope {i} <3" for i in range(vocab_size * 2)]
+    return _Vocab(characters, zipf_s), _Vocab(relationships, zipf_s), _Vocab(freeforms, zipf_s)
+
+
+def _tag_items(kind, names):
+    return "".join(f'<li class="{kind}"><a class="tag" href="/tags/{kind}">{escape(name, quote=False)}</a></li>'
+                   for name in names)
+
+
+def _blurb(rng, work_id, vocabs, tags_per_work, years):
+    characters, relationships, freeforms = vocabs
+    n_tags = rng.randint(max(1, tags_per_work // 2), tags_per_work + tags_per_work // 2)
+    n_characters = max(1, n_tags * 2 // 5)
+    n_relationships = n_tags // 5
+    n_freeforms = n_tags - n_characters - n_relationships
+
+    rating_class, rating = rng.choices(RATINGS, RATING_WEIGHTS)[0]
+    warnings = rng.choices(WARNINGS, WARNING_WEIGHTS)[0]
+    category = rng.choices(CATEGORIES, CATEGORY_WEIGHTS)[0]
+    fandoms = [FANDOMS[0]] + ([rng.choice(FANDOMS[1:])] if rng.random() < 0.2 else [])
+    year = rng.randint(*years)
+    if work_id % 9:
+        author = f'<a rel="author" href="/users/user{work_id % 5000}/pseuds/user{work_id % 5000}">user{work_id % 5000}</a>'
+    else:
+        author = "Anonymous"
+    kudos = rng.randint(0, 20000) if work_id % 6 else None
+    kudos_html = (f'<dt class="kudos">Kudos:</dt><dd class="kudos"><a href="/works/{work_id}/kudos">{kudos:,}</a></dd>'
+                  if kudos is not None else "")
+    chapters = rng.randint(1, 40)
+    total_chapters = chapters if rng.random() < 0.6 else "?"
+
+    tags = (_tag_items("warnings", warnings) + _tag_items("relationships", relationships.sample(rng, n_relationships))
+            + _tag_items("characters", characters.sample(rng, n_characters))
+            + _tag_items("freeforms", freeforms.sample(rng, n_freeforms)))
+    fandom_links = ", ".join(f'<a class="tag" href="/tags/fandom/works">{escape(f, quote=False)}</a>' for f in fandoms)
+    return f'''<li id="work_{work_id}" class="work blurb group work-{work_id} user-{work_id % 5000}" role="article">
+  <div class="header module">
+    <h4 class="heading">
+      <a href="/works/{work_id}">Synthetic Work {work_id}</a>
+      by
+      <!-- do not cache -->
+      {author}
+    </h4>
+    <h5 class="fandoms heading">
+      <span class="landmark">Fandoms:</span>
+      {fandom_links}
+      &nbsp;
+    </h5>
+    <ul class="required-tags">
+      <li><a class="help symbol question modal" href="/help/symbols-key.html"><span class="rating-{rating_class} rating" title="{rating}"><span class="text">{rating}</span></span></a></li>
+      <li><a class="help symbol question modal" href="/help/symbols-key.html"><span class="warning-yes warnings" title="{', '.join(warnings)}"><span class="text">{', '.join(warnings)}</span></span></a></li>
+      <li><a class="help symbol question modal" href="/help/symbols-key.html"><span class="category-slash category" title="{category}"><span class="text">{category}</span></span></a></li>
+      <li><a class="help symbol question modal" href="/help/symbols-key.html"><span class="complete-no iswip" title="Work in Progress"><span class="text">Work in Progress</span></span></a></li>
+    </ul>
+    <p class="datetime">{rng.randint(1, 28):02d} {rng.choice(MONTHS)} {year}</p>
+  </div>
+  <h6 class="landmark heading">Tags</h6>
+  <ul class="tags commas">
+    {tags}
+  </ul>
+  <h6 class="landmark heading">Summary</h6>
+  <blockquote class="userstuff summary"><p>Summary of synthetic work {work_id}. Written in {year}.</p></blockquote>
+  <dl class="stats">
+    <dt class="language">Language:</dt><dd class="language" lang="en">English</dd>
+    <dt class="words">Words:</dt><dd class="words">{rng.randint(100, 300000):,}</dd>
+    <dt class="chapters">Chapters:</dt><dd class="chapters"><a href="/works/{work_id}/chapters/1">{chapters}</a>/{total_chapters}</dd>
+    <dt class="comments">Comments:</dt><dd class="comments"><a href="/works/{work_id}?show_comments=true">{rng.randint(0, 500)}</a></dd>
+    {kudos_html}
+    <dt class="bookmarks">Bookmarks:</dt><dd class="bookmarks"><a href="/works/{work_id}/bookmarks">{rng.randint(0, 3000)}</a></dd>
+    <dt class="hits">Hits:</dt><dd class="hits">{rng.randint(10, 500000):,}</dd>
+  </dl>
+</li>
+'''
+
+
+def _filter_sidebar(vocabs, total_works):
+    """第一页的筛选栏：按 Zipf 权重估计的前 10 个角色 / 关系 / 自由标签"""
+    sections = []
+    for section_id, vocab in zip(("include_character_tags", "include_relationship_tags", "include_freeform_tags"),
+                                 vocabs):
+        total_weight = vocab.cum_weights[-1]
+        previous = 0
+        items = []
+        for name, cum_weight in islice(zip(vocab.names, vocab.cum_weights), 10):
+            estimated = int(total_works * (cum_weight - previous) / total_weight)
+            previous = cum_weight
+            items.append(f'<li><input type="checkbox"/><label><span class="indicator"></span>'
+                         f'<span>{escape(name, quote=False)} ({estimated:,})</span></label></li>')
+        sections.append(f'<dd id="{section_id}" class="expandable"><ul>{"".join(items)}</ul></dd>')
+    return ('<form id="work-filters" class="filters" method="get" action="/works"><dl class="filters">'
+            + "".join(sections) + "</dl></form>")
+
+
+def generate_pages(n_works, works_per_page=20, tags_per_work=8, vocab_size=5000, zipf_s=1.1,
+                   years=(2009, 2024), seed=0):
+    """按页产出 (页码, HTML)，共 n_works 个作品；相同参数总是生成相同的页面"""
+    rng = random.Random(seed)
+    vocabs = _vocabularies(vocab_size, zipf_s)
+    total_pages = max(1, -(-n_works // works_per_page))
+    for page in range(1, total_pages + 1):
+        first = (page - 1) * works_per_page
+        count = min(works_per_page, n_works - first)
+        # 列表按更新时间倒序，作品编号越往后越小
+        body = "".join(_blurb(rng, 10_000_000 - first - i, vocabs, tags_per_work, years) for i in range(count))
+        sidebar = _filter_sidebar(vocabs, n_works) if page == 1 else ""
+        yield page, f'''<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>Works in Fandom A | Archive of Our Own</title>
+<script>var template = "<li class='work blurb group'>";</script></head>
+<body><div id="main" class="works-index dashboard filtered region" role="main">
+<h2 class="heading">{first + 1} - {first + count} of {n_works:,} Works in <a class="tag" href="/tags/Fandom%20A">Fandom A</a></h2>
+{sidebar}
+<ol class="pagination actions" role="navigation"><li class="previous">Previous</li><li><span class="current">{page}</span></li><li><a href="/tags/Fandom%20A/works?page={total_pages}">{total_pages}</a></li></ol>
+<ol class="work index group">
+{body}</ol></div></body></html>'''
+
+
+def write_pages(folder, n_works, storage="gzip", **options):
+    """
+    把合成页面写入 folder（与下载目录的格式相同，可以直接 analyze_folder），返回页数。
+    参数相同且目录中已有完整数据时直接复用，不重新生成。
+    """
+    config = dict(DEFAULTS, **options, n_works=n_works, storage=storage)
+    config["years"] = list(config["years"])
+    config_path = os.path.join(folder, CONFIG_NAME)
+    if os.path.exists(config_path):
+        with open(config_path, "r", encoding="utf-8") as f:
+            if json.load(f) == config:
+                return max(1, -(-n_works // config["works_per_page"]))
+
+    ensure_folder(folder)
+    page_storage = PageStorage(folder, storage, trim=False)
+    pages = 0
+    filter_stats = {}
+    for page, html in generate_pages(n_works, **{key: config[key] for key in DEFAULTS}):
+        if page == 1:
+            from download.page_stats import parse_listing_page
+            _, _, filter_stats = parse_listing_page(html)
+        page_storage.save(page, html)
+        pages += 1
+    with open(os.path.join(folder, "download_info.json"), "w", encoding="utf-8") as f:
+        json.dump({"total_pages": pages, "total_works": n_works, "downloaded_pages": pages,
+                   "sampling_mode": "完整分析", "sampling_factor": 1.0, "is_sampling": False,
+                   "filter_stats": filter_stats}, f, indent=2, ensure_ascii=False)
+    # 配置最后写，生成中途中断的目录下次会重新生成
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    return pages
+
+
+def parse_years(text):
+    first, _, last = text.partition("-")
+    return int(first), int(last or first)
+
+
+def add_generator_arguments(parser):
+    parser.add_argument("--works-per-page", type=int, default=DEFAULTS["works_per_page"])
+    parser.add_argument("--tags-per-work", type=int, default=DEFAULTS["tags_per_work"],
+                        help="每个作品的平均角色 + 关系 + 自由标签数")
+    parser.add_argument("--vocab-size", type=int, default=DEFAULTS["vocab_size"], help="角色 / 关系词表大小")
+    parser.add_argument("--zipf-s", type=float, default=DEFAULTS["zipf_s"], help="Zipf 分布指数，越大越集中")
+    parser.add_argument("--years", type=parse_years, default=DEFAULTS["years"], help="年份范围，例如 2009-2024")
+    parser.add_argument("--seed", type=int, default=DEFAULTS["seed"])
+
+
+def generator_options(args):
+    return {key: getattr(args, key) for key in DEFAULTS}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成合成的 AO3 作品列表页")
+    parser.add_argument("folder")
+    parser.add_argument("works", type=int)
+    parser.add_argument("--storage", default="gzip", choices=("raw", "gzip", "zstd"))
+    add_generator_arguments(parser)
+    args = parser.parse_args(argv)
+    pages = write_pages(args.folder, args.works, args.storage, **generator_options(args))
+    print(f"已生成 {pages} 页、{args.works} 个作品到 {args.folder}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import os
+import json
+import gzip
+import argparse
+import logging
+from datetime import datetime
+
+from download.page_stats import parse_listing_page
+from download.fetcher import FetcherPool, fetch_pages
+from parser_folder.work_schema import work_id_from_url
+from utils.file_utils import ensure_folder
+from utils.rate_limiter import TokenBucket
+from utils.metrics import METRICS
+from utils.log import setup_logging, add_log_level_argument
+
+logger = logging.getLogger(__name__)
+
+STORE_NAME = "delta_works.json.gz"
+# 判断作品是否更新过的字段：AO3 上作品更新（加章节、改正文）一定会改变其中之一
+CHANGE_FIELDS = ("words", "chapters")
+
+
+class DeltaStore:
+    """
+    增量抓取的持久作品库，按作品编号保存最近一次看到的作品 dict。
+    high_water: 见过的最大作品编号，编号更大的作品一定是新发布的。
+    meta['complete']: 是否有一次运行抓到了列表最后一页；在此之前作品库不完整，不能提前停止。
+    一个作品库只属于一个标签（meta['tag_url']）。
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = os.path.join(folder, STORE_NAME)
+        self.meta = {}
+        self.works = {}
+        if os.path.exists(self.path):
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+            self.meta = data.get("meta", {})
+            self.works = {int(work_id): work for work_id, work in data.get("works", {}).items()}
+
+    @property
+    def high_water(self):
+        return self.meta.get("high_water", 0)
+
+    @property
+    def complete(self):
+        return bool(self.meta.get("complete"))
+
+    def check_tag(self, tag_url):
+        """作品库属于另一个标签时报错，避免把两个标签的作品混在一起"""
+        stored = self.meta.get("tag_url")
+        if stored and stored != tag_url:
+            raise ValueError(f"作品库 {self.folder} 属于另一个标签（{stored}），请为 {tag_url} 换一个作品库目录")
+
+    def status(self, work_id, work):
+        """'new' / 'updated' / 'unchanged'"""
+        stored = self.works.get(work_id)
+        if stored is None:
+            return "new"
+        if any(stored.get(field) != work.get(field) for field in CHANGE_FIELDS):
+            return "updated"
+        return "unchanged"
+
+    def upsert(self, work_id, work):
+        self.works[work_id] = work
+        self.meta["high_water"] = max(self.high_water, work_id)
+
+    def save(self):
+        ensure_folder(self.folder)
+        tmp_path = self.path + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump({"meta": self.meta, "works": self.works}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def download_info(self):
+        """供 analyze_works 使用的 download_info：作品库是完整的，不需要抽样放大"""
+        return {
+            "total_pages": self.meta.get("total_pages", 0),
+            "total_works": self.meta.get("total_works", 0),
+            "downloaded_pages": self.meta.get("last_run_pages", 0),
+            "sampling_mode": "增量抓取",
+            "sampling_factor": 1.0,
+            "is_sampling": False,
+            "filter_stats": self.meta.get("filter_stats", {}),
+        }
+
+
+@METRICS.timed("fetch")
+def delta_crawl(tag_url, store_folder, workers=2, rate=0.5, backend="selenium", pool=None, limiter=None,
+                stop_after=20, max_pages=None):
+    """
+    增量抓取：按列表默认的"最近更新"顺序从第一页往后抓，
+    遇到连续 stop_after 个已在作品库中且字数、章节都没变的作品就停止。
+    抓到的页上的作品都会并入作品库（没变化的作品也会更新 kudos / 点击量，只是不计为变化），
+    停止之后的作品保持上次抓到时的值。
+    作品库还没有完整抓到过列表末尾时（第一次运行，或之前因为抓取失败、max_pages 中途停止）不会提前停止。
+    作品库属于另一个标签时抛出 ValueError。
+    返回本次运行的摘要。
+    """
+    from parser_folder.works_extractor import extract_works_data
+
+    store = DeltaStore(store_folder)
+    store.check_tag(tag_url)
+    if not store.complete and store.works:
+        logger.info("作品库还没有完整抓取过，本次抓到列表末尾为止")
+    own_pool = pool is None
+    if own_pool:
+        pool = FetcherPool(backend, size=workers)
+    if limiter is None:
+        limiter = TokenBucket(rate=rate, burst=workers)
+
+    counts = {"new": 0, "updated": 0, "unchanged": 0}
+    previous_high_water = store.high_water
+    fetched_pages = 0
+    unchanged_run = 0
+    stopped = False
+    try:
+        page = 1
+        total_pages = None
+        while not stopped:
+            last_page = total_pages or 1
+            if max_pages:
+                last_page = min(last_page, max_pages)
+            batch = list(range(page, min(page + workers, last_page + 1)))
+            if not batch:
+                break
+            results = {}
+            for fetched, html, status in fetch_pages([(p, f"{tag_url}?page={p}") for p in batch],
+                                                     pool, limiter, workers):
+                results[fetched] = (html, status)
+
+            # 按列表顺序处理，保证"连续未变化"的判断与页面顺序一致
+            for p in batch:
+                html, status = results[p]
+                if status != "ok":
+                    logger.warning(f"第 {p} 页抓取失败（{status}），停止增量抓取")
+                    stopped = True
+                    break
+                fetched_pages += 1
+                if p == 1:
+                    total_pages, total_works, filter_stats = parse_listing_page(html)
+                    store.meta.update({"tag_url": tag_url, "total_pages": total_pages,
+                                       "total_works": total_works, "filter_stats": filter_stats})
+                    logger.info(f"总页数: {total_pages}, 总作品数: {total_works}")
+                for work in extract_works_data(html, f"page_{p}.html"):
+                    work_id = work_id_from_url(work["url"])
+                    if work_id is None:
+                        continue
+                    change = store.status(work_id, work)
+                    counts[change] += 1
+                    unchanged_run = unchanged_run + 1 if change == "unchanged" else 0
+                    store.upsert(work_id, work)
+                if store.complete and unchanged_run >= stop_after:
+                    logger.info(f"连续 {unchanged_run} 个作品没有变化（到第 {p} 页），停止增量抓取")
+                    stopped = True
+                    break
+            page = batch[-1] + 1
+        if not stopped and total_pages is not None and page > total_pages:
+            store.meta["complete"] = True
+    finally:
+        if own_pool:
+            pool.close()
+        store.meta["last_run"] = datetime.now().isoformat(timespec="seconds")
+        store.meta["last_run_pages"] = fetched_pages
+        store.save()
+
+    summary = dict(counts, pages=fetched_pages, stored=len(store.works),
+                   brand_new=sum(1 for work_id in store.works if work_id > previous_high_water))
+    logger.info(f"增量抓取完成: 抓取 {fetched_pages} 页，新作品 {counts['new']} 个（其中新发布 {summary['brand_new']} 个），"
+          f"更新 {counts['updated']} 个，作品库共 {len(store.works)} 个作品")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="增量抓取：只抓取上次以来新发布或更新过的作品")
+    parser.add_argument("tag_url", help="AO3 标签页地址")
+    parser.add_argument("store", nargs="?", default="ao3_delta_store", help="作品库目录")
+    parser.add_argument("--output", default="ao3_csv_output", help="CSV 输出目录")
+    parser.add_argument("--stop-after", type=int, default=20, help="连续多少个未变化的作品后停止")
+    parser.add_argument("--max-pages", type=int, default=None)
+    parser.add_argument("--backend", default="selenium", help="抓取后端")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--rate", type=float, default=0.5, help="每秒请求数")
+    parser.add_argument("--prom-file", default=None,
+                        help="Prometheus 文本文件路径（例如 node_exporter 的 textfile 目录），默认写在输出目录")
+    add_log_level_argument(parser)
+    args = parser.parse_args(argv)
+    setup_logging(args.log_level)
+    METRICS.reset()
+
+    from parser_folder.analyzer import analyze_works
+    from output.csv_writer import write_csv
+
+    try:
+        delta_crawl(args.tag_url, args.store, workers=args.workers, rate=args.rate, backend=args.backend,
+                    stop_after=args.stop_after, max_pages=args.max_pages)
+    except ValueError as e:
+        parser.error(str(e))
+    store = DeltaStore(args.store)
+    stats = analyze_works(store.works.values(), store.download_info())
+    write_csv(stats, args.output)
+    METRICS.write_report(args.output, labels={"entry": "delta_crawl", "tag": args.tag_url}, prom_path=args.prom_file)
+    print("完成！CSV已生成在", args.output, "文件夹中。")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,66 +1,331 @@
-import os
-import time
 import random
 import json
-from bs4 import BeautifulSoup
-import re
+import logging
 
 from download.page_stats import get_total_pages_and_stats
+from download.fetcher import FetcherPool, fetch_pages
+from download.manifest import CrawlManifest
+from download.sampling import (choose_uniform_pages, page_tag_counts, bootstrap_intervals,
+                               make_strata, page_year_counts, stratum_spread, neyman_allocation,
+                               stratum_weights)
 from utils.file_utils import ensure_folder
-from utils.chrome_driver import create_driver
+from utils.rate_limiter import TokenBucket
+from utils.page_storage import PageStorage
+from utils.metrics import METRICS
+from utils.profiling import PROFILER
 
-def download_ao3_pages(tag_url, save_folder):
+logger = logging.getLogger(__name__)
+
+@METRICS.timed("fetch")
+@PROFILER.profiled("download_ao3_pages")
+def download_ao3_pages(tag_url, save_folder, workers=2, rate=0.5, backend="selenium",
+                       pool=None, limiter=None, resume=True, refresh=False,
+                       sampling="uniform", target_precision=0.1, round_size=10, max_pages=200,
+                       storage="gzip", trim=True, on_page=None):
+    """
+    下载标签页的作品列表。
+    参数:
+      - workers: 并发抓取的 worker 数（同时也是浏览器/会话池大小）
+      - rate: 全局限速，每秒请求数；所有 worker 共享同一个令牌桶
+      - backend: 抓取后端名称，见 download.fetcher.BACKENDS；
+                 'selenium' 每个 worker 一个 Chrome，'http' 用长连接会话，仅在遇到验证页面时回退到 Chrome
+      - pool / limiter: 可传入外部的 FetcherPool / TokenBucket，以便多个任务共享
+      - resume: 跳过抓取清单中已完成且文件仍在的页面（中断后重跑即续传）
+      - refresh: 刷新模式，只重新抓取列表内容发生变化的页面
+      - sampling: 页数超过 20 时的抽样方式
+          'uniform'  第一页 + 随机 19 页（原来的方式）
+          'adaptive' 按轮次抽页，每轮用自助法估计主要角色/关系/评级的置信区间，
+                     最大相对半宽不超过 target_precision 或抓满 max_pages 页时停止
+          'stratified' 同样抓 20 页，但按列表顺序分层，先每层抓 2 页试探，
+                     再按各层分年份作品数的离散程度（Neyman 分配）分配剩余页数；
+                     download_info.json 中写入每页的权重，分析时代替统一的抽样倍数
+      - round_size: 自适应抽样每轮抓取的页数
+      - storage: 页面保存格式，'gzip'（默认）/ 'zstd'（需要 zstandard）/ 'raw'（原样的 page_N.html）
+      - trim: 只保存作品 blurb、标题、分页和第一页的筛选栏；False 时保存整页
+      - on_page: 可选回调 on_page(page, html)，本次运行每保存一页（包括第一页）就在抓取线程中调用一次，
+                 供流水线边下载边解析；续传跳过的页不会回调
+    """
     ensure_folder(save_folder)
-    driver = create_driver()
+    page_storage = PageStorage(save_folder, storage, trim)
+    own_pool = pool is None
+    if own_pool:
+        pool = FetcherPool(backend, size=workers)
+    if limiter is None:
+        limiter = TokenBucket(rate=rate, burst=workers)
+
+    try:
+        limiter.acquire()
+        with pool.borrow() as fetcher:
+            total_pages, total_works, first_html, filter_stats = get_total_pages_and_stats(fetcher, tag_url)
+        sampling_options = {
+            "sampling": sampling,
+            "target_precision": target_precision,
+            "round_size": round_size,
+            "max_pages": max_pages,
+        }
+        info = _download_target_pages(tag_url, save_folder, pool, limiter, workers,
+                                      total_pages, total_works, first_html, filter_stats,
+                                      resume=resume, refresh=refresh, sampling_options=sampling_options,
+                                      storage=page_storage, on_page=on_page)
+    finally:
+        if own_pool:
+            pool.close()
+    return info
+
+def _download_target_pages(tag_url, save_folder, pool, limiter, workers,
+                           total_pages, total_works, first_html, filter_stats,
+                           resume=True, refresh=False, sampling_options=None, storage=None, on_page=None):
+    """保存第一页，选定目标页并发下载；每页都记入抓取清单，最后写 download_info.json"""
+    sampling_options = sampling_options or {"sampling": "uniform"}
+    logger.info(f"总页数: {total_pages}, 总作品数: {total_works}")
 
-    total_pages, total_works, first_html, filter_stats = get_total_pages_and_stats(driver, tag_url)
-    
-    print(f"总页数: {total_pages}, 总作品数: {total_works}")
+    manifest = CrawlManifest(save_folder, storage)
+    same_listing = (resume or refresh) and manifest.matches(tag_url, total_pages)
+    # 列表按更新时间排序，任何作品更新都会出现在第一页；第一页和作品总数都没变即整个列表没变
+    listing_changed = (not same_listing or manifest.has_changed(1, first_html)
+                       or manifest.data.get("total_works") != total_works)
+    if not same_listing:
+        # 从头开始，或清单属于别的标签/页数：上次的记录和页面都不能沿用
+        manifest.reset(tag_url, total_pages)
 
     # 保存第一页
-    with open(f"{save_folder}/page_1.html", "w", encoding="utf-8") as f:
-        f.write(first_html)
-
-    # 抽样 or 全量
-    if total_pages <= 20:
-        target_pages = list(range(2, total_pages + 1))
-        sampling_mode = "完整分析"
-        print("使用完整分析模式")
+    manifest.storage.save(1, first_html)
+    manifest.record(1, "ok", first_html)
+    if on_page is not None:
+        on_page(1, first_html)
+
+    if sampling_options["sampling"] == "adaptive" and total_pages > 20 and not refresh:
+        # 自适应抽样边抓边估计，抓取过程本身决定目标页
+        extra_info = {}
+        try:
+            extra_info = _adaptive_sample(
+                tag_url, save_folder, pool, limiter, workers, manifest, total_pages, total_works,
+                first_html, same_listing and resume, sampling_options, on_page)
+        finally:
+            downloaded = 1 + sum(1 for page in manifest.data.get("target_pages", []) if manifest.is_done(page))
+            info = _write_download_info(save_folder, total_pages, total_works, downloaded,
+                                        manifest.data.get("sampling_mode", "自适应抽样"), filter_stats, extra_info,
+                                        tag_url=tag_url)
+        logger.info(f"下载完成: {downloaded}/{total_pages} 页")
+        return info
+
+    # 抽样 or 全量；续传时沿用上次抽中的页，保证样本一致（分层抽样只沿用分层抽出的样本）
+    stratified = sampling_options["sampling"] == "stratified" and total_pages > 20
+    strata = manifest.data.get("strata")
+    if (same_listing and manifest.data.get("target_pages") is not None
+            and (refresh or bool(strata) == stratified)):
+        target_pages = list(manifest.data["target_pages"])
+        sampling_mode = manifest.data.get("sampling_mode", "完整分析")
+        logger.info(f"沿用抓取清单中的目标页（{sampling_mode}）")
+    elif stratified and not refresh:
+        target_pages, sampling_mode, strata = _stratified_sample(
+            tag_url, save_folder, pool, limiter, workers, manifest, total_pages, total_works, on_page=on_page)
     else:
-        all_pages = list(range(2, total_pages + 1))
-        sample_size = min(19, len(all_pages))
-        target_pages = random.sample(all_pages, sample_size)
-        sampling_mode = f"随机抽样（20/{total_pages}）"
-        print(f"使用抽样模式，抽取 {sample_size + 1} 页")
-
-    downloaded = 1
-
-    for i, page in enumerate(target_pages, 1):
-        url = f"{tag_url}?page={page}"
-        print(f"下载页面 {page} ({i}/{len(target_pages)})")
-        
-        driver.get(url)
-        time.sleep(3 + random.random() * 2)  # 随机延迟避免被封
-        
-        # 检查是否被重定向到验证页面
-        if "checkpoint" in driver.current_url or "captcha" in driver.current_url:
-            print("遇到验证码，停止下载")
-            break
+        target_pages, sampling_mode = choose_uniform_pages(total_pages)
+        strata = None
+    manifest.start(tag_url, total_pages, total_works, target_pages, sampling_mode, strata)
+
+    if refresh:
+        pending = sorted(target_pages) if listing_changed else []
+        if not listing_changed:
+            logger.info("列表没有变化，无需刷新")
+    elif resume:
+        pending = [page for page in target_pages if not manifest.is_done(page)]
+        if len(pending) < len(target_pages):
+            logger.info(f"已有 {len(target_pages) - len(pending)} 页下载完成，跳过")
+    else:
+        # 从头开始时清单和上次的页面都已清空（见 CrawlManifest.reset），is_done 只认本次记录的页，
+        # 也就是分层抽样刚抓的试探页；目录里的其他文件一律重新抓
+        pending = [page for page in target_pages if not manifest.is_done(page)]
+
+    try:
+        if refresh:
+            _refresh_pages(tag_url, save_folder, pool, limiter, workers, manifest, pending, on_page)
+        else:
+            _fetch_and_save(tag_url, save_folder, pool, limiter, workers, manifest, pending, on_page)
+    finally:
+        # 即使中途中断也写出 download_info.json，已下载的页可以直接分析
+        done_pages = [page for page in target_pages if manifest.is_done(page)]
+        downloaded = 1 + len(done_pages)
+        extra_info = None
+        if strata:
+            page_weights, strata_summary = stratum_weights(strata, done_pages)
+            extra_info = {
+                "strata": strata_summary,
+                "page_weights": {f"page_{page}.html": weight for page, weight in sorted(page_weights.items())},
+            }
+        info = _write_download_info(save_folder, total_pages, total_works, downloaded,
+                                    sampling_mode, filter_stats, extra_info, tag_url=tag_url)
+
+    logger.info(f"下载完成: {downloaded}/{total_pages} 页")
+    return info
+
+def _fetch_and_save(tag_url, save_folder, pool, limiter, workers, manifest, pages, on_page=None):
+    """
+    并发抓取并保存，返回 (内容有变化的页数, 内容未变的页数, 是否遇到验证码)
+    on_page: 可选回调 on_page(page, html)，每保存一页调用一次
+    """
+    changed_pages = 0
+    unchanged_pages = 0
+    blocked = False
+
+    targets = [(page, f"{tag_url}?page={page}") for page in pages]
+    for i, (page, html, status) in enumerate(fetch_pages(targets, pool, limiter, workers), 1):
+        if status == "captcha":
+            logger.warning("遇到验证码，停止下载")
+            blocked = True
+            continue
+        if status != "ok":
+            if status == "error":
+                manifest.record(page, "error")
+            continue
+
+        logger.debug(f"下载页面 {page} ({i}/{len(pages)})")
 
-        html = driver.page_source
-        
         # 检查页面是否包含作品
         if "work blurb group" not in html:
-            print(f"页面 {page} 可能为空或格式错误，跳过")
+            logger.warning(f"页面 {page} 可能为空或格式错误，跳过")
+            manifest.record(page, "empty")
             continue
 
-        with open(f"{save_folder}/page_{page}.html", "w", encoding="utf-8") as f:
-            f.write(html)
+        manifest.storage.save(page, html)
+
+        if manifest.record(page, "ok", html):
+            changed_pages += 1
+        else:
+            unchanged_pages += 1
+        if on_page is not None:
+            on_page(page, html)
+
+    return changed_pages, unchanged_pages, blocked
+
+def _refresh_pages(tag_url, save_folder, pool, limiter, workers, manifest, pages, on_page=None):
+    """
+    按页码从小到大分批刷新。某作品更新后会移到第一页，它原位置之前的页都会顺移一位，
+    之后的页保持不变；所以一旦某批里出现没变化的页，后面的页就不用再抓了。
+    """
+    for start in range(0, len(pages), workers):
+        batch = pages[start:start + workers]
+        _, unchanged, blocked = _fetch_and_save(tag_url, save_folder, pool, limiter, workers,
+                                                manifest, batch, on_page)
+        if blocked:
+            return
+        if unchanged:
+            logger.info(f"第 {batch[-1]} 页之后的列表没有变化，停止刷新")
+            return
+
+def _adaptive_sample(tag_url, save_folder, pool, limiter, workers, manifest, total_pages, total_works,
+                     first_html, reuse_previous, options, on_page=None):
+    """
+    自适应抽样：随机顺序分轮抓取，每轮结束后对已抓到的页做自助法估计，精度达标即停止。
+    目标页和抽样模式随每轮写入抓取清单；返回要写入 download_info 的额外信息
+    """
+    from parser_folder.works_extractor import extract_works_data
+
+    target_precision = options.get("target_precision", 0.1)
+    round_size = max(1, options.get("round_size", 10))
+    max_pages = max(round_size, options.get("max_pages", 200))
+    # 样本太少时自助法的区间没有意义，至少抓满一轮再判断
+    min_pages = round_size + 1
+
+    page_counts = {1: page_tag_counts(extract_works_data(first_html, "page_1.html"))}
+
+    def count_page(page, html):
+        page_counts[page] = page_tag_counts(extract_works_data(html, f"page_{page}.html"))
+
+    def on_fetched(page, html):
+        count_page(page, html)
+        if on_page is not None:
+            on_page(page, html)
+
+    # 续传：清单中已完成的页直接从磁盘读取
+    if reuse_previous:
+        for page in manifest.data.get("target_pages") or []:
+            if manifest.is_done(page):
+                count_page(page, manifest.storage.read(page))
+        if len(page_counts) > 1:
+            logger.info(f"沿用抓取清单中已下载的 {len(page_counts) - 1} 页")
+
+    remaining = [page for page in range(2, total_pages + 1) if page not in page_counts]
+    random.shuffle(remaining)
+
+    def sampled_pages():
+        return sorted(page for page in page_counts if page != 1)
+
+    def mode():
+        return f"自适应抽样（{len(page_counts)}/{total_pages}）"
+
+    logger.info(f"使用自适应抽样模式，目标相对误差 {target_precision:.0%}，每轮 {round_size} 页，最多 {max_pages} 页")
+    rounds = 0
+    while True:
+        intervals, precision = bootstrap_intervals(list(page_counts.values()), total_pages)
+        if rounds:
+            logger.info(f"第 {rounds} 轮后：已抓取 {len(page_counts)} 页，最大相对误差 {precision:.1%}")
+        if len(page_counts) >= min_pages and precision <= target_precision:
+            logger.info("估计精度已达标，停止抓取")
+            break
+        if not remaining or len(page_counts) >= max_pages:
+            logger.info("已达到抓取上限，停止抓取")
+            break
+
+        batch = remaining[:min(round_size, max_pages - len(page_counts))]
+        del remaining[:len(batch)]
+        rounds += 1
+        manifest.start(tag_url, total_pages, total_works, sampled_pages() + batch, mode())
+        _, _, blocked = _fetch_and_save(tag_url, save_folder, pool, limiter, workers, manifest, batch, on_fetched)
+        manifest.start(tag_url, total_pages, total_works, sampled_pages(), mode())
+        if blocked:
+            intervals, precision = bootstrap_intervals(list(page_counts.values()), total_pages)
+            break
+
+    extra_info = {
+        "sampling_rounds": rounds,
+        "target_precision": target_precision,
+        "achieved_precision": round(precision, 4),
+        "confidence_intervals": intervals,
+    }
+    return extra_info
+
+def _stratified_sample(tag_url, save_folder, pool, limiter, workers, manifest, total_pages, total_works,
+                       sample_pages=20, n_strata=4, pilot_per_stratum=2, on_page=None):
+    """
+    分层抽样的第一阶段：把第 2 页起的列表分成 n_strata 段，每段先抓 pilot_per_stratum 页试探，
+    用试探页估计各层分年份作品数的离散程度，再按 Neyman 分配决定各层还要抽多少页。
+    返回 (全部目标页, 抽样模式, 分层)，第二阶段的页由调用方照常下载。
+    """
+    from parser_folder.works_extractor import extract_works_data
+
+    strata = make_strata(total_pages, n_strata)
+    budget = sample_pages - 1
+    mode = f"分层抽样（{sample_pages}/{total_pages}）"
+    pilots = [random.sample(range(first, last + 1), min(pilot_per_stratum, last - first + 1))
+              for first, last in strata]
+    pilot_pages = [page for pages in pilots for page in pages]
+    logger.info(f"使用分层抽样模式：{len(strata)} 层，每层先抓 {pilot_per_stratum} 页试探")
+
+    year_counts = {}
+
+    def on_fetched(page, html):
+        year_counts[page] = page_year_counts(extract_works_data(html, f"page_{page}.html"))
+        if on_page is not None:
+            on_page(page, html)
 
-        downloaded += 1
+    manifest.start(tag_url, total_pages, total_works, pilot_pages, mode, strata)
+    _, _, blocked = _fetch_and_save(tag_url, save_folder, pool, limiter, workers, manifest, pilot_pages, on_fetched)
+    if blocked:
+        return pilot_pages, mode, strata
 
-    driver.quit()
+    spreads = [stratum_spread([year_counts[p] for p in pages if p in year_counts]) for pages in pilots]
+    allocation = neyman_allocation(strata, spreads, budget, [len(pages) for pages in pilots])
+    target_pages = []
+    for (first, last), pages, n in zip(strata, pilots, allocation):
+        rest = [page for page in range(first, last + 1) if page not in pages]
+        target_pages.extend(pages + random.sample(rest, min(n - len(pages), len(rest))))
+        logger.info(f"  第 {first}-{last} 页: 抽取 {n} 页")
+    return target_pages, mode, strata
 
+def _write_download_info(save_folder, total_pages, total_works, downloaded, sampling_mode, filter_stats,
+                         extra_info=None, tag_url=None):
     # 计算抽样因子
     sampling_factor = total_pages / downloaded if downloaded < total_pages else 1
 
@@ -73,9 +338,12 @@ def download_ao3_pages(tag_url, save_folder):
         "is_sampling": downloaded < total_pages,
         "filter_stats": filter_stats
     }
+    if tag_url:
+        info["tag_url"] = tag_url
+    if extra_info:
+        info.update(extra_info)
 
     with open(f"{save_folder}/download_info.json", "w", encoding="utf-8") as f:
         json.dump(info, f, indent=2, ensure_ascii=False)
 
-    print(f"下载完成: {downloaded}/{total_pages} 页")
     return info
\ No newline at end of file
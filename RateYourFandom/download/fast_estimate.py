@@ -0,0 +1,171 @@
+import os
+import json
+import argparse
+import logging
+from datetime import datetime
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from download.page_stats import parse_listing_page
+from download.fetcher import FetcherPool, fetch_pages
+from utils.file_utils import ensure_folder
+from utils.rate_limiter import TokenBucket
+from utils.metrics import METRICS
+from utils.log import setup_logging, add_log_level_argument
+
+logger = logging.getLogger(__name__)
+
+# AO3 评级筛选用的 ID
+AO3_RATING_IDS = {
+    "Not Rated": 9,
+    "General Audiences": 10,
+    "Teen And Up Audiences": 11,
+    "Mature": 12,
+    "Explicit": 13,
+}
+# AO3 开站年份，按年份查询时默认从这一年开始
+FIRST_YEAR = 2008
+
+
+def filtered_url(tag_url, date_from=None, date_to=None, rating_id=None, other_tag=None):
+    """在标签页地址上加筛选条件（日期按"更新时间"筛选，与列表中的年份一致）"""
+    parts = urlsplit(tag_url)
+    query = parse_qsl(parts.query)
+    if date_from:
+        query.append(("work_search[date_from]", date_from))
+    if date_to:
+        query.append(("work_search[date_to]", date_to))
+    if rating_id is not None:
+        query.append(("include_work_search[rating_ids][]", str(rating_id)))
+    if other_tag:
+        query.append(("work_search[other_tag_names]", other_tag))
+    query.append(("commit", "Sort and Filter"))
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), parts.fragment))
+
+
+def build_queries(tag_url, filter_stats, years, top_relationships=5):
+    """
+    生成要加载的筛选查询 [(维度, 取值, 地址), ...]：
+      - 每个年份一次（日期范围）
+      - 首页筛选栏中出现的每个评级一次
+      - 作品数最多的 top_relationships 个关系各一次
+    """
+    queries = []
+    for year in years:
+        queries.append(("year", str(year), filtered_url(tag_url, f"{year}-01-01", f"{year}-12-31")))
+    for rating in filter_stats.get("ratings", {}):
+        if rating in AO3_RATING_IDS:
+            queries.append(("rating", rating, filtered_url(tag_url, rating_id=AO3_RATING_IDS[rating])))
+    relationships = sorted(filter_stats.get("relationships", {}).items(), key=lambda x: x[1], reverse=True)
+    for relationship, _ in relationships[:top_relationships]:
+        queries.append(("relationship", relationship, filtered_url(tag_url, other_tag=relationship)))
+    return queries
+
+
+@METRICS.timed("fetch")
+def fast_estimate(tag_url, years=None, top_relationships=5, workers=2, rate=0.5, backend="selenium",
+                  pool=None, limiter=None):
+    """
+    快速估计模式：不下载作品列表页，只加载标签首页和少量筛选后的列表页，
+    读取每页的 "Works (N)" 标题和筛选栏中的准确计数。
+    筛选栏每一类只列出作品最多的前若干个标签，所以各表只覆盖主要标签。
+    返回:
+      {
+        'tag_url', 'total_works', 'filter_stats',
+        'yearly_works': {年份: 作品数},
+        'yearly_stats': {字段: {年份: {标签: 作品数}}}   与 analyze_folder 的 yearly_stats 结构相同,
+        'crosstabs': {维度: {取值: {'works': 作品数, 'stats': {字段: {标签: 作品数}}}}},
+        'failed': [(维度, 取值), ...]
+      }
+    """
+    own_pool = pool is None
+    if own_pool:
+        pool = FetcherPool(backend, size=workers)
+    if limiter is None:
+        limiter = TokenBucket(rate=rate, burst=workers)
+
+    try:
+        targets = [("首页", tag_url)]
+        base = None
+        for _, html, status in fetch_pages(targets, pool, limiter, workers):
+            if status == "ok":
+                base = html
+        if base is None:
+            raise RuntimeError("无法加载标签首页")
+        _, total_works, filter_stats = parse_listing_page(base)
+        logger.info(f"作品总数: {total_works}")
+
+        if years is None:
+            years = range(FIRST_YEAR, datetime.now().year + 1)
+        queries = build_queries(tag_url, filter_stats, years, top_relationships)
+        logger.info(f"快速估计：共 {len(queries)} 次筛选查询")
+
+        estimate = {
+            "tag_url": tag_url,
+            "total_works": total_works,
+            "filter_stats": filter_stats,
+            "yearly_works": {},
+            "yearly_stats": {field: {} for field in filter_stats},
+            "crosstabs": {},
+            "failed": [],
+        }
+        labels = {f"{dimension}:{value}": (dimension, value) for dimension, value, _ in queries}
+        targets = [(f"{dimension}:{value}", url) for dimension, value, url in queries]
+        for label, html, status in fetch_pages(targets, pool, limiter, workers):
+            dimension, value = labels[label]
+            if status != "ok":
+                logger.warning(f"筛选查询 {label} 失败（{status}）")
+                estimate["failed"].append((dimension, value))
+                continue
+            _, works, stats = parse_listing_page(html)
+            logger.info(f"筛选查询 {label}: {works} 个作品")
+            if dimension == "year":
+                if works:
+                    estimate["yearly_works"][value] = works
+                    for field, counts in stats.items():
+                        if counts:
+                            estimate["yearly_stats"][field][value] = counts
+            else:
+                estimate["crosstabs"].setdefault(dimension, {})[value] = {"works": works, "stats": stats}
+    finally:
+        if own_pool:
+            pool.close()
+
+    # 并发抓取按完成顺序返回，这里按年份排好
+    estimate["yearly_works"] = dict(sorted(estimate["yearly_works"].items()))
+    for field, per_year in estimate["yearly_stats"].items():
+        estimate["yearly_stats"][field] = dict(sorted(per_year.items()))
+    return estimate
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="快速估计：只读取筛选栏，不下载作品列表页")
+    parser.add_argument("tag_url", help="AO3 标签页地址")
+    parser.add_argument("output", nargs="?", default="ao3_fast_estimate", help="CSV 输出目录")
+    parser.add_argument("--from-year", type=int, default=FIRST_YEAR, help="按年份查询的起始年份")
+    parser.add_argument("--to-year", type=int, default=datetime.now().year, help="按年份查询的结束年份")
+    parser.add_argument("--top-relationships", type=int, default=5, help="做交叉统计的关系数")
+    parser.add_argument("--backend", default="selenium", help="抓取后端")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--rate", type=float, default=0.5, help="每秒请求数")
+    parser.add_argument("--prom-file", default=None,
+                        help="Prometheus 文本文件路径（例如 node_exporter 的 textfile 目录），默认写在输出目录")
+    add_log_level_argument(parser)
+    args = parser.parse_args(argv)
+    setup_logging(args.log_level)
+    METRICS.reset()
+
+    from output.csv_writer import write_fast_estimate
+
+    estimate = fast_estimate(args.tag_url, range(args.from_year, args.to_year + 1), args.top_relationships,
+                             workers=args.workers, rate=args.rate, backend=args.backend)
+    ensure_folder(args.output)
+    with open(os.path.join(args.output, "fast_estimate.json"), "w", encoding="utf-8") as f:
+        json.dump(estimate, f, indent=2, ensure_ascii=False)
+    write_fast_estimate(estimate, args.output)
+    METRICS.write_report(args.output, labels={"entry": "fast_estimate", "tag": args.tag_url},
+                         prom_path=args.prom_file)
+    print("完成！结果已生成在", args.output, "文件夹中。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import re
+import queue
+import threading
+import time
+import random
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+from utils.rate_limiter import TokenBucket
+from utils.metrics import METRICS
+from utils.http_session import create_session, copy_cookies_to_driver, copy_cookies_from_driver
+
+logger = logging.getLogger(__name__)
+
+AO3_BASE_URL = "https://archiveofourown.org"
+# 验证页面的特征：Cloudflare 的 "Just a moment..." 挑战页、reCAPTCHA / hCaptcha 表单、AO3 的 checkpoint 表单
+_CHALLENGE_RE = re.compile(
+    r'<title>\s*Just a moment|challenge-platform|id="challenge-form"|cf-chl-|class="[^"]*\b(?:g-recaptcha|h-captcha)\b'
+    r'|action="[^"]*/checkpoint\b', re.I)
+
+# 抓取后端注册表：名称 -> 工厂函数（无参，返回带 fetch/close 方法的对象）
+BACKENDS = {}
+
+
+def register_backend(name):
+    def decorator(factory):
+        BACKENDS[name] = factory
+        return factory
+    return decorator
+
+
+class RateLimited(Exception):
+    """服务器返回 429，要求稍后再试"""
+
+    def __init__(self, retry_after=60):
+        super().__init__(f"请求过于频繁，{retry_after} 秒后重试")
+        self.retry_after = retry_after
+
+
+def is_blocked(url, html=None):
+    """
+    判断是否遇到验证页面：被重定向到 checkpoint / captcha 地址，
+    或者原地址直接返回了验证页（html 中有验证标记且没有任何作品 blurb）
+    """
+    url = url or ""
+    if "checkpoint" in url or "captcha" in url:
+        return True
+    if not html or "blurb" in html:
+        return False
+    return _CHALLENGE_RE.search(html) is not None
+
+
+@register_backend("selenium")
+class SeleniumFetcher:
+    """每个实例独占一个 Chrome，只能同时被一个线程使用"""
+
+    def __init__(self):
+        from utils.chrome_driver import create_driver
+        self.driver = create_driver()
+
+    def fetch(self, url):
+        """返回 (html, 最终 url)"""
+        self.driver.get(url)
+        return self.driver.page_source, self.driver.current_url
+
+    def close(self):
+        self.driver.quit()
+
+
+@register_backend("http")
+class HttpFetcher:
+    """
+    轻量后端：直接用长连接 HTTP 会话读取服务器渲染好的列表页，不启动浏览器。
+    只有遇到验证页面时才临时启动 Chrome 重新打开该页，并在两者之间同步 cookie。
+    """
+
+    def __init__(self):
+        self.session = create_session()
+        self._driver = None
+
+    def fetch(self, url):
+        resp = self.session.get(url, timeout=30)
+        if resp.status_code == 429:
+            retry_after = resp.headers.get("Retry-After", "")
+            raise RateLimited(int(retry_after) if retry_after.isdigit() else 60)
+        # 验证页面也可能带 403 / 503 状态码，先判断再检查状态
+        if is_blocked(resp.url, resp.text):
+            logger.warning(f"HTTP 请求遇到验证页面，改用浏览器打开: {url}")
+            return self._fetch_with_browser(url)
+        resp.raise_for_status()
+        return resp.text, resp.url
+
+    def _fetch_with_browser(self, url):
+        if self._driver is None:
+            from utils.chrome_driver import create_driver
+            self._driver = create_driver()
+        copy_cookies_to_driver(self.session, self._driver, AO3_BASE_URL)
+        self._driver.get(url)
+        copy_cookies_from_driver(self._driver, self.session)
+        return self._driver.page_source, self._driver.current_url
+
+    def close(self):
+        self.session.close()
+        if self._driver is not None:
+            self._driver.quit()
+            self._driver = None
+
+
+class FetcherPool:
+    """
+    抓取器池：按需创建，最多 size 个实例，线程间借还。
+    可以在多个下载任务之间共享。
+    """
+
+    def __init__(self, backend="selenium", size=2):
+        if backend not in BACKENDS:
+            raise ValueError(f"未知的抓取后端: {backend}（可选: {', '.join(BACKENDS)}）")
+        self.backend = backend
+        self.size = max(1, int(size))
+        self._idle = queue.LifoQueue()
+        self._created = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._created) < self.size:
+                fetcher = BACKENDS[self.backend]()
+                self._created.append(fetcher)
+                return fetcher
+        return self._idle.get()
+
+    def release(self, fetcher):
+        self._idle.put(fetcher)
+
+    @contextmanager
+    def borrow(self):
+        fetcher = self.acquire()
+        try:
+            yield fetcher
+        finally:
+            self.release(fetcher)
+
+    def close(self):
+        with self._lock:
+            for fetcher in self._created:
+                try:
+                    fetcher.close()
+                except Exception as e:
+                    logger.warning(f"关闭抓取器时出错: {e}")
+            self._created = []
+            self._idle = queue.LifoQueue()
+
+
+def fetch_pages(targets, pool, limiter=None, workers=None, retries=2):
+    """
+    并发抓取多个页面。
+    参数:
+      - targets: [(page, url), ...]
+      - pool: FetcherPool
+      - limiter: 全局 TokenBucket，所有 worker 共享
+      - workers: 并发线程数，默认等于池大小
+      - retries: 出错后的重试次数
+    按完成顺序逐个产出 (page, html, status)，status 为 'ok' / 'captcha' / 'error'。
+    一旦遇到验证码，尚未开始的页面会被取消（产出 status='skipped'）。
+    """
+    if limiter is None:
+        limiter = TokenBucket()
+    workers = workers or pool.size
+    stop = threading.Event()
+
+    def task(page, url):
+        for attempt in range(retries + 1):
+            if stop.is_set():
+                return page, None, "skipped"
+            limiter.acquire()
+            try:
+                with pool.borrow() as fetcher:
+                    html, final_url = fetcher.fetch(url)
+            except RateLimited as e:
+                METRICS.count("rate_limited")
+                METRICS.count("fetch_retries")
+                logger.warning(f"下载页面 {page} 被限速，暂停 {e.retry_after} 秒")
+                limiter.penalize(e.retry_after)
+                continue
+            except Exception as e:
+                METRICS.count("fetch_errors")
+                METRICS.count("fetch_retries")
+                logger.warning(f"下载页面 {page} 出错（第 {attempt + 1} 次）: {e}")
+                time.sleep((2 ** attempt) + random.random())
+                continue
+            METRICS.count("pages_fetched")
+            METRICS.count("bytes_fetched", len(html))
+            if is_blocked(final_url, html):
+                METRICS.count("captcha_hits")
+                stop.set()
+                return page, None, "captcha"
+            return page, html, "ok"
+        return page, None, "error"
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(task, page, url) for page, url in targets]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # 调用方提前结束（中断、异常）时，让还没开始的任务直接返回
+            stop.set()
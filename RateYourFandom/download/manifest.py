@@ -0,0 +1,127 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import logging
+from datetime import datetime
+
+from utils.page_storage import PageStorage
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "crawl_manifest.json"
+
+_WORK_ID_RE = re.compile(r'<li[^>]*\bid="work_(\d+)"')
+_DATETIME_RE = re.compile(r'<p class="datetime">\s*([^<]*?)\s*</p>')
+
+
+def listing_signature(html):
+    """
+    列表页的"内容签名"：只取作品 ID 与更新日期。
+    点击量、kudos、csrf token 等每次都会变，不参与比较。
+    """
+    ids = _WORK_ID_RE.findall(html)
+    dates = _DATETIME_RE.findall(html)
+    payload = "|".join(ids) + "#" + "|".join(dates)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class CrawlManifest:
+    """
+    记录每一页的抓取状态，保存在下载目录的 crawl_manifest.json 中。
+    每记录一页就原子写盘一次，中断后重跑可以直接续传。
+    storage: 页面的 PageStorage，默认按原来的方式保存整页 page_N.html
+    """
+
+    def __init__(self, folder, storage=None):
+        self.folder = folder
+        self.storage = storage or PageStorage(folder, "raw", trim=False)
+        self.path = os.path.join(folder, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self.data = {"pages": {}}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"读取抓取清单失败，重新开始: {e}")
+        self.data.setdefault("pages", {})
+
+    def matches(self, tag_url, total_pages):
+        """清单是否属于同一个标签、同样页数的列表"""
+        return (self.data.get("tag_url") == tag_url
+                and self.data.get("total_pages") == total_pages)
+
+    def reset(self, tag_url, total_pages):
+        """
+        从头开始，或清单属于别的标签/页数时清空清单，并删掉清单记录过的旧页面文件：
+        这些页不属于本次的列表，留在目录里会被当成本次的页分析
+        """
+        with self._lock:
+            stale = [int(page) for page in self.data.get("pages", {})]
+            for page in stale:
+                self.storage.remove(page)
+            if stale:
+                logger.info(f"清空抓取清单，删除上次抓取的 {len(stale)} 个页面文件")
+            self.data = {"tag_url": tag_url, "total_pages": total_pages, "pages": {}}
+            self._save()
+
+    def start(self, tag_url, total_pages, total_works, target_pages, sampling_mode, strata=None):
+        with self._lock:
+            self.data.update({
+                "tag_url": tag_url,
+                "total_pages": total_pages,
+                "total_works": total_works,
+                "target_pages": sorted(target_pages),
+                "sampling_mode": sampling_mode,
+            })
+            # 分层抽样时记下分层，续传时才能算出与原来一致的权重
+            if strata:
+                self.data["strata"] = [list(stratum) for stratum in strata]
+            else:
+                self.data.pop("strata", None)
+            self._save()
+
+    def entry(self, page):
+        return self.data["pages"].get(str(page))
+
+    def page_path(self, page):
+        return self.storage.path(page)
+
+    def is_done(self, page):
+        """清单中记录本标签的这一页已成功下载，且文件还在磁盘上；没有记录的页即使有文件也不算"""
+        entry = self.entry(page)
+        if not entry or entry.get("status") != "ok" or entry.get("tag_url") != self.data.get("tag_url"):
+            return False
+        return self.storage.exists(page)
+
+    def has_changed(self, page, html):
+        entry = self.entry(page)
+        return not entry or entry.get("signature") != listing_signature(html)
+
+    def record(self, page, status, html=None):
+        """记录一页的抓取结果，返回该页列表是否与上次不同"""
+        entry = {
+            "tag_url": self.data.get("tag_url"),
+            "status": status,
+            "fetched_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        changed = True
+        if html is not None:
+            raw = html.encode("utf-8")
+            entry["bytes"] = len(raw)
+            entry["sha256"] = hashlib.sha256(raw).hexdigest()
+            entry["signature"] = listing_signature(html)
+            previous = self.entry(page)
+            changed = not previous or previous.get("signature") != entry["signature"]
+        with self._lock:
+            self.data["pages"][str(page)] = entry
+            self._save()
+        return changed
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
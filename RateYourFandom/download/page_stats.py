@@ -1,6 +1,7 @@
 import time
 import re
-from bs4 import BeautifulSoup
+
+from utils.metrics import METRICS
 
 def extract_filter_statistics(soup):
     """
@@ -66,20 +67,60 @@ def extract_filter_statistics(soup):
     
     return stats
 
-def get_total_pages_and_stats(driver, tag_url):
-    """获取总页数和筛选统计"""
-    driver.get(tag_url)
-    time.sleep(5)
+def load_page(client, url):
+    """用抓取器（download.fetcher 中的后端）或原始 selenium driver 打开页面，返回 HTML"""
+    if hasattr(client, 'fetch'):
+        html, _ = client.fetch(url)
+    else:
+        client.get(url)
+        time.sleep(5)
+        html = client.page_source
+    METRICS.count("pages_fetched")
+    METRICS.count("bytes_fetched", len(html))
+    return html
+
+def get_total_pages_and_stats(driver, tag_url, backend=None):
+    """
+    获取总页数和筛选统计
+    driver 可以是抓取器或 selenium driver；传 None 时按 backend 临时创建一个抓取器
+    """
+    own_fetcher = driver is None
+    if own_fetcher:
+        from download.fetcher import BACKENDS
+        driver = BACKENDS[backend or 'selenium']()
+    try:
+        page_source = load_page(driver, tag_url)
+    finally:
+        if own_fetcher:
+            driver.close()
+
+    total_pages, total_works, filter_stats = parse_listing_page(page_source)
+    return total_pages, total_works, page_source, filter_stats
+
+def parse_total_works(heading_text):
+    """
+    从列表标题读取作品总数。
+    标签首页是 "Works (1,234)"；筛选后的列表是 "1 - 20 of 1,234 Works in ..."
+    """
+    m = re.search(r'Works\s*\(([\d,]+)\)', heading_text)
+    if not m:
+        m = re.search(r'\bof\s+([\d,]+)\s+Works?\b', heading_text)
+    if not m:
+        # 只有一页时没有 "of"："12 Works in ..."
+        m = re.search(r'^\s*([\d,]+)\s+Works?\b', heading_text)
+    return int(m.group(1).replace(',', '')) if m else 0
+
+def parse_listing_page(page_source):
+    """解析一页作品列表的标题、分页和筛选栏，返回 (总页数, 作品总数, 筛选统计)"""
+    from bs4 import BeautifulSoup
 
-    soup = BeautifulSoup(driver.page_source, 'html.parser')
+    soup = BeautifulSoup(page_source, 'html.parser')
 
     # 作品总数
     total_works = 0
     h2 = soup.find('h2', class_='heading')
     if h2:
-        m = re.search(r'Works\s*\(([\d,]+)\)', h2.text)
-        if m:
-            total_works = int(m.group(1).replace(',', ''))
+        total_works = parse_total_works(h2.text)
 
     # 页数判断
     total_pages = 1
@@ -99,4 +140,4 @@ def get_total_pages_and_stats(driver, tag_url):
 
     filter_stats = extract_filter_statistics(soup)
 
-    return total_pages, total_works, driver.page_source, filter_stats
\ No newline at end of file
+    return total_pages, total_works, filter_stats
\ No newline at end of file
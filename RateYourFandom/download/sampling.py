@@ -0,0 +1,169 @@
+import random
+import logging
+from collections import Counter
+
+from parser_folder.tag_statistics import _normalize_tag
+
+logger = logging.getLogger(__name__)
+
+# 自适应抽样时跟踪置信区间的字段：download_info / stats 中的键 -> 作品 dict 中的键
+INTERVAL_FIELDS = {
+    "characters": "characters",
+    "relationships": "relationships",
+    "ratings": "rating",
+}
+
+
+def choose_uniform_pages(total_pages, sample_pages=20):
+    """原来的抽样方式：不超过 20 页全量，否则第一页 + 随机 19 页。返回 (目标页, 抽样模式)"""
+    if total_pages <= sample_pages:
+        logger.info("使用完整分析模式")
+        return list(range(2, total_pages + 1)), "完整分析"
+    all_pages = list(range(2, total_pages + 1))
+    sample_size = min(sample_pages - 1, len(all_pages))
+    logger.info(f"使用抽样模式，抽取 {sample_size + 1} 页")
+    return random.sample(all_pages, sample_size), f"随机抽样（{sample_pages}/{total_pages}）"
+
+
+def page_tag_counts(works):
+    """单页中各字段每个标签出现的作品数（与分析时的计数规则一致）"""
+    counts = {field: Counter() for field in INTERVAL_FIELDS}
+    for work in works:
+        for field in ("characters", "relationships"):
+            normalized = (_normalize_tag(t) for t in work.get(field) or [])
+            for tag in dict.fromkeys(t for t in normalized if t):
+                counts[field][tag] += 1
+        rating = work.get("rating")
+        if rating and rating.strip():
+            counts["ratings"][rating] += 1
+    return counts
+
+
+def bootstrap_intervals(page_counts, total_pages, top_n=5, n_boot=400, confidence=0.95, seed=0):
+    """
+    对已抓取的页做自助法（按页有放回重抽样），估计每个字段前 top_n 个标签的全站作品数及置信区间。
+    参数:
+      - page_counts: [page_tag_counts(...), ...]，每页一个
+      - total_pages: 列表总页数，估计值 = 每页平均 × 总页数（与 sampling_factor 的放大方式一致）
+    返回 (intervals, precision)
+      - intervals: {字段: {标签: {'estimate', 'low', 'high'}}}
+      - precision: 所有被跟踪标签中最大的相对半宽 (high - low) / 2 / estimate
+    """
+    n_pages = len(page_counts)
+    if n_pages == 0:
+        return {}, float("inf")
+    rng = random.Random(seed)
+    samples = [[rng.randrange(n_pages) for _ in range(n_pages)] for _ in range(n_boot)]
+    tail = (1 - confidence) / 2
+
+    intervals = {}
+    precision = 0.0
+    for field in INTERVAL_FIELDS:
+        totals = Counter()
+        for counts in page_counts:
+            totals.update(counts[field])
+        intervals[field] = {}
+        for tag, _ in totals.most_common(top_n):
+            column = [counts[field].get(tag, 0) for counts in page_counts]
+            estimates = sorted(sum(column[i] for i in sample) / n_pages * total_pages for sample in samples)
+            low = estimates[int(tail * (n_boot - 1))]
+            high = estimates[int((1 - tail) * (n_boot - 1))]
+            estimate = sum(column) / n_pages * total_pages
+            intervals[field][tag] = {"estimate": round(estimate, 1), "low": round(low, 1), "high": round(high, 1)}
+            if estimate > 0:
+                precision = max(precision, (high - low) / 2 / estimate)
+    return intervals, precision
+
+
+def make_strata(total_pages, n_strata=4):
+    """把第 2 页到最后一页按顺序切成 n_strata 段连续页（列表按更新时间排序，每段大致对应一个时期）"""
+    pages = total_pages - 1
+    n_strata = max(1, min(n_strata, pages))
+    strata = []
+    first = 2
+    for h in range(n_strata):
+        size = pages // n_strata + (1 if h < pages % n_strata else 0)
+        strata.append((first, first + size - 1))
+        first += size
+    return strata
+
+
+def page_year_counts(works):
+    """单页中各年份的作品数"""
+    return Counter(work.get("year") or "未知" for work in works)
+
+
+def stratum_spread(year_counts_list):
+    """层内离散程度：各年份每页作品数的样本方差之和再开方；少于两页时无法估计，返回 None"""
+    n = len(year_counts_list)
+    if n < 2:
+        return None
+    years = set()
+    for counts in year_counts_list:
+        years.update(counts)
+    total_variance = 0.0
+    for year in years:
+        column = [counts.get(year, 0) for counts in year_counts_list]
+        mean = sum(column) / n
+        total_variance += sum((x - mean) ** 2 for x in column) / (n - 1)
+    return total_variance ** 0.5
+
+
+def neyman_allocation(strata, spreads, budget, minimum):
+    """
+    Neyman 分配：第 h 层抽 n_h ∝ N_h·S_h 页，总数为 budget。
+    每层至少 minimum[h] 页（已抓的试探页），最多 N_h 页；
+    所有层都估计不出离散程度或离散程度都为 0 时退化为按层大小比例分配。
+    """
+    sizes = [last - first + 1 for first, last in strata]
+    known = [s for s in spreads if s is not None]
+    fallback = sum(known) / len(known) if known else 1.0
+    scores = [size * (fallback if s is None else s) for size, s in zip(sizes, spreads)]
+    if not any(scores):
+        scores = list(sizes)
+
+    allocation = [min(m, size) for m, size in zip(minimum, sizes)]
+    budget = min(budget, sum(sizes))
+    # 逐页分给"理想份额减已分配"最大且未满的层，等价于带上下限的最大余数法
+    while sum(allocation) < budget:
+        total_score = sum(score for score, n, size in zip(scores, allocation, sizes) if n < size)
+        open_strata = [h for h in range(len(strata)) if allocation[h] < sizes[h]]
+        if not open_strata:
+            break
+        if total_score:
+            h = max(open_strata, key=lambda h: scores[h] / total_score * budget - allocation[h])
+        else:
+            h = max(open_strata, key=lambda h: sizes[h] - allocation[h])
+        allocation[h] += 1
+    return allocation
+
+
+def stratum_weights(strata, sampled_pages):
+    """
+    每个已抓页的权重 N_h / n_h（第一页单独成层，权重为 1）。
+    某层一页都没抓到时并入相邻的层，保证全部页数都有代表。
+    返回 ({页码: 权重}, [{'pages': [首页, 末页], 'sampled': n_h, 'weight': 权重}, ...])
+    """
+    sampled = set(sampled_pages)
+    groups = []
+    for first, last in strata:
+        pages = [p for p in range(first, last + 1) if p in sampled]
+        if pages or not groups:
+            groups.append([first, last, pages])
+        else:
+            groups[-1][1] = last
+    # 开头几层都为空时并入后面第一个非空层
+    while len(groups) > 1 and not groups[0][2]:
+        groups[1][0] = groups[0][0]
+        groups.pop(0)
+
+    weights = {1: 1.0}
+    summary = []
+    for first, last, pages in groups:
+        if not pages:
+            continue
+        weight = (last - first + 1) / len(pages)
+        for page in pages:
+            weights[page] = weight
+        summary.append({"pages": [first, last], "sampled": len(pages), "weight": round(weight, 4)})
+    return weights, summary
@@ -1,20 +1,35 @@
-from download.downloader import download_ao3_pages
-from parser_folder.analyzer import analyze_folder
+import os
+import argparse
+
+from pipeline import run_pipeline
 from output.csv_writer import write_csv
+from utils.metrics import METRICS
+from utils.log import setup_logging
+from utils.profiling import PROFILER, add_profile_argument, profile_modes
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="下载并分析一个 AO3 标签，标签页地址运行后输入")
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+    setup_logging("INFO")
     tag_url = input("输入AO3标签页：")
+    METRICS.reset()
     save_folder = "ao3_html_pages"
     output_folder = "ao3_csv_output"
 
-    print("开始下载页面...")
-    download_info = download_ao3_pages(tag_url, save_folder)
-    
-    print("分析数据...")
-    stats = analyze_folder(save_folder)
-    
-    print("生成CSV文件...")
-    write_csv(stats, output_folder)
+    if profile_modes(args):
+        PROFILER.start(os.path.join(output_folder, "profile"), profile_modes(args))
+
+    try:
+        # 每下载一页就开始解析，下载结束时统计也基本完成
+        print("开始下载并分析页面...")
+        stats = run_pipeline(tag_url, save_folder)
+
+        print("生成CSV文件...")
+        write_csv(stats, output_folder)
+    finally:
+        PROFILER.stop()
+    METRICS.write_report(output_folder, labels={"entry": "main", "tag": tag_url})
 
     print("完成！CSV已生成在", output_folder, "文件夹中。")
 
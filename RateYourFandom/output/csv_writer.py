@@ -1,11 +1,32 @@
 import os
-import pandas as pd
+import logging
 from utils.file_utils import ensure_folder
-import re
+from parser_folder.aggregator import WEIGHTED_TOTAL_FIELDS
+from output.table_writer import write_table, write_rows, check_formats, ranked
+from utils.metrics import METRICS
+from utils.profiling import PROFILER
 
-def write_csv(stats, folder):
-    """将统计数据写入CSV文件，包含对比分析和分年份统计"""
+logger = logging.getLogger(__name__)
+
+WORK_COLUMNS = [
+    ('来源文件', 'source_file'), ('标题', 'title'), ('作者', 'author'), ('年份', 'year'),
+    ('评级', 'rating'), ('警告标签', 'warnings'), ('分类', 'categories'), ('角色', 'characters'),
+    ('关系', 'relationships'), ('同人圈', 'fandoms'), ('自由标签', 'freeforms'), ('字数', 'words'),
+    ('章节', 'chapters'), ('点赞数', 'kudos'), ('点击量', 'hits'), ('书签数', 'bookmarks'), ('评论数', 'comments'),
+]
+JOINED_FIELDS = ('warnings', 'categories', 'characters', 'relationships', 'fandoms', 'freeforms')
+# 分层抽样时各页权重不同，抽样倍数列不再是一个数
+STRATIFIED_FACTOR = '分层加权'
+
+@METRICS.timed("export")
+@PROFILER.profiled("write_csv")
+def write_csv(stats, folder, formats=("csv",)):
+    """
+    将统计数据写入CSV文件，包含对比分析和分年份统计
+    各表直接从计数器按列生成并流式写盘；formats 可额外加 'parquet' / 'arrow'（需要 pyarrow）
+    """
     ensure_folder(folder)
+    check_formats(formats)
     
     download_info = stats.get("download_info", {})
     filter_stats = stats.get("filter_stats", {})
@@ -13,179 +34,89 @@ def write_csv(stats, folder):
     is_sampling = download_info.get("is_sampling", False)
     sampling_factor = download_info.get("sampling_factor", 1.0)
     sampling_mode = download_info.get("sampling_mode", "完整分析")
+    page_weights = download_info.get("page_weights") or None
+    if page_weights:
+        factor_column = STRATIFIED_FACTOR
+    else:
+        factor_column = sampling_factor if is_sampling else 1.0
+    # 自适应抽样时 download_info 中带有主要标签全站作品数的置信区间
+    intervals = download_info.get("confidence_intervals", {})
+    # 自由标签近似统计时（analyze_folder 的 freeform_top）带有每个标签的误差上限
+    freeform_sketch = stats.get("freeform_sketch")
     
-    print(f"正在生成CSV文件到: {os.path.abspath(folder)}")
-    print(f"分析模式: {sampling_mode}")
-    if is_sampling:
-        print(f"抽样倍数: {sampling_factor:.2f}")
+    logger.info(f"正在生成CSV文件到: {os.path.abspath(folder)}")
+    logger.info(f"分析模式: {sampling_mode}")
+    if page_weights:
+        logger.info(f"抽样倍数: {STRATIFIED_FACTOR}（{len(page_weights)} 页各有权重）")
+    elif is_sampling:
+        logger.info(f"抽样倍数: {sampling_factor:.2f}")
 
     # 1. 角色统计CSV - 添加对比信息
     if stats['characters']:
-        characters_list = []
-        for char, count in sorted(stats['characters'].items(), key=lambda x: x[1], reverse=True):
-            filter_count = filter_stats.get('characters', {}).get(char, '')
-            data_source = '抽样估算' if is_sampling and not filter_count else '准确统计'
-            estimated_count = count if is_sampling else count
-            
-            characters_list.append({
-                '角色名称': char, 
-                '统计次数': estimated_count,
-                'filter准确次数': filter_count,
-                '数据来源': data_source,
-                '抽样倍数': sampling_factor if is_sampling else 1.0
-            })
-        
-        characters_df = pd.DataFrame(characters_list)
-        characters_df.to_csv(os.path.join(folder, '角色统计.csv'), index=False, encoding='utf-8-sig')
-        print(f"角色统计: {len(characters_df)} 条记录")
+        count = _write_compared_table(folder, '角色统计', '角色名称', stats['characters'],
+                                      filter_stats.get('characters', {}), is_sampling, factor_column, formats,
+                                      intervals.get('characters'))
+        logger.info(f"角色统计: {count} 条记录")
     
     # 2. 关系统计CSV - 添加对比信息
     if stats['relationships']:
-        relationships_list = []
-        for rel, count in sorted(stats['relationships'].items(), key=lambda x: x[1], reverse=True):
-            filter_count = filter_stats.get('relationships', {}).get(rel, '')
-            data_source = '抽样估算' if is_sampling and not filter_count else '准确统计'
-            estimated_count = count if is_sampling else count
-            
-            relationships_list.append({
-                '关系名称': rel, 
-                '统计次数': estimated_count,
-                'filter准确次数': filter_count,
-                '数据来源': data_source,
-                '抽样倍数': sampling_factor if is_sampling else 1.0
-            })
-        
-        relationships_df = pd.DataFrame(relationships_list)
-        relationships_df.to_csv(os.path.join(folder, '关系统计.csv'), index=False, encoding='utf-8-sig')
-        print(f"关系统计: {len(relationships_df)} 条记录")
-    
-    # 3. 评级分布CSV
-    if stats['ratings']:
-        ratings_list = []
-        for rating, count in sorted(stats['ratings'].items(), key=lambda x: x[1], reverse=True):
-            estimated_count = count if is_sampling else count
-            ratings_list.append({
-                '评级类型': rating, 
-                '作品数量': estimated_count,
-                '抽样倍数': sampling_factor if is_sampling else 1.0
-            })
-        
-        ratings_df = pd.DataFrame(ratings_list)
-        ratings_df.to_csv(os.path.join(folder, '评级分布.csv'), index=False, encoding='utf-8-sig')
-        print(f"评级分布: {len(ratings_df)} 条记录")
-    
-    # 4. 警告标签统计CSV
-    if stats['warnings']:
-        warnings_list = []
-        for warning, count in sorted(stats['warnings'].items(), key=lambda x: x[1], reverse=True):
-            estimated_count = count if is_sampling else count
-            warnings_list.append({
-                '警告类型': warning, 
-                '出现次数': estimated_count,
-                '抽样倍数': sampling_factor if is_sampling else 1.0
-            })
-        
-        warnings_df = pd.DataFrame(warnings_list)
-        warnings_df.to_csv(os.path.join(folder, '警告标签统计.csv'), index=False, encoding='utf-8-sig')
-        print(f"警告标签统计: {len(warnings_df)} 条记录")
+        count = _write_compared_table(folder, '关系统计', '关系名称', stats['relationships'],
+                                      filter_stats.get('relationships', {}), is_sampling, factor_column, formats,
+                                      intervals.get('relationships'))
+        logger.info(f"关系统计: {count} 条记录")
     
-    # 5. 分类统计CSV
-    if stats['categories']:
-        categories_list = []
-        for category, count in sorted(stats['categories'].items(), key=lambda x: x[1], reverse=True):
-            estimated_count = count if is_sampling else count
-            categories_list.append({
-                '分类类型': category, 
-                '作品数量': estimated_count,
-                '抽样倍数': sampling_factor if is_sampling else 1.0
-            })
-        
-        categories_df = pd.DataFrame(categories_list)
-        categories_df.to_csv(os.path.join(folder, '分类统计.csv'), index=False, encoding='utf-8-sig')
-        print(f"分类统计: {len(categories_df)} 条记录")
-    
-    # 6. 同人圈统计CSV
-    if stats['fandoms']:
-        fandoms_list = []
-        for fandom, count in sorted(stats['fandoms'].items(), key=lambda x: x[1], reverse=True):
-            estimated_count = count if is_sampling else count
-            fandoms_list.append({
-                '同人圈名称': fandom, 
-                '作品数量': estimated_count,
-                '抽样倍数': sampling_factor if is_sampling else 1.0
-            })
-        
-        fandoms_df = pd.DataFrame(fandoms_list)
-        fandoms_df.to_csv(os.path.join(folder, '同人圈统计.csv'), index=False, encoding='utf-8-sig')
-        print(f"同人圈统计: {len(fandoms_df)} 条记录")
-    
-    # 7. 自由标签统计CSV
-    if stats['freeforms']:
-        freeforms_list = []
-        for freeform, count in sorted(stats['freeforms'].items(), key=lambda x: x[1], reverse=True):
-            estimated_count = count if is_sampling else count
-            freeforms_list.append({
-                '自由标签': freeform, 
-                '出现次数': estimated_count,
-                '抽样倍数': sampling_factor if is_sampling else 1.0
-            })
-        
-        freeforms_df = pd.DataFrame(freeforms_list)
-        freeforms_df.to_csv(os.path.join(folder, '自由标签统计.csv'), index=False, encoding='utf-8-sig')
-        print(f"自由标签统计: {len(freeforms_df)} 条记录")
+    # 3-7. 评级 / 警告 / 分类 / 同人圈 / 自由标签
+    simple_tables = [
+        ('ratings', '评级分布', '评级类型', '作品数量'),
+        ('warnings', '警告标签统计', '警告类型', '出现次数'),
+        ('categories', '分类统计', '分类类型', '作品数量'),
+        ('fandoms', '同人圈统计', '同人圈名称', '作品数量'),
+        ('freeforms', '自由标签统计', '自由标签', '出现次数'),
+    ]
+    for key, table_name, name_column, count_column in simple_tables:
+        if stats[key]:
+            names, counts = ranked(stats[key])
+            columns = {
+                name_column: names,
+                count_column: counts,
+                '抽样倍数': factor_column
+            }
+            columns.update(_interval_columns(names, intervals.get(key)))
+            if key == 'freeforms' and freeform_sketch:
+                columns['误差上限'] = [freeform_sketch['errors'].get(name, 0) for name in names]
+            count = write_table(folder, table_name, columns, formats)
+            logger.info(f"{table_name}: {count} 条记录")
     
     # 8. 详细作品信息CSV
     if stats['works']:
-        works_list = []
-        for work in stats['works']:
-            works_list.append({
-                '来源文件': work['source_file'],
-                '标题': work['title'],
-                '作者': work['author'],
-                '年份': work['year'],
-                '评级': work['rating'],
-                '警告标签': '; '.join(work['warnings']),
-                '分类': '; '.join(work['categories']),
-                '角色': '; '.join(work['characters']),
-                '关系': '; '.join(work['relationships']),
-                '同人圈': '; '.join(work['fandoms']),
-                '自由标签': '; '.join(work['freeforms']),
-                '字数': work['words'],
-                '章节': work['chapters'],
-                '点赞数': work['kudos'],
-                '点击量': work['hits'],
-                '书签数': work['bookmarks'],
-                '评论数': work['comments']
-            })
-        
-        works_df = pd.DataFrame(works_list)
-        works_df.to_csv(os.path.join(folder, '作品详细信息.csv'), index=False, encoding='utf-8-sig')
-        print(f"作品详细信息: {len(works_df)} 条记录")
+        count = _write_works_table(stats['works'], folder, formats)
+        logger.info(f"作品详细信息: {count} 条记录")
     
     # 9. 综合统计报告CSV
-    if stats['works']:
+    # analyze_folder 在统计时已经顺带算好了作品级汇总；外部传入的 stats 没有时再遍历作品计算
+    summary = stats.get('summary') or summarize_works(stats['works'], page_weights)
+    if summary['work_count']:
         total_pages = download_info.get('total_pages', 0)
         downloaded_pages = download_info.get('downloaded_pages', 0)
         
         # 计算统计值，考虑抽样倍数
-        total_chars = len(stats['characters'])
-        total_rels = len(stats['relationships'])
-        total_fandoms = len(stats['fandoms'])
-        total_freeforms = len(stats['freeforms'])
-        avg_chars_per_work = sum(len(work['characters']) for work in stats['works']) / len(stats['works']) if stats['works'] else 0
-        avg_rels_per_work = sum(len(work['relationships']) for work in stats['works']) / len(stats['works']) if stats['works'] else 0
-        avg_fandoms_per_work = sum(len(work['fandoms']) for work in stats['works']) / len(stats['works']) if stats['works'] else 0
-        avg_freeforms_per_work = sum(len(work['freeforms']) for work in stats['works']) / len(stats['works']) if stats['works'] else 0
-        avg_words = sum(work['words'] for work in stats['works']) / len(stats['works']) if stats['works'] else 0
-        total_kudos = sum(work['kudos'] for work in stats['works'])
-        total_hits = sum(work['hits'] for work in stats['works'])
+        freeform_count = len(stats['freeforms'])
+        if freeform_sketch and not freeform_sketch['exact']:
+            # 近似统计只保留了一部分标签，不同标签的实际数量更多
+            freeform_count = f"≥{freeform_sketch['tracked']}"
+
+        total_kudos = summary['total_kudos']
+        total_hits = summary['total_hits']
         
-        # 如果是抽样模式，对总量进行估算
-        if is_sampling:
+        # 如果是抽样模式，对总量进行估算；分层抽样时用按页权重累加的总量，与各标签表一致
+        if page_weights:
+            total_kudos = int(round(summary['weighted_total_kudos']))
+            total_hits = int(round(summary['weighted_total_hits']))
+        elif is_sampling:
             total_kudos = int(total_kudos * sampling_factor)
             total_hits = int(total_hits * sampling_factor)
         
-        summary_data = {
+        items = {
             '统计项目': [
                 '分析模式',
                 '总页数',
@@ -208,160 +139,232 @@ def write_csv(stats, folder):
                 sampling_mode,
                 total_pages,
                 downloaded_pages,
-                len(stats['works']),
-                total_chars,
-                total_rels,
-                total_fandoms,
-                total_freeforms,
-                round(avg_chars_per_work, 2),
-                round(avg_rels_per_work, 2),
-                round(avg_fandoms_per_work, 2),
-                round(avg_freeforms_per_work, 2),
-                round(avg_words, 2),
+                summary['work_count'],
+                len(stats['characters']),
+                len(stats['relationships']),
+                len(stats['fandoms']),
+                freeform_count,
+                round(summary['avg_characters_per_work'], 2),
+                round(summary['avg_relationships_per_work'], 2),
+                round(summary['avg_fandoms_per_work'], 2),
+                round(summary['avg_freeforms_per_work'], 2),
+                round(summary['avg_words'], 2),
                 total_kudos,
                 total_hits,
-                sampling_factor if is_sampling else '无'
+                factor_column if is_sampling else '无'
             ]
         }
-        summary_df = pd.DataFrame(summary_data)
-        summary_df.to_csv(os.path.join(folder, '综合统计报告.csv'), index=False, encoding='utf-8-sig')
-        print("综合统计报告已生成")
+        if freeform_sketch:
+            items['统计项目'] += ['自由标签统计方式', '自由标签次数误差上限']
+            items['数值'] += [f"Space-Saving 近似（前 {freeform_sketch['top']} 个，"
+                            f"{freeform_sketch['capacity']} 个计数器）",
+                            freeform_sketch['max_error']]
+        write_table(folder, '综合统计报告', items, formats)
+        logger.info("综合统计报告已生成")
     
     # 10. 分年份统计
-    create_yearly_statistics(yearly_stats, folder, is_sampling, sampling_factor)
+    create_yearly_statistics(yearly_stats, folder, is_sampling, sampling_factor, formats,
+                             freeform_sketch=freeform_sketch, stratified=bool(page_weights))
     
     # 11. 对比分析报告
     create_comparison_report(stats, folder)
 
-def create_yearly_statistics(yearly_stats, output_folder, is_sampling=False, sampling_factor=1.0):
+    # 12. 标签共现（stats 中有 compute_cooccurrence 的结果时）
+    if stats.get('cooccurrence'):
+        write_cooccurrence(stats['cooccurrence'], folder, factor_column, formats)
+
+# 共现表：名称 -> (表名, A 列名, B 列名)，与 parser_folder.cooccurrence.COOCCURRENCE_PAIRS 对应
+COOCCURRENCE_TABLES = {
+    'characters': ('角色共现', '角色A', '角色B'),
+    'relationships_freeforms': ('关系-自由标签共现', '关系', '自由标签'),
+}
+
+def _cooccurrence_columns(table, a_column, b_column, factor_column):
+    return {
+        a_column: table['a'],
+        b_column: table['b'],
+        '共现作品数': table['count'],
+        f'{a_column}作品数': table['a_count'],
+        f'{b_column}作品数': table['b_count'],
+        'lift': table['lift'],
+        'PMI': table['pmi'],
+        '抽样倍数': factor_column
+    }
+
+def write_cooccurrence(cooccurrence, output_folder, factor_column=1.0, formats=("csv",)):
+    """标签共现表写到 共现分析/ 下：每种组合一张总表和一张分年份表，按共现作品数从高到低"""
+    folder = os.path.join(output_folder, "共现分析")
+    os.makedirs(folder, exist_ok=True)
+    for name, result in cooccurrence.items():
+        table_name, a_column, b_column = COOCCURRENCE_TABLES.get(name, (name, 'A', 'B'))
+        count = write_table(folder, table_name,
+                            _cooccurrence_columns(result['overall'], a_column, b_column, factor_column), formats)
+        logger.info(f"{table_name}: {count} 条记录")
+
+        years = []
+        yearly = {key: [] for key in ('a', 'b', 'count', 'a_count', 'b_count', 'lift', 'pmi')}
+        for year, table in result['yearly'].items():
+            years.extend([year] * len(table['a']))
+            for key, values in yearly.items():
+                values.extend(table[key])
+        columns = dict({'年份': years}, **_cooccurrence_columns(yearly, a_column, b_column, factor_column))
+        count = write_table(folder, f'分年份{table_name}', columns, formats)
+        logger.info(f"分年份{table_name}: {count} 条记录")
+
+def _write_compared_table(folder, table_name, name_column, counter, filter_counter, is_sampling,
+                          factor_column, formats, field_intervals=None):
+    """角色 / 关系统计表：附带 filter 中的准确次数和数据来源"""
+    names, counts = ranked(counter)
+    filter_counts = [filter_counter.get(name, '') for name in names]
+    columns = {
+        name_column: names,
+        '统计次数': counts,
+        'filter准确次数': filter_counts,
+        '数据来源': ['抽样估算' if is_sampling and not fc else '准确统计' for fc in filter_counts],
+        '抽样倍数': factor_column
+    }
+    columns.update(_interval_columns(names, field_intervals))
+    return write_table(folder, table_name, columns, formats)
+
+def _interval_columns(names, field_intervals):
+    """置信区间上下限两列；只有被跟踪的主要标签有值，其余留空。没有区间信息时不加列"""
+    if not field_intervals:
+        return {}
+    lows = [field_intervals[name]['low'] if name in field_intervals else '' for name in names]
+    highs = [field_intervals[name]['high'] if name in field_intervals else '' for name in names]
+    return {'置信区间下限': lows, '置信区间上限': highs}
+
+def _iter_work_rows(works):
+    """逐个作品产出一行；WorkStore 直接按列读取，不构造中间 dict"""
+    if not hasattr(works, 'tag_column'):
+        for work in works:
+            yield [('; '.join(work[key]) if key in JOINED_FIELDS else work[key]) for _, key in WORK_COLUMNS]
+        return
+
+    names = works.vocab.names
+    tag_columns = {key: works.tag_column(key) for key in JOINED_FIELDS}
+    for index in range(len(works)):
+        row = []
+        for _, key in WORK_COLUMNS:
+            if key in tag_columns:
+                ids, offsets = tag_columns[key]
+                row.append('; '.join([names[tag_id] for tag_id in ids[offsets[index]:offsets[index + 1]]]))
+            else:
+                row.append(works.value(index, key))
+        yield row
+
+def _write_works_table(works, folder, formats):
+    header = [title for title, _ in WORK_COLUMNS]
+    count = 0
+    if "csv" in formats:
+        count = write_rows(folder, '作品详细信息', header, _iter_work_rows(works))
+    columnar = [fmt for fmt in formats if fmt != "csv"]
+    if columnar:
+        columns = {title: [] for title in header}
+        for row in _iter_work_rows(works):
+            for title, value in zip(header, row):
+                columns[title].append(value)
+        count = write_table(folder, '作品详细信息', columns, columnar)
+    return count
+
+def summarize_works(works, page_weights=None):
+    """从作品列表计算综合统计报告所需的汇总值（与 WorkAggregator.summary 相同的键）"""
+    n = len(works)
+    summary = {'work_count': n}
+    for field in ('characters', 'relationships', 'fandoms', 'freeforms'):
+        summary[f'avg_{field}_per_work'] = sum(len(work[field]) for work in works) / n if n else 0
+    summary['avg_words'] = sum(work['words'] for work in works) / n if n else 0
+    summary['total_kudos'] = sum(work['kudos'] for work in works)
+    summary['total_hits'] = sum(work['hits'] for work in works)
+    if page_weights:
+        for field in WEIGHTED_TOTAL_FIELDS:
+            summary[f'weighted_total_{field}'] = sum(work[field] * page_weights.get(work['source_file'], 1.0)
+                                                     for work in works)
+    return summary
+
+def _write_yearly_table(yearly_folder, table_name, name_column, count_column, nested, factor_column, formats,
+                        yearly_errors=None):
+    """分年份表：年份按原顺序，年份内按次数从高到低；yearly_errors 为近似统计时各年的误差上限"""
+    years, names, counts, errors = [], [], [], []
+    for year, counter in nested.items():
+        year_names, year_counts = ranked(counter)
+        years.extend([year] * len(year_names))
+        names.extend(year_names)
+        counts.extend(year_counts)
+        if yearly_errors is not None:
+            year_errors = yearly_errors.get(year, {})
+            errors.extend(year_errors.get(name, 0) for name in year_names)
+    columns = {
+        '年份': years,
+        name_column: names,
+        count_column: counts,
+        '抽样倍数': factor_column
+    }
+    if yearly_errors is not None:
+        columns['误差上限'] = errors
+    return write_table(yearly_folder, table_name, columns, formats)
+
+def create_yearly_statistics(yearly_stats, output_folder, is_sampling=False, sampling_factor=1.0,
+                             formats=("csv",), yearly_work_counts=None, freeform_sketch=None, stratified=False):
     """
     创建分年份统计CSV文件
+    yearly_work_counts: 已知的各年份准确作品数（快速估计模式），不传时从标签计数估计
+    freeform_sketch: 自由标签近似统计的信息，分年份自由标签表附带误差上限列
+    stratified: 分层抽样（按页加权），抽样倍数列标为分层加权
     """
     yearly_folder = os.path.join(output_folder, "分年份统计")
     os.makedirs(yearly_folder, exist_ok=True)
+    if stratified:
+        factor_column = STRATIFIED_FACTOR
+    else:
+        factor_column = sampling_factor if is_sampling else 1.0
     
-    print("生成分年份统计...")
-    
-    # 分年份角色统计
-    if yearly_stats['characters']:
-        yearly_chars = []
-        for year, characters in yearly_stats['characters'].items():
-            for char, count in sorted(characters.items(), key=lambda x: x[1], reverse=True):
-                yearly_chars.append({
-                    '年份': year,
-                    '角色名称': char,
-                    '出现次数': count,
-                    '抽样倍数': sampling_factor if is_sampling else 1.0
-                })
-        
-        yearly_chars_df = pd.DataFrame(yearly_chars)
-        yearly_chars_df.to_csv(os.path.join(yearly_folder, '分年份角色统计.csv'), index=False, encoding='utf-8-sig')
-        print(f"分年份角色统计: {len(yearly_chars_df)} 条记录")
-    
-    # 分年份关系统计
-    if yearly_stats['relationships']:
-        yearly_rels = []
-        for year, relationships in yearly_stats['relationships'].items():
-            for rel, count in sorted(relationships.items(), key=lambda x: x[1], reverse=True):
-                yearly_rels.append({
-                    '年份': year,
-                    '关系名称': rel,
-                    '出现次数': count,
-                    '抽样倍数': sampling_factor if is_sampling else 1.0
-                })
-        
-        yearly_rels_df = pd.DataFrame(yearly_rels)
-        yearly_rels_df.to_csv(os.path.join(yearly_folder, '分年份关系统计.csv'), index=False, encoding='utf-8-sig')
-        print(f"分年份关系统计: {len(yearly_rels_df)} 条记录")
-    
-    # 分年份评级统计
-    if yearly_stats['ratings']:
-        yearly_ratings = []
-        for year, ratings in yearly_stats['ratings'].items():
-            for rating, count in sorted(ratings.items(), key=lambda x: x[1], reverse=True):
-                yearly_ratings.append({
-                    '年份': year,
-                    '评级类型': rating,
-                    '作品数量': count,
-                    '抽样倍数': sampling_factor if is_sampling else 1.0
-                })
-        
-        yearly_ratings_df = pd.DataFrame(yearly_ratings)
-        yearly_ratings_df.to_csv(os.path.join(yearly_folder, '分年份评级统计.csv'), index=False, encoding='utf-8-sig')
-        print(f"分年份评级统计: {len(yearly_ratings_df)} 条记录")
+    logger.info("生成分年份统计...")
     
-    # 分年份分类统计
-    if yearly_stats['categories']:
-        yearly_categories = []
-        for year, categories in yearly_stats['categories'].items():
-            for category, count in sorted(categories.items(), key=lambda x: x[1], reverse=True):
-                yearly_categories.append({
-                    '年份': year,
-                    '分类类型': category,
-                    '作品数量': count,
-                    '抽样倍数': sampling_factor if is_sampling else 1.0
-                })
-        
-        yearly_categories_df = pd.DataFrame(yearly_categories)
-        yearly_categories_df.to_csv(os.path.join(yearly_folder, '分年份分类统计.csv'), index=False, encoding='utf-8-sig')
-        print(f"分年份分类统计: {len(yearly_categories_df)} 条记录")
-    
-    # 分年份同人圈统计
-    if yearly_stats['fandoms']:
-        yearly_fandoms = []
-        for year, fandoms in yearly_stats['fandoms'].items():
-            for fandom, count in sorted(fandoms.items(), key=lambda x: x[1], reverse=True):
-                yearly_fandoms.append({
-                    '年份': year,
-                    '同人圈名称': fandom,
-                    '出现次数': count,
-                    '抽样倍数': sampling_factor if is_sampling else 1.0
-                })
-        
-        yearly_fandoms_df = pd.DataFrame(yearly_fandoms)
-        yearly_fandoms_df.to_csv(os.path.join(yearly_folder, '分年份同人圈统计.csv'), index=False, encoding='utf-8-sig')
-        print(f"分年份同人圈统计: {len(yearly_fandoms_df)} 条记录")
-    
-    # 分年份自由标签统计
-    if yearly_stats['freeforms']:
-        yearly_freeforms = []
-        for year, freeforms in yearly_stats['freeforms'].items():
-            for freeform, count in sorted(freeforms.items(), key=lambda x: x[1], reverse=True):
-                yearly_freeforms.append({
-                    '年份': year,
-                    '自由标签': freeform,
-                    '出现次数': count,
-                    '抽样倍数': sampling_factor if is_sampling else 1.0
-                })
-        
-        yearly_freeforms_df = pd.DataFrame(yearly_freeforms)
-        yearly_freeforms_df.to_csv(os.path.join(yearly_folder, '分年份自由标签统计.csv'), index=False, encoding='utf-8-sig')
-        print(f"分年份自由标签统计: {len(yearly_freeforms_df)} 条记录")
+    yearly_tables = [
+        ('characters', '分年份角色统计', '角色名称', '出现次数'),
+        ('relationships', '分年份关系统计', '关系名称', '出现次数'),
+        ('ratings', '分年份评级统计', '评级类型', '作品数量'),
+        ('categories', '分年份分类统计', '分类类型', '作品数量'),
+        ('fandoms', '分年份同人圈统计', '同人圈名称', '出现次数'),
+        ('freeforms', '分年份自由标签统计', '自由标签', '出现次数'),
+    ]
+    for key, table_name, name_column, count_column in yearly_tables:
+        if yearly_stats.get(key):
+            yearly_errors = freeform_sketch['yearly_errors'] if key == 'freeforms' and freeform_sketch else None
+            count = _write_yearly_table(yearly_folder, table_name, name_column, count_column,
+                                        yearly_stats[key], factor_column, formats, yearly_errors)
+            logger.info(f"{table_name}: {count} 条记录")
     
     # 年份作品数量统计
-    yearly_works_count = {}
-    for year_data in [yearly_stats['characters'], yearly_stats['relationships'], yearly_stats['ratings']]:
-        for year in year_data:
-            if year not in yearly_works_count:
-                yearly_works_count[year] = 0
-            # 使用任意一个标签类型的最大值作为该年份的作品数估计
-            yearly_works_count[year] = max(yearly_works_count[year], sum(year_data[year].values()))
+    if yearly_work_counts is not None:
+        yearly_works_count = dict(yearly_work_counts)
+    else:
+        yearly_works_count = {}
+        for year_data in [yearly_stats.get('characters', {}), yearly_stats.get('relationships', {}),
+                          yearly_stats.get('ratings', {})]:
+            for year in year_data:
+                if year not in yearly_works_count:
+                    yearly_works_count[year] = 0
+                # 使用任意一个标签类型的最大值作为该年份的作品数估计
+                yearly_works_count[year] = max(yearly_works_count[year], sum(year_data[year].values()))
     
-    yearly_works_df = pd.DataFrame([
-        {
-            '年份': year, 
-            '作品数量': count,
-            '抽样倍数': sampling_factor if is_sampling else 1.0
-        }
-        for year, count in sorted(yearly_works_count.items(), key=lambda x: x[0])
-    ])
-    yearly_works_df.to_csv(os.path.join(yearly_folder, '分年份作品数量.csv'), index=False, encoding='utf-8-sig')
-    print(f"分年份作品数量: {len(yearly_works_df)} 条记录")
+    years = sorted(yearly_works_count)
+    columns = {
+        '年份': years,
+        '作品数量': [yearly_works_count[year] for year in years],
+        '抽样倍数': factor_column
+    } if years else {}
+    count = write_table(yearly_folder, '分年份作品数量', columns, formats)
+    logger.info(f"分年份作品数量: {count} 条记录")
 
+@PROFILER.profiled("create_comparison_report")
 def create_comparison_report(analysis_data, output_folder):
     """
     创建对比分析报告
     """
+    import pandas as pd
+
     filter_stats = analysis_data.get('filter_stats', {})
     download_info = analysis_data.get('download_info', {})
     is_sampling = download_info.get('is_sampling', False)
@@ -369,7 +372,7 @@ def create_comparison_report(analysis_data, output_folder):
     comparison_folder = os.path.join(output_folder, "对比分析")
     os.makedirs(comparison_folder, exist_ok=True)
     
-    print("生成对比分析报告...")
+    logger.info("生成对比分析报告...")
     
     # 角色对比分析
     if filter_stats.get('characters') and analysis_data.get('characters'):
@@ -387,7 +390,8 @@ def create_comparison_report(analysis_data, output_folder):
         
         comparison_chars_df = pd.DataFrame(comparison_chars)
         comparison_chars_df.to_csv(os.path.join(comparison_folder, '角色对比分析.csv'), index=False, encoding='utf-8-sig')
-        print(f"角色对比分析: {len(comparison_chars_df)} 条记录")
+        METRICS.count("files_exported")
+        logger.info(f"角色对比分析: {len(comparison_chars_df)} 条记录")
     
     # 关系对比分析
     if filter_stats.get('relationships') and analysis_data.get('relationships'):
@@ -405,7 +409,8 @@ def create_comparison_report(analysis_data, output_folder):
         
         comparison_rels_df = pd.DataFrame(comparison_rels)
         comparison_rels_df.to_csv(os.path.join(comparison_folder, '关系对比分析.csv'), index=False, encoding='utf-8-sig')
-        print(f"关系对比分析: {len(comparison_rels_df)} 条记录")
+        METRICS.count("files_exported")
+        logger.info(f"关系对比分析: {len(comparison_rels_df)} 条记录")
     
     # 生成对比总结报告
     create_comparison_summary(analysis_data, comparison_folder)
@@ -414,6 +419,8 @@ def create_comparison_summary(analysis_data, comparison_folder):
     """
     创建对比总结报告
     """
+    import pandas as pd
+
     filter_stats = analysis_data.get('filter_stats', {})
     download_info = analysis_data.get('download_info', {})
     is_sampling = download_info.get('is_sampling', False)
@@ -450,4 +457,51 @@ def create_comparison_summary(analysis_data, comparison_folder):
     if summary_data:
         summary_df = pd.DataFrame(summary_data)
         summary_df.to_csv(os.path.join(comparison_folder, '对比总结报告.csv'), index=False, encoding='utf-8-sig')
-        print("对比总结报告已生成")
\ No newline at end of file
+        METRICS.count("files_exported")
+        logger.info("对比总结报告已生成")
+
+FILTER_FIELD_LABELS = {
+    'characters': '角色',
+    'relationships': '关系',
+    'ratings': '评级',
+    'warnings': '警告',
+    'categories': '分类',
+    'fandoms': '同人圈',
+}
+CROSSTAB_LABELS = {'rating': '评级', 'relationship': '关系'}
+
+@METRICS.timed("export")
+def write_fast_estimate(estimate, folder, formats=("csv",)):
+    """
+    快速估计模式的输出：筛选栏总体计数、分年份统计（准确计数，不做抽样放大）和交叉统计。
+    estimate 为 download.fast_estimate.fast_estimate 的返回值。
+    """
+    ensure_folder(folder)
+    check_formats(formats)
+    logger.info(f"正在生成CSV文件到: {os.path.abspath(folder)}")
+
+    fields, names, counts = [], [], []
+    for field, counter in estimate['filter_stats'].items():
+        tag_names, tag_counts = ranked(counter)
+        fields.extend([FILTER_FIELD_LABELS.get(field, field)] * len(tag_names))
+        names.extend(tag_names)
+        counts.extend(tag_counts)
+    count = write_table(folder, '筛选栏统计', {'字段': fields, '标签': names, '作品数量': counts}, formats)
+    logger.info(f"筛选栏统计: {count} 条记录")
+
+    create_yearly_statistics(estimate['yearly_stats'], folder, formats=formats,
+                             yearly_work_counts=estimate['yearly_works'])
+
+    columns = {name: [] for name in ('筛选维度', '筛选值', '筛选后作品数', '字段', '标签', '作品数量')}
+    for dimension, per_value in estimate['crosstabs'].items():
+        for value, result in per_value.items():
+            for field, counter in result['stats'].items():
+                tag_names, tag_counts = ranked(counter)
+                columns['筛选维度'].extend([CROSSTAB_LABELS.get(dimension, dimension)] * len(tag_names))
+                columns['筛选值'].extend([value] * len(tag_names))
+                columns['筛选后作品数'].extend([result['works']] * len(tag_names))
+                columns['字段'].extend([FILTER_FIELD_LABELS.get(field, field)] * len(tag_names))
+                columns['标签'].extend(tag_names)
+                columns['作品数量'].extend(tag_counts)
+    count = write_table(folder, '交叉统计', columns, formats)
+    logger.info(f"交叉统计: {count} 条记录")
\ No newline at end of file
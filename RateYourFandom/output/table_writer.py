@@ -0,0 +1,105 @@
+import os
+import csv
+from array import array
+
+from utils.metrics import METRICS
+
+# 可选的快速格式（需要 pyarrow）；csv 始终可用
+SUPPORTED_FORMATS = ("csv", "parquet", "arrow")
+
+
+def _is_scalar(values):
+    return isinstance(values, (str, bytes)) or not hasattr(values, "__len__")
+
+
+def _table_length(columns):
+    for values in columns.values():
+        if not _is_scalar(values):
+            return len(values)
+    return 0
+
+
+def _column_lists(columns, n):
+    """标量列广播成等长列表"""
+    return {name: ([values] * n if _is_scalar(values) else values) for name, values in columns.items()}
+
+
+def write_table(folder, name, columns, formats=("csv",)):
+    """
+    按列写出一张表，返回记录数。
+    参数:
+      - folder / name: 输出目录和不带扩展名的文件名
+      - columns: {列名: 等长序列或标量}，标量会广播到每一行
+      - formats: 'csv'（utf-8-sig，与原来 pandas 输出一致）、'parquet'、'arrow'
+    """
+    check_formats(formats)
+    n = _table_length(columns)
+    columns = _column_lists(columns, n)
+    if "csv" in formats:
+        write_rows(folder, name, list(columns), zip(*columns.values()))
+    arrow_formats = [fmt for fmt in formats if fmt != "csv"]
+    if arrow_formats:
+        _write_arrow(folder, name, columns, arrow_formats)
+    return n
+
+
+def write_rows(folder, name, header, rows):
+    """逐行流式写 CSV，不在内存中攒整张表，返回记录数"""
+    path = os.path.join(folder, name + ".csv")
+    count = 0
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        if not header:
+            f.write(os.linesep)
+            return 0
+        writer = csv.writer(f, lineterminator=os.linesep)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    METRICS.count("files_exported")
+    METRICS.count("rows_exported", count)
+    return count
+
+
+def check_formats(formats):
+    for fmt in formats:
+        if fmt not in SUPPORTED_FORMATS:
+            raise ValueError(f"不支持的输出格式: {fmt}（可选: {', '.join(SUPPORTED_FORMATS)}）")
+
+
+def _arrow_values(values):
+    """pyarrow 不接受混合类型的列：'' 与数值混排时 '' 视为空值，其余混排一律转成字符串"""
+    if isinstance(values, array):
+        return values
+    types = {type(v) for v in values if v != ""}
+    if "" in values and types <= {int, float}:
+        return [None if v == "" else v for v in values]
+    if len(types) > 1 and not types <= {int, float}:
+        return ["" if v is None else str(v) for v in values]
+    return values
+
+
+def _write_arrow(folder, name, columns, formats):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("parquet / arrow 输出需要安装 pyarrow")
+
+    table = pa.table({column: _arrow_values(values) for column, values in columns.items()})
+    if "parquet" in formats:
+        import pyarrow.parquet as pq
+        pq.write_table(table, os.path.join(folder, name + ".parquet"))
+        METRICS.count("files_exported")
+    if "arrow" in formats:
+        import pyarrow.feather as feather
+        feather.write_feather(table, os.path.join(folder, name + ".arrow"))
+        METRICS.count("files_exported")
+
+
+def ranked(counter):
+    """按次数从高到低排序（次数相同保持原顺序），拆成 (名称列, 次数列)"""
+    items = sorted(counter.items(), key=lambda x: x[1], reverse=True)
+    if not items:
+        return [], []
+    names, counts = zip(*items)
+    return list(names), list(counts)
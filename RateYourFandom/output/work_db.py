@@ -0,0 +1,420 @@
+"""
+本地作品库（SQLite），跨次运行、跨同人圈保存分析结果，报表直接从库里查询生成。
+
+表结构:
+  runs       每次分析一行
+             run_id, tag_url, folder, created_at, sampling_mode, sampling_factor, is_sampling,
+             total_pages, total_works, downloaded_pages, download_info（完整的 download_info.json）
+  works      每个作品一行，保存最近一次看到的版本（报表不从这里取数，各次运行的数据见 run_works）
+             work_id（AO3 作品编号，主键）, url, title, author, rating, chapters, words, kudos, hits,
+             bookmarks, comments, year（未知为 NULL）, first_run, last_run
+  tags       每个不同的标签一行
+             tag_id, kind（warnings / categories / fandoms / relationships / characters / freeforms）,
+             name（原文）, norm_name（标准化后的名称，统计角色/关系/同人圈时按它分组）
+  work_tags  作品最近一次看到的标签（同一标签在一个作品中可能出现多次）
+             work_id, tag_id, position（类型序号 * 10000 + 标签在该类型中的顺序）
+  run_works  某次运行分析到的作品，seq 为分析顺序（同一作品在一次运行中出现两次时也记两行），
+             同时保存当次看到的标题、作者、分级、年份和数值统计，之后的运行不会改写
+             run_id, seq, work_id, source_file, title, author, rating, year, chapters, words, kudos, hits,
+             bookmarks, comments
+  run_work_tags  某次运行中作品的标签快照，position 与 work_tags 相同
+             run_id, seq, tag_id, position
+
+索引: works(year)、tags(norm_name)、work_tags(tag_id)、run_works(work_id)、run_work_tags(tag_id)
+
+用法（在 RateYourFandom 目录下）:
+    python -m output.work_db runs ao3_works.db
+    python -m output.work_db report ao3_works.db ao3_csv_output [--run 3]
+"""
+import sys
+import json
+import sqlite3
+import argparse
+from datetime import datetime
+
+from parser_folder.work_schema import work_id_from_url, new_work
+from parser_folder.tag_statistics import _normalize_tag
+from parser_folder.aggregator import NUMERIC_FIELDS, TAG_LIST_FIELDS, WEIGHTED_TOTAL_FIELDS
+from utils.log import setup_logging, add_log_level_argument
+
+TAG_KINDS = ("warnings", "categories", "fandoms", "relationships", "characters", "freeforms")
+RUN_STAT_COLUMNS = ("chapters", "words", "kudos", "hits", "bookmarks", "comments")
+# 角色 / 关系 / 同人圈按标准化名称统计，同一作品内只计一次；其余标签去掉空白后逐个计数
+NORMALIZED_KINDS = ("characters", "relationships", "fandoms")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tag_url TEXT,
+    folder TEXT,
+    created_at TEXT NOT NULL,
+    sampling_mode TEXT,
+    sampling_factor REAL NOT NULL DEFAULT 1.0,
+    is_sampling INTEGER NOT NULL DEFAULT 0,
+    total_pages INTEGER,
+    total_works INTEGER,
+    downloaded_pages INTEGER,
+    download_info TEXT
+);
+CREATE TABLE IF NOT EXISTS works (
+    work_id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    title TEXT,
+    author TEXT,
+    rating TEXT,
+    chapters TEXT,
+    words INTEGER,
+    kudos INTEGER,
+    hits INTEGER,
+    bookmarks INTEGER,
+    comments INTEGER,
+    year INTEGER,
+    first_run INTEGER REFERENCES runs(run_id),
+    last_run INTEGER REFERENCES runs(run_id)
+);
+CREATE TABLE IF NOT EXISTS tags (
+    tag_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    norm_name TEXT,
+    UNIQUE (kind, name)
+);
+CREATE TABLE IF NOT EXISTS work_tags (
+    work_id INTEGER NOT NULL REFERENCES works(work_id),
+    tag_id INTEGER NOT NULL REFERENCES tags(tag_id),
+    position INTEGER NOT NULL,
+    PRIMARY KEY (work_id, position)
+);
+CREATE TABLE IF NOT EXISTS run_works (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    seq INTEGER NOT NULL,
+    work_id INTEGER NOT NULL REFERENCES works(work_id),
+    source_file TEXT,
+    title TEXT,
+    author TEXT,
+    rating TEXT,
+    year INTEGER,
+    chapters TEXT,
+    words INTEGER,
+    kudos INTEGER,
+    hits INTEGER,
+    bookmarks INTEGER,
+    comments INTEGER,
+    PRIMARY KEY (run_id, seq)
+);
+CREATE TABLE IF NOT EXISTS run_work_tags (
+    run_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    tag_id INTEGER NOT NULL REFERENCES tags(tag_id),
+    position INTEGER NOT NULL,
+    PRIMARY KEY (run_id, seq, position),
+    FOREIGN KEY (run_id, seq) REFERENCES run_works(run_id, seq)
+);
+CREATE INDEX IF NOT EXISTS idx_works_year ON works(year);
+CREATE INDEX IF NOT EXISTS idx_tags_norm_name ON tags(norm_name);
+CREATE INDEX IF NOT EXISTS idx_work_tags_tag ON work_tags(tag_id);
+CREATE INDEX IF NOT EXISTS idx_run_works_work ON run_works(work_id);
+CREATE INDEX IF NOT EXISTS idx_run_work_tags_tag ON run_work_tags(tag_id);
+"""
+
+_UPSERT_WORK = """
+INSERT INTO works (work_id, url, title, author, rating, chapters, words, kudos, hits, bookmarks, comments,
+                   year, first_run, last_run)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(work_id) DO UPDATE SET
+    url = excluded.url, title = excluded.title, author = excluded.author, rating = excluded.rating,
+    chapters = excluded.chapters, words = excluded.words, kudos = excluded.kudos, hits = excluded.hits,
+    bookmarks = excluded.bookmarks, comments = excluded.comments, year = excluded.year,
+    last_run = excluded.last_run
+"""
+
+
+class WorkDB:
+    """作品库连接。写入按批进行：add_works 一次写一页的作品，finish_run 时提交"""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        self._tag_ids = None
+        self._next_seq = {}
+        self.skipped = 0
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- 写入 ----------
+
+    def start_run(self, info, tag_url=None, folder=None):
+        """登记一次运行，返回 run_id"""
+        cursor = self.conn.execute(
+            "INSERT INTO runs (tag_url, folder, created_at, sampling_mode, sampling_factor, is_sampling, "
+            "total_pages, total_works, downloaded_pages, download_info) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (tag_url, folder, datetime.now().isoformat(timespec="seconds"), info.get("sampling_mode"),
+             float(info.get("sampling_factor", 1.0) or 1.0), int(bool(info.get("is_sampling", False))),
+             info.get("total_pages"), info.get("total_works"), info.get("downloaded_pages"),
+             json.dumps(info, ensure_ascii=False)))
+        self._next_seq[cursor.lastrowid] = 0
+        return cursor.lastrowid
+
+    def _tag_id(self, kind, name):
+        if self._tag_ids is None:
+            self._tag_ids = {(k, n): i for i, k, n in self.conn.execute("SELECT tag_id, kind, name FROM tags")}
+        key = (kind, name)
+        tag_id = self._tag_ids.get(key)
+        if tag_id is None:
+            tag_id = self.conn.execute("INSERT INTO tags (kind, name, norm_name) VALUES (?, ?, ?)",
+                                       (kind, name, _normalize_tag(name))).lastrowid
+            self._tag_ids[key] = tag_id
+        return tag_id
+
+    def add_works(self, run_id, works):
+        """
+        批量写入一组作品：作品表 upsert，最新标签整体替换；本次运行另存一份作品和标签的快照。
+        没有作品编号的作品跳过
+        """
+        work_rows, tag_rows, run_rows, run_tag_rows, work_ids = [], [], [], [], []
+        seq = self._next_seq.get(run_id, 0)
+        for work in works:
+            work_id = work_id_from_url(work["url"])
+            if work_id is None:
+                self.skipped += 1
+                continue
+            year = int(work["year"]) if str(work["year"]).isdigit() else None
+            work_rows.append((work_id, work["url"], work["title"], work["author"], work["rating"],
+                              work["chapters"], work["words"], work["kudos"], work["hits"], work["bookmarks"],
+                              work["comments"], year, run_id, run_id))
+            work_ids.append((work_id,))
+            for kind_index, kind in enumerate(TAG_KINDS):
+                for position, name in enumerate(work[kind]):
+                    tag_id = self._tag_id(kind, name)
+                    tag_rows.append((work_id, tag_id, kind_index * 10000 + position))
+                    run_tag_rows.append((run_id, seq, tag_id, kind_index * 10000 + position))
+            run_rows.append((run_id, seq, work_id, work["source_file"], work["title"], work["author"],
+                             work["rating"], year) + tuple(work[column] for column in RUN_STAT_COLUMNS))
+            seq += 1
+        self._next_seq[run_id] = seq
+
+        self.conn.executemany(_UPSERT_WORK, work_rows)
+        self.conn.executemany("DELETE FROM work_tags WHERE work_id = ?", work_ids)
+        self.conn.executemany("INSERT OR IGNORE INTO work_tags (work_id, tag_id, position) VALUES (?, ?, ?)",
+                              tag_rows)
+        self.conn.executemany(
+            "INSERT INTO run_works (run_id, seq, work_id, source_file, title, author, rating, year, chapters, "
+            "words, kudos, hits, bookmarks, comments) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", run_rows)
+        self.conn.executemany("INSERT OR IGNORE INTO run_work_tags (run_id, seq, tag_id, position) "
+                              "VALUES (?, ?, ?, ?)", run_tag_rows)
+        return len(run_rows)
+
+    def finish_run(self):
+        self.conn.commit()
+
+    # ---------- 查询 ----------
+
+    def runs(self):
+        cursor = self.conn.execute(
+            "SELECT r.run_id, r.created_at, r.tag_url, r.folder, r.sampling_mode, COUNT(rw.seq) "
+            "FROM runs r LEFT JOIN run_works rw ON rw.run_id = r.run_id GROUP BY r.run_id ORDER BY r.run_id")
+        return cursor.fetchall()
+
+    def latest_run(self):
+        row = self.conn.execute("SELECT MAX(run_id) FROM runs").fetchone()
+        return row[0]
+
+    def run_info(self, run_id):
+        row = self.conn.execute("SELECT download_info FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"作品库中没有第 {run_id} 次运行")
+        return json.loads(row[0] or "{}")
+
+    def tag_counts(self, run_id, kind, page_weights=None):
+        """
+        某次运行中一类标签的计数，返回 (总计数, 分年份计数)，均按首次出现的顺序排列。
+        计数规则与 WorkAggregator 相同；page_weights 为分层抽样的每页权重。
+        标签和年份都取该次运行的快照，不受之后运行的影响。
+        """
+        if kind in NORMALIZED_KINDS:
+            # 同一作品内标准化后相同的标签只计一次：先按 (出现, 标准化名称) 去重
+            rows = self.conn.execute("""
+                SELECT year, norm_name, source_file, COUNT(*), MIN(first_pos) FROM (
+                    SELECT rw.seq, rw.year AS year, t.norm_name AS norm_name, rw.source_file AS source_file,
+                           MIN(rw.seq * 1000000 + rt.position) AS first_pos
+                    FROM run_works rw
+                    JOIN run_work_tags rt ON rt.run_id = rw.run_id AND rt.seq = rw.seq
+                    JOIN tags t ON t.tag_id = rt.tag_id
+                    WHERE rw.run_id = ? AND t.kind = ? AND t.norm_name IS NOT NULL
+                    GROUP BY rw.seq, t.norm_name
+                ) GROUP BY year, norm_name, source_file
+            """, (run_id, kind)).fetchall()
+        else:
+            # 标准化名称为空即原文只有空白，与 WorkAggregator 的 strip() 判断一致
+            rows = self.conn.execute("""
+                SELECT rw.year, t.name, rw.source_file, COUNT(*), MIN(rw.seq * 1000000 + rt.position)
+                FROM run_works rw
+                JOIN run_work_tags rt ON rt.run_id = rw.run_id AND rt.seq = rw.seq
+                JOIN tags t ON t.tag_id = rt.tag_id
+                WHERE rw.run_id = ? AND t.kind = ? AND t.norm_name IS NOT NULL
+                GROUP BY rw.year, t.name, rw.source_file
+            """, (run_id, kind)).fetchall()
+        return _ordered_counts(rows, page_weights)
+
+    def rating_counts(self, run_id, page_weights=None):
+        rows = self.conn.execute("""
+            SELECT year, rating, source_file, COUNT(*), MIN(seq)
+            FROM run_works
+            WHERE run_id = ? AND TRIM(COALESCE(rating, '')) != ''
+            GROUP BY year, rating, source_file
+        """, (run_id,)).fetchall()
+        return _ordered_counts(rows, page_weights)
+
+    def run_works(self, run_id):
+        """按分析顺序逐个产出作品 dict（除链接外都取当次运行看到的值）"""
+        tags = {}
+        for seq, kind, name in self.conn.execute("""
+                SELECT rt.seq, t.kind, t.name FROM run_work_tags rt JOIN tags t ON t.tag_id = rt.tag_id
+                WHERE rt.run_id = ? ORDER BY rt.seq, rt.position""", (run_id,)):
+            tags.setdefault(seq, {}).setdefault(kind, []).append(name)
+        for row in self.conn.execute("""
+                SELECT rw.seq, rw.source_file, rw.title, rw.author, w.url, rw.rating, rw.year,
+                       rw.chapters, rw.words, rw.kudos, rw.hits, rw.bookmarks, rw.comments
+                FROM run_works rw JOIN works w ON w.work_id = rw.work_id
+                WHERE rw.run_id = ? ORDER BY rw.seq""", (run_id,)):
+            work = new_work(row[1])
+            work.update(title=row[2], author=row[3], url=row[4], rating=row[5],
+                        year=str(row[6]) if row[6] is not None else "未知")
+            work.update(zip(RUN_STAT_COLUMNS, row[7:]))
+            for kind, names in tags.get(row[0], {}).items():
+                work[kind] = names
+            yield work
+
+    def tag_trend(self, kind, norm_name):
+        """跨运行查询：某个标签在每次运行中出现的作品数 [(run_id, tag_url, 作品数), ...]"""
+        return self.conn.execute("""
+            SELECT r.run_id, r.tag_url, COUNT(DISTINCT rt.seq)
+            FROM runs r
+            JOIN run_work_tags rt ON rt.run_id = r.run_id
+            JOIN tags t ON t.tag_id = rt.tag_id
+            WHERE t.kind = ? AND t.norm_name = ?
+            GROUP BY r.run_id ORDER BY r.run_id
+        """, (kind, norm_name)).fetchall()
+
+
+def _ordered_counts(rows, page_weights=None):
+    """
+    rows: (年份, 标签, 来源文件, 次数, 首次出现位置)
+    -> ({标签: 次数}, {年份: {标签: 次数}})，都按首次出现排列；有分层权重时次数为加权和
+    """
+    rows.sort(key=lambda row: row[4])
+    overall = {}
+    yearly = {}
+    for year, name, source_file, count, _ in rows:
+        if page_weights is not None:
+            count *= page_weights.get(source_file, 1.0)
+        year = str(year) if year is not None else "未知"
+        overall[name] = overall.get(name, 0) + count
+        per_year = yearly.setdefault(year, {})
+        per_year[name] = per_year.get(name, 0) + count
+    return overall, yearly
+
+
+def stats_from_db(db, run_id=None, keep_works=True):
+    """
+    从作品库查询出与 analyze_folder 返回值结构相同的 stats，可直接交给 write_csv。
+    run_id 默认取最近一次运行；抽样放大方式与 WorkAggregator.finalize 一致。
+    """
+    run_id = run_id or db.latest_run()
+    info = db.run_info(run_id)
+    page_weights = info.get("page_weights") or None
+    is_sampling = bool(info.get("is_sampling", False))
+    sampling_factor = float(info.get("sampling_factor", 1.0) or 1.0)
+    factor = sampling_factor if is_sampling and sampling_factor > 1 and not page_weights else None
+
+    def flat(counter):
+        if factor:
+            return {key: int(value * factor) for key, value in counter.items()}
+        if page_weights:
+            return {key: int(round(value)) for key, value in counter.items()}
+        return dict(counter)
+
+    counts = {kind: db.tag_counts(run_id, kind, page_weights) for kind in TAG_KINDS}
+    counts["ratings"] = db.rating_counts(run_id, page_weights)
+
+    numeric_summary = {}
+    for field in NUMERIC_FIELDS:
+        count, total, low, high = db.conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM({field}), 0), MIN({field}), MAX({field}) FROM run_works "
+            f"WHERE run_id = ?", (run_id,)).fetchone()
+        numeric_summary[field] = {"count": count, "sum": total, "min": low, "max": high,
+                                  "mean": total / count if count else 0}
+
+    work_count = numeric_summary["words"]["count"]
+    summary = {"work_count": work_count}
+    for field in TAG_LIST_FIELDS:
+        tag_total = db.conn.execute("""
+            SELECT COUNT(*) FROM run_work_tags rt JOIN tags t ON t.tag_id = rt.tag_id
+            WHERE rt.run_id = ? AND t.kind = ?""",
+                                    (run_id, field)).fetchone()[0]
+        summary[f"avg_{field}_per_work"] = tag_total / work_count if work_count else 0
+    summary["avg_words"] = numeric_summary["words"]["mean"]
+    summary["total_kudos"] = numeric_summary["kudos"]["sum"]
+    summary["total_hits"] = numeric_summary["hits"]["sum"]
+    if page_weights:
+        for field in WEIGHTED_TOTAL_FIELDS:
+            rows = db.conn.execute(f"SELECT source_file, COALESCE(SUM({field}), 0) FROM run_works "
+                                   f"WHERE run_id = ? GROUP BY source_file", (run_id,))
+            summary[f"weighted_total_{field}"] = sum(total * page_weights.get(source_file, 1.0)
+                                                     for source_file, total in rows)
+
+    works = list(db.run_works(run_id)) if keep_works else []
+    return {
+        'characters': flat(counts['characters'][0]),
+        'relationships': flat(counts['relationships'][0]),
+        'fandoms': flat(counts['fandoms'][0]),
+        'ratings': flat(counts['ratings'][0]),
+        'warnings': flat(counts['warnings'][0]),
+        'categories': flat(counts['categories'][0]),
+        'freeforms': flat(counts['freeforms'][0]),
+        'works': works,
+        'numeric_stats': {field: [work[field] for work in works] for field in NUMERIC_FIELDS},
+        'numeric_summary': numeric_summary,
+        'summary': summary,
+        'download_info': info,
+        'filter_stats': info.get('filter_stats', {}),
+        'yearly_stats': {
+            kind: {year: flat(counter) for year, counter in counts[kind][1].items()}
+            for kind in ('characters', 'relationships', 'fandoms', 'ratings', 'warnings', 'categories', 'freeforms')
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地作品库：查看运行记录、从库中生成报表")
+    sub = parser.add_subparsers(dest="command", required=True)
+    runs_parser = sub.add_parser("runs", help="列出作品库中的运行记录")
+    runs_parser.add_argument("db")
+    report_parser = sub.add_parser("report", help="从作品库生成 CSV 报表（不重新解析页面）")
+    report_parser.add_argument("db")
+    report_parser.add_argument("output", nargs="?", default="ao3_csv_output")
+    report_parser.add_argument("--run", type=int, default=None, help="运行编号，默认最近一次")
+    add_log_level_argument(parser)
+    args = parser.parse_args(argv)
+    setup_logging(args.log_level)
+
+    with WorkDB(args.db) as db:
+        if args.command == "runs":
+            for run_id, created_at, tag_url, folder, sampling_mode, count in db.runs():
+                print(f"{run_id}\t{created_at}\t{sampling_mode}\t{count} 个作品\t{tag_url or folder}")
+            return 0
+        from output.csv_writer import write_csv
+        write_csv(stats_from_db(db, args.run), args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
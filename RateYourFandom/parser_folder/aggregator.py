@@ -0,0 +1,267 @@
+import math
+from collections import defaultdict, Counter
+
+from parser_folder.tag_statistics import _normalize_tag, count_tags_vectorized, TAG_FIELDS
+from parser_folder.work_store import WorkStore
+from parser_folder.heavy_hitters import SpaceSaving, sketch_capacity
+
+NUMERIC_FIELDS = ("words", "kudos", "comments", "bookmarks", "hits")
+TAG_LIST_FIELDS = ("characters", "relationships", "fandoms", "freeforms")
+# 综合统计报告中需要估算全站总量的数值字段
+WEIGHTED_TOTAL_FIELDS = ("kudos", "hits")
+
+
+class WorkAggregator:
+    """
+    单次遍历的增量统计器：每来一个作品就同时更新所有计数器、分年份计数器和数值累加器。
+    keep_works=True 时作品存入列式的 WorkStore（标签驻留为整数 ID）；
+    keep_works=False 时不保留作品本身，内存只随标签数量增长，与作品数量无关。
+
+    计数规则与原来分几轮统计时完全一致：
+      - 角色 / 关系 / 同人圈：标准化后，同一作品内重复的标签只计一次
+      - 评级 / 警告 / 分类 / 自由标签：去掉空白标签后逐个计数
+
+    tag_engine='vectorized' 时角色 / 关系 / 同人圈不在逐个作品时计数，
+    而是在 finalize 时对 WorkStore 批量计数（需要 keep_works=True 和 numpy）。
+
+    page_weights: 分层抽样时每页的权重 {来源文件名: 权重}，各计数按作品所在页的权重累加，
+    finalize 时不再乘统一的抽样倍数；不在表中的页权重为 1。总点赞数 / 总点击量同样按权重累加
+    （summary 中的 weighted_total_kudos / weighted_total_hits）。
+
+    freeform_top: 自由标签改用固定内存的 Space-Saving 近似计数（见 parser_folder.heavy_hitters），
+    总体和每年各只输出前 freeform_top 个，stats['freeform_sketch'] 中带每个标签的误差上限。
+    """
+
+    def __init__(self, keep_works=True, count_once_per_work=True, tag_engine="stream", page_weights=None,
+                 freeform_top=None):
+        if tag_engine not in ("stream", "vectorized"):
+            raise ValueError(f"未知的标签计数方式: {tag_engine}")
+        if tag_engine == "vectorized" and not keep_works:
+            raise ValueError("批量标签计数需要保留作品（keep_works=True）")
+        self.keep_works = keep_works
+        self.count_once_per_work = count_once_per_work
+        self.tag_engine = tag_engine
+        self.page_weights = page_weights or None
+        self.freeform_top = freeform_top or None
+        self.works = WorkStore() if keep_works else None
+        self.work_count = 0
+
+        self.characters = Counter()
+        self.relationships = Counter()
+        self.fandoms = Counter()
+        self.ratings = defaultdict(int)
+        self.warnings = defaultdict(int)
+        self.categories = defaultdict(int)
+        if self.freeform_top:
+            capacity = sketch_capacity(self.freeform_top)
+            self.freeforms = SpaceSaving(capacity)
+        else:
+            self.freeforms = defaultdict(int)
+
+        self.yearly_characters = defaultdict(Counter)
+        self.yearly_relationships = defaultdict(Counter)
+        self.yearly_fandoms = defaultdict(Counter)
+        self.yearly_ratings = defaultdict(lambda: defaultdict(int))
+        self.yearly_warnings = defaultdict(lambda: defaultdict(int))
+        self.yearly_categories = defaultdict(lambda: defaultdict(int))
+        if self.freeform_top:
+            self.yearly_freeforms = defaultdict(lambda: SpaceSaving(capacity))
+        else:
+            self.yearly_freeforms = defaultdict(lambda: defaultdict(int))
+
+        # 每作品平均标签数用的是原始列表长度
+        self.tag_totals = dict.fromkeys(TAG_LIST_FIELDS, 0)
+        self.numeric_summary = {field: {"count": 0, "sum": 0, "min": None, "max": None}
+                                for field in NUMERIC_FIELDS}
+        # 分层抽样时按页权重累加的总量，用来估算全站总数
+        self.weighted_totals = dict.fromkeys(WEIGHTED_TOTAL_FIELDS, 0.0)
+
+    def _count_tags(self, tags, overall, yearly, year, weight=1):
+        normalized = [nt for nt in (_normalize_tag(t) for t in tags) if nt]
+        if self.count_once_per_work:
+            normalized = dict.fromkeys(normalized)
+        for tag in normalized:
+            overall[tag] += weight
+            yearly[year][tag] += weight
+
+    def _weight(self, source_file):
+        if self.page_weights is None:
+            return 1
+        return self.page_weights.get(source_file, 1.0)
+
+    def add(self, work):
+        self.work_count += 1
+        weight = self._weight(work['source_file'])
+        if self.keep_works:
+            self.works.append(work)
+
+        # 角色 / 关系 / 同人圈
+        if self.tag_engine == "stream":
+            tag_year = work.get('year') or '未知'
+            self._count_tags(work.get('characters') or [], self.characters, self.yearly_characters, tag_year, weight)
+            self._count_tags(work.get('relationships') or [], self.relationships, self.yearly_relationships,
+                             tag_year, weight)
+            self._count_tags(work.get('fandoms') or [], self.fandoms, self.yearly_fandoms, tag_year, weight)
+
+        year = work.get('year', '未知')
+
+        # 统计评级
+        rating = work['rating']
+        if rating and rating.strip():
+            self.ratings[rating] += weight
+            self.yearly_ratings[year][rating] += weight
+
+        # 统计警告
+        for warning in work['warnings']:
+            if warning and warning.strip():
+                self.warnings[warning] += weight
+                self.yearly_warnings[year][warning] += weight
+
+        # 统计分类
+        for category in work['categories']:
+            if category and category.strip():
+                self.categories[category] += weight
+                self.yearly_categories[year][category] += weight
+
+        # 统计自由标签
+        if self.freeform_top:
+            yearly_sketch = self.yearly_freeforms[year]
+            for freeform in work['freeforms']:
+                if freeform and freeform.strip():
+                    self.freeforms.add(freeform, weight)
+                    yearly_sketch.add(freeform, weight)
+        else:
+            for freeform in work['freeforms']:
+                if freeform and freeform.strip():
+                    self.freeforms[freeform] += weight
+                    self.yearly_freeforms[year][freeform] += weight
+
+        for field in TAG_LIST_FIELDS:
+            self.tag_totals[field] += len(work[field])
+
+        # 数值统计
+        for field in NUMERIC_FIELDS:
+            value = work[field]
+            summary = self.numeric_summary[field]
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["min"] = value if summary["min"] is None else min(summary["min"], value)
+            summary["max"] = value if summary["max"] is None else max(summary["max"], value)
+        if self.page_weights is not None:
+            for field in WEIGHTED_TOTAL_FIELDS:
+                self.weighted_totals[field] += work[field] * weight
+
+    def add_many(self, works):
+        for work in works:
+            self.add(work)
+
+    def _work_weights(self):
+        """按 WorkStore 的来源文件列展开成每个作品的权重，没有分层权重时返回 None"""
+        if self.page_weights is None:
+            return None
+        source_ids = self.works.column("source_file")
+        names = self.works.vocab.names
+        page_weight = {}
+        weights = []
+        for source_id in source_ids:
+            weight = page_weight.get(source_id)
+            if weight is None:
+                weight = page_weight[source_id] = self._weight(names[source_id])
+            weights.append(weight)
+        return weights
+
+    def summary(self):
+        """write_csv 综合统计报告需要的作品级汇总（未做抽样放大）"""
+        n = self.work_count
+        summary = {"work_count": n}
+        for field in TAG_LIST_FIELDS:
+            summary[f"avg_{field}_per_work"] = self.tag_totals[field] / n if n else 0
+        summary["avg_words"] = self.numeric_summary["words"]["sum"] / n if n else 0
+        summary["total_kudos"] = self.numeric_summary["kudos"]["sum"]
+        summary["total_hits"] = self.numeric_summary["hits"]["sum"]
+        if self.page_weights is not None:
+            for field in WEIGHTED_TOTAL_FIELDS:
+                summary[f"weighted_total_{field}"] = self.weighted_totals[field]
+        return summary
+
+    def finalize(self, info, filter_stats):
+        """生成与 analyze_folder 一致的 stats 结构，按需应用抽样补偿"""
+        is_sampling = bool(info.get("is_sampling", False))
+        try:
+            sampling_factor = float(info.get("sampling_factor", 1.0))
+        except (TypeError, ValueError):
+            sampling_factor = 1.0
+        factor = sampling_factor if is_sampling and sampling_factor > 1 and not self.page_weights else None
+
+        if self.tag_engine == "vectorized":
+            overall, yearly = count_tags_vectorized(self.works, TAG_FIELDS, self.count_once_per_work,
+                                                    self._work_weights())
+            self.characters, self.relationships, self.fandoms = (overall[f] for f in TAG_FIELDS)
+            self.yearly_characters, self.yearly_relationships, self.yearly_fandoms = (yearly[f] for f in TAG_FIELDS)
+
+        def scale(value):
+            if factor:
+                return int(value * factor)
+            if self.page_weights:
+                # 权重之和是浮点数，四舍五入回作品数
+                return int(round(value))
+            return value
+
+        def flat(counter):
+            if factor or self.page_weights:
+                return {key: scale(value) for key, value in counter.items()}
+            return dict(counter)
+
+        def nested(yearly):
+            return {year: flat(counter) for year, counter in yearly.items()}
+
+        freeforms, yearly_freeforms = self.freeforms, self.yearly_freeforms
+        freeform_sketch = None
+        if self.freeform_top:
+            freeforms, errors = self.freeforms.top(self.freeform_top)
+            yearly_top = {year: sketch.top(self.freeform_top) for year, sketch in self.yearly_freeforms.items()}
+            yearly_freeforms = {year: counts for year, (counts, _) in yearly_top.items()}
+            freeform_sketch = {
+                'top': self.freeform_top,
+                'capacity': self.freeforms.capacity,
+                'exact': self.freeforms.exact,
+                'tracked': len(self.freeforms),
+                'max_error': scale(math.ceil(self.freeforms.max_error)),
+                'errors': flat(errors),
+                'yearly_max_error': {year: scale(math.ceil(sketch.max_error))
+                                     for year, sketch in self.yearly_freeforms.items()},
+                'yearly_errors': {year: flat(year_errors) for year, (_, year_errors) in yearly_top.items()},
+            }
+
+        numeric_summary = {}
+        for field, acc in self.numeric_summary.items():
+            numeric_summary[field] = dict(acc, mean=acc["sum"] / acc["count"] if acc["count"] else 0)
+
+        stats = {
+            'characters': flat(self.characters),
+            'relationships': flat(self.relationships),
+            'fandoms': flat(self.fandoms),
+            'ratings': flat(self.ratings),
+            'warnings': flat(self.warnings),
+            'categories': flat(self.categories),
+            'freeforms': flat(freeforms),
+            'works': self.works if self.keep_works else [],
+            # 数值列直接引用 WorkStore 中的数组，不再复制一份
+            'numeric_stats': {field: self.works.column(field) for field in NUMERIC_FIELDS} if self.keep_works else {},
+            'numeric_summary': numeric_summary,
+            'summary': self.summary(),
+            'download_info': info,
+            'filter_stats': filter_stats,
+            'yearly_stats': {
+                'characters': nested(self.yearly_characters),
+                'relationships': nested(self.yearly_relationships),
+                'fandoms': nested(self.yearly_fandoms),
+                'ratings': nested(self.yearly_ratings),
+                'warnings': nested(self.yearly_warnings),
+                'categories': nested(self.yearly_categories),
+                'freeforms': nested(yearly_freeforms)
+            }
+        }
+        if freeform_sketch is not None:
+            stats['freeform_sketch'] = freeform_sketch
+        return stats
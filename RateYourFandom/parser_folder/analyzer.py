@@ -1,162 +1,175 @@
 import os
 import json
-import re
-from collections import defaultdict
-from parser_folder.works_extractor import extract_works_data
-from parser_folder.tag_statistics import analyze_characters_relationships_fandoms, apply_sampling_to_tag_stats
+import logging
+from parser_folder.works_extractor import extract_works_data, default_backend
+from parser_folder.page_cache import PageCache
+from parser_folder.aggregator import WorkAggregator
+from utils.page_storage import read_page_bytes, list_pages
+from utils.metrics import METRICS
+from utils.profiling import PROFILER
 
-def analyze_folder(folder):
-    """分析下载的页面数据，包含分年份统计和对比分析"""
+logger = logging.getLogger(__name__)
+
+def _parse_page_file(task):
+    """
+    解析单个页面文件（在子进程中运行），返回 (文件名, 作品列表, 错误信息, 是否命中缓存)
+    filename 是逻辑文件名 page_N.html，实际文件可能是压缩的 page_N.html.gz / .zst
+    """
+    folder, filename, parser_backend, use_cache = task
+    try:
+        raw = read_page_bytes(folder, filename)
+        cache = key = None
+        if use_cache:
+            cache = PageCache(folder, parser_backend)
+            key = cache.content_key(raw)
+            works = cache.load(key)
+            if works is not None:
+                return filename, works, None, True
+        works = extract_works_data(raw.decode('utf-8'), filename, parser_backend)
+        if cache is not None:
+            # 缓存写不进去（只读目录、磁盘满）不影响这一页的解析结果
+            try:
+                cache.store(key, works)
+            except OSError as e:
+                logger.warning(f"写入解析缓存失败 {filename}: {e}")
+        return filename, works, None, False
+    except Exception as e:
+        return filename, [], str(e), False
+
+def iter_parsed_pages(folder, html_files, workers=None, parser_backend=None, use_cache=True):
+    """
+    按 html_files 的顺序逐个产出 (文件名, 作品列表, 错误信息, 是否命中缓存)。
+    workers > 1 时用进程池并行解析，结果仍按原顺序返回，保证统计结果可复现。
+    use_cache: 使用 .parse_cache 中按内容哈希保存的解析结果，未变化的页面不再重复解析
+    """
+    parser_backend = parser_backend or default_backend()
+    if use_cache:
+        PageCache(folder, parser_backend).prune()
+    tasks = [(folder, filename, parser_backend, use_cache) for filename in html_files]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(tasks))
+    if workers <= 1:
+        for task in tasks:
+            yield _parse_page_file(task)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(_parse_page_file, tasks, chunksize=chunksize)
+
+def load_download_info(folder):
+    """读取下载目录中的 download_info.json，不存在时按完整分析处理"""
     info_path = os.path.join(folder, "download_info.json")
     if os.path.exists(info_path):
         with open(info_path, "r", encoding="utf-8") as f:
-            info = json.load(f)
-    else:
-        info = {
-            "sampling_factor": 1.0,
-            "is_sampling": False,
-            "filter_stats": {}
-        }
+            return json.load(f)
+    return {
+        "sampling_factor": 1.0,
+        "is_sampling": False,
+        "filter_stats": {}
+    }
 
-    sampling_factor = info.get("sampling_factor", 1.0)
-    is_sampling = info.get("is_sampling", False)
-    filter_stats = info.get("filter_stats", {})
+def list_page_files(folder):
+    """列出目录下的页面（page_N.html 及其压缩格式），按页码排序，返回逻辑文件名 page_N.html"""
+    return list_pages(folder)
 
-    works = []
-    
-    # 其他统计数据结构
-    all_ratings = defaultdict(int)
-    all_warnings = defaultdict(int)
-    all_categories = defaultdict(int)
-    all_freeforms = defaultdict(int)
-    
-    # 分年份统计
-    yearly_ratings = defaultdict(lambda: defaultdict(int))
-    yearly_warnings = defaultdict(lambda: defaultdict(int))
-    yearly_categories = defaultdict(lambda: defaultdict(int))
-    yearly_freeforms = defaultdict(lambda: defaultdict(int))
+@PROFILER.profiled("analyze_folder")
+def analyze_folder(folder, workers=None, parser_backend=None, keep_works=True, use_cache=True,
+                   tag_engine="stream", db_path=None, freeform_top=None):
+    """
+    分析下载的页面数据，包含分年份统计和对比分析
+    workers: 解析进程数，默认为 CPU 核数；1 表示在当前进程内串行解析
+    parser_backend: 解析后端（'lxml' / 'bs4'），默认自动选择
+    keep_works: False 时不在内存中保留作品列表（stats['works'] 为空，不再输出作品详细信息），
+                适合几十万作品的大型分析
+    use_cache: 复用上次的解析结果（按页面内容和解析器版本自动失效）
+    tag_engine: 'stream' 逐个作品计数角色/关系/同人圈；'vectorized' 最后用 numpy 批量计数（需保留作品）
+    db_path: 同时把作品按页批量写入这个 SQLite 作品库（见 output.work_db），之后可直接从库里生成报表
+    freeform_top: 自由标签只近似统计前 N 个（总体和每年），内存固定，报表附带误差上限；默认精确统计全部
+    """
+    info = load_download_info(folder)
+    filter_stats = info.get("filter_stats", {})
 
     # 读取所有 HTML 文件
-    html_files = []
-    for f in os.listdir(folder):
-        if f.endswith('.html') and f.startswith('page_'):
-            match = re.match(r'page_(\d+)\.html', f)
-            if match:
-                html_files.append(f)
-    
-    print(f"找到 {len(html_files)} 个HTML文件进行分析")
-    
-    # 按页码排序
-    html_files.sort(key=lambda x: int(re.search(r'page_(\d+)\.html', x).group(1)))
-    
-    for filename in html_files:
-        file_path = os.path.join(folder, filename)
-        print(f"分析文件: {filename}")
-        
-        try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                html_content = file.read()
-                works_from_file = extract_works_data(html_content, filename)
-                works.extend(works_from_file)
-                print(f"  从 {filename} 中提取到 {len(works_from_file)} 个作品")
-        except Exception as e:
-            print(f"处理文件 {filename} 时出错: {e}")
-    
-    print(f"总共提取到 {len(works)} 个作品")
-    
-    # 使用专门的函数统计角色、关系和fandom
-    tag_stats = analyze_characters_relationships_fandoms(works, info, filter_stats)
-    
-    # 应用抽样补偿
-    if is_sampling and sampling_factor > 1:
-        tag_stats = apply_sampling_to_tag_stats(tag_stats, 1)
-    
-    # 统计其他信息
-    for work in works:
-        year = work.get('year', '未知')
-        
-        # 统计评级
-        rating = work['rating']
-        if rating and rating.strip():
-            all_ratings[rating] += 1
-            yearly_ratings[year][rating] += 1
-        
-        # 统计警告
-        for warning in work['warnings']:
-            if warning and warning.strip():
-                all_warnings[warning] += 1
-                yearly_warnings[year][warning] += 1
-        
-        # 统计分类
-        for category in work['categories']:
-            if category and category.strip():
-                all_categories[category] += 1
-                yearly_categories[year][category] += 1
-                
-        # 统计自由标签
-        for freeform in work['freeforms']:
-            if freeform and freeform.strip():
-                all_freeforms[freeform] += 1
-                yearly_freeforms[year][freeform] += 1
+    html_files = list_page_files(folder)
+    logger.info(f"找到 {len(html_files)} 个HTML文件进行分析")
 
-    # 对其他统计应用抽样补偿
-    if is_sampling and sampling_factor > 1:
-        def apply_sampling_factor(data_dict, factor):
-            return {key: int(value * factor) for key, value in data_dict.items()}
-        
-        def apply_sampling_to_nested(nested_dict, factor):
-            result = {}
-            for year, data in nested_dict.items():
-                result[year] = {key: int(value * factor) for key, value in data.items()}
-            return result
-        
-        all_ratings = apply_sampling_factor(all_ratings, sampling_factor)
-        all_warnings = apply_sampling_factor(all_warnings, sampling_factor)
-        all_categories = apply_sampling_factor(all_categories, sampling_factor)
-        all_freeforms = apply_sampling_factor(all_freeforms, sampling_factor)
-        
-        yearly_ratings = apply_sampling_to_nested(yearly_ratings, sampling_factor)
-        yearly_warnings = apply_sampling_to_nested(yearly_warnings, sampling_factor)
-        yearly_categories = apply_sampling_to_nested(yearly_categories, sampling_factor)
-        yearly_freeforms = apply_sampling_to_nested(yearly_freeforms, sampling_factor)
+    # 每页解析完立即汇入统计器，只遍历一次
+    aggregator = WorkAggregator(keep_works=keep_works, tag_engine=tag_engine,
+                                page_weights=info.get("page_weights"), freeform_top=freeform_top)
+    cache_hits = 0
+    db = run_id = None
+    if db_path:
+        from output.work_db import WorkDB
+        db = WorkDB(db_path)
+        run_id = db.start_run(info, info.get("tag_url"), os.path.abspath(folder))
+    parsed_pages = iter_parsed_pages(folder, html_files, workers, parser_backend, use_cache)
+    for filename, works_from_file, error, cached in METRICS.timed_iter("parse", parsed_pages):
+        logger.debug(f"分析文件: {filename}")
+        if not record_parsed_page(works_from_file, error, cached):
+            logger.warning(f"处理文件 {filename} 时出错: {error}")
+            continue
+        cache_hits += cached
+        with METRICS.stage("aggregate"):
+            aggregator.add_many(works_from_file)
+        if db is not None:
+            with METRICS.stage("export"):
+                db.add_works(run_id, works_from_file)
+        logger.debug(f"  从 {filename} 中提取到 {len(works_from_file)} 个作品{'（缓存）' if cached else ''}")
 
-    # 数值统计
-    numeric_stats = defaultdict(list)
-    for work in works:
-        numeric_stats["words"].append(work['words'])
-        numeric_stats["kudos"].append(work['kudos'])
-        numeric_stats["comments"].append(work['comments'])
-        numeric_stats["bookmarks"].append(work['bookmarks'])
-        numeric_stats["hits"].append(work['hits'])
+    logger.info(f"总共提取到 {aggregator.work_count} 个作品")
+    if use_cache:
+        logger.info(f"解析缓存命中: {cache_hits}/{len(html_files)} 个文件")
+    if db is not None:
+        db.finish_run()
+        db.close()
+        logger.info(f"已写入作品库 {db_path}（第 {run_id} 次运行）")
 
-    # 构建返回数据结构
-    stats = {
-        'characters': tag_stats['characters'],
-        'relationships': tag_stats['relationships'],
-        'fandoms': tag_stats['fandoms'],
-        'ratings': dict(all_ratings),
-        'warnings': dict(all_warnings),
-        'categories': dict(all_categories),
-        'freeforms': dict(all_freeforms),
-        'works': works,
-        'numeric_stats': dict(numeric_stats),
-        'download_info': info,
-        'filter_stats': filter_stats,
-        'yearly_stats': {
-            'characters': tag_stats['yearly_stats']['characters'],
-            'relationships': tag_stats['yearly_stats']['relationships'],
-            'fandoms': tag_stats['yearly_stats']['fandoms'],
-            'ratings': dict(yearly_ratings),
-            'warnings': dict(yearly_warnings),
-            'categories': dict(yearly_categories),
-            'freeforms': dict(yearly_freeforms)
-        }
-    }
+    return finalize_stats(aggregator, info, filter_stats)
 
-    print(f"统计摘要:")
-    print(f"  角色: {len(stats['characters'])} 个不同角色")
-    print(f"  关系: {len(stats['relationships'])} 个不同关系") 
-    print(f"  Fandom: {len(stats['fandoms'])} 个不同Fandom")
-    print(f"  自由标签: {len(stats['freeforms'])} 个不同自由标签")
+def record_parsed_page(works, error, cached):
+    """把一页的解析结果计入运行指标，返回这一页是否解析成功"""
+    if error:
+        METRICS.count("parse_errors")
+        return False
+    METRICS.count("pages_parsed")
+    METRICS.count("works_parsed", len(works))
+    METRICS.count("parse_cache_hits", int(cached))
+    return True
+
+def analyze_works(works, info=None, keep_works=True, tag_engine="stream"):
+    """
+    直接统计一组作品（例如增量抓取保存的作品库），输出与 analyze_folder 相同的 stats 结构
+    info: 与 download_info.json 相同的结构，不传时按完整分析处理
+    """
+    info = info or {"sampling_factor": 1.0, "is_sampling": False, "filter_stats": {}}
+    aggregator = WorkAggregator(keep_works=keep_works, tag_engine=tag_engine,
+                                page_weights=info.get("page_weights"))
+    with METRICS.stage("aggregate"):
+        aggregator.add_many(works)
+    logger.info(f"总共 {aggregator.work_count} 个作品")
+    return finalize_stats(aggregator, info, info.get("filter_stats", {}))
+
+@METRICS.timed("aggregate")
+def finalize_stats(aggregator, info, filter_stats):
+    """应用抽样补偿并打印统计摘要"""
+    sampling_factor = info.get("sampling_factor", 1.0)
+    if info.get("page_weights"):
+        logger.info(f"分层抽样：按各层权重放大统计数据（{len(info.get('strata', []))} 层）")
+    elif info.get("is_sampling", False) and sampling_factor > 1:
+        logger.info(f"抽样模式：对统计数据应用抽样倍数 {sampling_factor:.2f}")
+
+    stats = aggregator.finalize(info, filter_stats)
+
+    logger.info(f"统计摘要:")
+    logger.info(f"  角色: {len(stats['characters'])} 个不同角色")
+    logger.info(f"  关系: {len(stats['relationships'])} 个不同关系") 
+    logger.info(f"  Fandom: {len(stats['fandoms'])} 个不同Fandom")
+    sketch = stats.get('freeform_sketch')
+    if sketch and not sketch['exact']:
+        logger.info(f"  自由标签: 近似统计，输出前 {len(stats['freeforms'])} 个（每个次数最多多计 {sketch['max_error']}）")
+    else:
+        logger.info(f"  自由标签: {len(stats['freeforms'])} 个不同自由标签")
     
     return stats
\ No newline at end of file
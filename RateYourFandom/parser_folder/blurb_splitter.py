@@ -0,0 +1,93 @@
+import re
+import logging
+
+from parser_folder.work_schema import BLURB_CLASS_RE
+
+logger = logging.getLogger(__name__)
+
+# 脚本、样式和注释里可能出现像标签的文本，解析器不会当作元素，切分前先去掉
+SCRIPT_RE = re.compile(r"<script\b.*?</script\s*>|<style\b.*?</style\s*>|<!--.*?-->", re.S | re.I)
+# class 属性值可以用双引号、单引号或不加引号，解析器三种都认
+_LI_OPEN_RE = re.compile(r'''<li\b[^>]*?\sclass\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+))[^>]*>''', re.I)
+_TAG_RES = {}
+
+
+def balanced_end(html, start, tag):
+    """从 start 处的开始标签起找到与之配对的结束标签，返回结束位置；找不到时返回 -1"""
+    tag_re = _TAG_RES.get(tag)
+    if tag_re is None:
+        tag_re = _TAG_RES[tag] = re.compile(rf"<(/?){tag}\b[^>]*>", re.I)
+    depth = 0
+    for m in tag_re.finditer(html, start):
+        depth += -1 if m.group(1) else 1
+        if depth == 0:
+            return m.end()
+    return -1
+
+
+def split_blurbs(html):
+    """
+    扫描原始页面，切出每个作品 blurb 的 HTML 片段（li 的 class 依次含 work / blurb / group，与解析器的判断相同）。
+    有 blurb 找不到配对的 </li>，或者一个 blurb 都没切出来但页面里出现了 blurb 时返回 None，
+    由调用方退回整页解析（宁可慢一点，也不能把整页作品当成 0 个）。
+    """
+    body = SCRIPT_RE.sub("", html)
+    blurbs = []
+    pos = 0
+    while True:
+        m = _LI_OPEN_RE.search(body, pos)
+        if not m:
+            if not blurbs and "blurb" in body:
+                return None
+            return blurbs
+        class_value = next((value for value in m.groups() if value is not None), "")
+        if not BLURB_CLASS_RE.search(" ".join(class_value.split())):
+            pos = m.end()
+            continue
+        end = balanced_end(body, m.start(), "li")
+        if end < 0:
+            return None
+        blurbs.append(body[m.start():end])
+        pos = end
+
+
+def _extract_split(html_content, filename, parse_blurb, parse_page):
+    if not html_content or not html_content.strip():
+        return []
+    blurbs = split_blurbs(html_content)
+    if blurbs is None:
+        return parse_page(html_content, filename)
+
+    works = []
+    for index, blurb in enumerate(blurbs):
+        # 单个作品格式错误只跳过这个作品，不影响同一页的其他作品
+        try:
+            data = parse_blurb(blurb, filename)
+        except Exception as e:
+            logger.warning(f"  {filename} 第 {index + 1} 个作品解析失败，已跳过: {e}")
+            continue
+        if data is not None:
+            works.append(data)
+    return works
+
+
+def extract_works_lxml_split(html_content, filename):
+    """先切出各个 blurb，再逐个用 lxml 解析片段，不为整页建 DOM"""
+    import lxml.html
+    from parser_folder.lxml_extractor import extract_works_lxml, work_from_lxml_elem
+
+    def parse_blurb(blurb, name):
+        return work_from_lxml_elem(lxml.html.fragment_fromstring(blurb), name)
+
+    return _extract_split(html_content, filename, parse_blurb, extract_works_lxml)
+
+
+def extract_works_bs4_split(html_content, filename):
+    """先切出各个 blurb，再逐个用 BeautifulSoup 解析片段"""
+    from bs4 import BeautifulSoup
+    from parser_folder.works_extractor import extract_works_bs4, work_from_bs4_elem
+
+    def parse_blurb(blurb, name):
+        return work_from_bs4_elem(BeautifulSoup(blurb, "html.parser").li, name)
+
+    return _extract_split(html_content, filename, parse_blurb, extract_works_bs4)
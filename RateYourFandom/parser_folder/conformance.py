@@ -0,0 +1,79 @@
+"""
+解析后端一致性检查：用 BeautifulSoup 实现作为基准，逐页比较其他后端提取出的作品 dict。
+
+每一页还会改写成单引号属性、无引号属性两种等价写法再比较一次（切分器曾经只认双引号的 class）。
+
+用法（在 RateYourFandom 目录下）:
+    python -m parser_folder.conformance ao3_html_pages [更多目录...]
+有任何不一致时以非零状态退出。
+"""
+import re
+import sys
+
+from parser_folder.works_extractor import get_parser
+from utils.page_storage import iter_pages
+
+
+_TAG_RE = re.compile(r"<[a-zA-Z][^<>]*>")
+_DOUBLE_QUOTED_RE = re.compile(r'''(\s[\w:-]+\s*=\s*)"([^"']*)"''')
+_SINGLE_TOKEN_RE = re.compile(r'''(\s[\w:-]+\s*=\s*)"([^\s"'=<>`]+)"''')
+
+
+def _rewrite_attributes(html, pattern, replacement):
+    return _TAG_RE.sub(lambda m: pattern.sub(replacement, m.group(0)), html)
+
+
+# 名称 -> 把页面改写成等价写法的函数；无引号只能用于不含空格的值，多个 class 的仍保留双引号
+QUOTE_VARIANTS = {
+    "单引号属性": lambda html: _rewrite_attributes(html, _DOUBLE_QUOTED_RE, r"\1'\2'"),
+    "无引号属性": lambda html: _rewrite_attributes(html, _SINGLE_TOKEN_RE, r"\1\2"),
+}
+
+
+def compare_page(html_content, filename, backends=("lxml", "lxml-split", "bs4-split"), reference="bs4"):
+    """返回该页的差异列表 [(backend, 说明), ...]，完全一致时为空"""
+    expected = get_parser(reference)(html_content, filename)
+    problems = []
+    for backend in backends:
+        actual = get_parser(backend)(html_content, filename)
+        if len(actual) != len(expected):
+            problems.append((backend, f"作品数不同: {reference}={len(expected)} {backend}={len(actual)}"))
+            continue
+        for index, (want, got) in enumerate(zip(expected, actual)):
+            if want == got:
+                continue
+            fields = [key for key in want if want.get(key) != got.get(key)]
+            problems.append((backend, f"第 {index + 1} 个作品字段不同: {', '.join(fields)}"))
+    return problems
+
+
+def check_folder(folder, backends=("lxml", "lxml-split", "bs4-split"), reference="bs4", variants=True):
+    """检查目录下所有页面（含压缩格式）及其引号写法变体，返回 {文件名: 差异列表}"""
+    failures = {}
+    for filename, html_content in iter_pages(folder):
+        problems = compare_page(html_content, filename, backends, reference)
+        if problems:
+            failures[filename] = problems
+        for label, rewrite in (QUOTE_VARIANTS.items() if variants else ()):
+            problems = compare_page(rewrite(html_content), filename, backends, reference)
+            if problems:
+                failures[f"{filename}（{label}）"] = problems
+    return failures
+
+
+def main(folders):
+    failed = False
+    for folder in folders:
+        failures = check_folder(folder)
+        for filename, problems in failures.items():
+            failed = True
+            for backend, message in problems:
+                print(f"{folder}/{filename} [{backend}] {message}")
+        print(f"{folder}: {'不一致' if failures else '全部一致'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    from utils.log import setup_logging
+    setup_logging("WARNING")
+    sys.exit(main(sys.argv[1:] or ["ao3_html_pages"]))
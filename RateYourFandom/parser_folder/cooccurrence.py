@@ -0,0 +1,191 @@
+"""
+标签共现：由 作品 × 标签 的稀疏关联矩阵相乘得到 标签 × 标签 的共现作品数，再算 lift 和 PMI。
+
+    A（作品 × 角色）, A^T A  -> 角色 × 角色：哪些角色经常一起出现
+    R（作品 × 关系）, F（作品 × 自由标签）, R^T F -> 关系 × 自由标签：哪些梗和哪些 CP 一起出现
+
+分年份共现是按年份取出关联矩阵的行再相乘。关联矩阵只记"作品是否带有该标签"（标签先标准化，
+同一作品内重复只计一次），所以共现次数就是同时带有两个标签的作品数，不会随作品的标签数平方增长。
+    lift = 共现作品数 × 作品总数 / (A 的作品数 × B 的作品数)，大于 1 表示比独立出现时更常一起出现
+    PMI  = log2(lift)
+分层抽样时每个作品按所在页的权重计数；统一抽样倍数只放大次数，不影响 lift / PMI。
+
+需要 numpy 和 scipy（按需导入）。作品需要保留在 stats['works'] 中（不能用 keep_works=False）。
+"""
+import logging
+
+from parser_folder.tag_statistics import _load_numpy, _explode_tags, _year_labels, _normalize_tag
+from utils.metrics import METRICS
+from utils.profiling import PROFILER
+
+logger = logging.getLogger(__name__)
+
+np = None
+sparse = None
+
+# (名称, 行字段, 列字段)；行列字段相同时只输出 A < B 的一半
+COOCCURRENCE_PAIRS = (
+    ("characters", "characters", "characters"),
+    ("relationships_freeforms", "relationships", "freeforms"),
+)
+DEFAULT_TOP = 1000
+DEFAULT_YEARLY_TOP = 100
+# 共现作品数少于这个值的组合不输出（lift 在极小的次数上没有意义）
+DEFAULT_MIN_COUNT = 2
+
+
+def _load_sparse():
+    """按需导入 numpy 和 scipy.sparse；缺少任何一个时返回 None"""
+    global np, sparse
+    if sparse is None:
+        if _load_numpy() is None:
+            return None
+        try:
+            import numpy
+            import scipy.sparse
+        except ImportError:
+            return None
+        np, sparse = numpy, scipy.sparse
+    return sparse
+
+
+def _incidence(works, field, n_works):
+    """作品 × 标准化标签 的 0/1 稀疏矩阵（CSR）和列对应的标签名"""
+    raw_ids, offsets, raw_names = _explode_tags(works, field)
+    raw_ids = raw_ids.astype(np.int64)
+
+    # 只标准化本字段实际出现的标签（WorkStore 的标签表是所有字段共用的）
+    used, inverse = np.unique(raw_ids, return_inverse=True)
+    norm_ids = {}
+    used_map = np.empty(len(used), dtype=np.int64)
+    for i, raw_id in enumerate(used.tolist()):
+        nt = _normalize_tag(raw_names[raw_id])
+        used_map[i] = -1 if nt is None else norm_ids.setdefault(nt, len(norm_ids))
+    tag_ids = used_map[inverse] if len(raw_ids) else np.zeros(0, dtype=np.int64)
+
+    work_idx = np.repeat(np.arange(n_works, dtype=np.int64), np.diff(offsets))
+    keep = tag_ids >= 0
+    matrix = sparse.csr_matrix((np.ones(int(keep.sum())), (work_idx[keep], tag_ids[keep])),
+                               shape=(n_works, max(len(norm_ids), 1)))
+    # 构造时重复的 (作品, 标签) 会相加，改回 0/1：同一作品内重复的标签只计一次
+    matrix.data[:] = 1.0
+    return matrix, list(norm_ids)
+
+
+def _work_weights(works, page_weights):
+    """分层抽样时每个作品所在页的权重，没有分层权重时返回 None"""
+    if not page_weights:
+        return None
+    if hasattr(works, 'column'):
+        names = works.vocab.names
+        sources = [names[source_id] for source_id in works.column('source_file')]
+    else:
+        sources = [work['source_file'] for work in works]
+    return np.asarray([page_weights.get(source, 1.0) for source in sources], dtype=np.float64)
+
+
+def _top_pairs(a, b, a_names, b_names, weights, symmetric, top, min_count):
+    """
+    a、b 为同一批作品的关联矩阵，返回共现次数最高的 top 个组合（按列存放的 dict）。
+    weights 为 None 时每个作品计 1。
+    """
+    if weights is not None:
+        a = sparse.diags(weights) @ a
+    total = float(weights.sum()) if weights is not None else float(a.shape[0])
+    a_counts = np.asarray(a.sum(axis=0)).ravel()
+    b_counts = a_counts if symmetric else np.asarray(
+        (b if weights is None else sparse.diags(weights) @ b).sum(axis=0)).ravel()
+
+    pairs = (a.T @ b).tocoo()
+    rows, cols, counts = pairs.row, pairs.col, pairs.data
+    keep = counts >= min_count
+    if symmetric:
+        keep &= rows < cols
+    rows, cols, counts = rows[keep], cols[keep], counts[keep]
+    if top is not None and len(counts) > top:
+        chosen = np.argpartition(-counts, top - 1)[:top]
+        rows, cols, counts = rows[chosen], cols[chosen], counts[chosen]
+    a_sorted = np.asarray(a_names, dtype=object)[rows]
+    b_sorted = np.asarray(b_names, dtype=object)[cols]
+    if symmetric and len(rows):
+        # 同类组合按名称顺序排成 A < B
+        swap = a_sorted > b_sorted
+        rows, cols = np.where(swap, cols, rows), np.where(swap, rows, cols)
+        a_sorted, b_sorted = np.where(swap, b_sorted, a_sorted), np.where(swap, a_sorted, b_sorted)
+    # 次数从高到低，次数相同时按标签名排序，输出稳定
+    order = sorted(range(len(counts)), key=lambda i: (-counts[i], a_sorted[i], b_sorted[i]))
+    rows, cols, counts = rows[order], cols[order], counts[order]
+
+    lift = counts * total / (a_counts[rows] * b_counts[cols]) if len(counts) else np.zeros(0)
+    return {
+        'a': [a_names[i] for i in rows.tolist()],
+        'b': [b_names[i] for i in cols.tolist()],
+        'count': counts,
+        'a_count': a_counts[rows],
+        'b_count': b_counts[cols],
+        'lift': lift,
+        'pmi': np.log2(lift),
+    }
+
+
+def _finish(table, scale):
+    """次数按抽样补偿换算成整数，lift / PMI 保留三位小数"""
+    return {
+        'a': table['a'],
+        'b': table['b'],
+        'count': [scale(value) for value in table['count'].tolist()],
+        'a_count': [scale(value) for value in table['a_count'].tolist()],
+        'b_count': [scale(value) for value in table['b_count'].tolist()],
+        'lift': np.round(table['lift'], 3).tolist(),
+        'pmi': np.round(table['pmi'], 3).tolist(),
+    }
+
+
+@METRICS.timed("aggregate")
+@PROFILER.profiled("cooccurrence")
+def compute_cooccurrence(works, info=None, top=DEFAULT_TOP, yearly_top=DEFAULT_YEARLY_TOP,
+                         min_count=DEFAULT_MIN_COUNT, pairs=COOCCURRENCE_PAIRS):
+    """
+    计算 works（WorkStore 或作品 dict 列表）的标签共现。
+    info: download_info，用于抽样补偿（page_weights / sampling_factor）
+    返回 {名称: {'overall': 表, 'yearly': {年份: 表}}}，表为按列存放的 dict:
+      a, b（标签名）, count（共现作品数）, a_count, b_count（各自的作品数）, lift, pmi
+    """
+    if _load_sparse() is None:
+        raise ImportError("标签共现分析需要 numpy 和 scipy（pip install scipy）")
+    info = info or {}
+    n_works = len(works)
+    weights = _work_weights(works, info.get("page_weights"))
+    factor = None
+    if weights is None and info.get("is_sampling") and float(info.get("sampling_factor", 1.0)) > 1:
+        factor = float(info["sampling_factor"])
+
+    def scale(value):
+        if factor:
+            return int(value * factor)
+        return int(round(value))
+
+    year_codes, year_names = _year_labels(works)
+    matrices = {}
+    for _, row_field, col_field in pairs:
+        for field in (row_field, col_field):
+            if field not in matrices:
+                matrices[field] = _incidence(works, field, n_works)
+
+    results = {}
+    for name, row_field, col_field in pairs:
+        a, a_names = matrices[row_field]
+        b, b_names = matrices[col_field]
+        symmetric = row_field == col_field
+        overall = _top_pairs(a, b, a_names, b_names, weights, symmetric, top, min_count)
+        yearly = {}
+        for code, year in enumerate(year_names):
+            rows = np.flatnonzero(year_codes == code)
+            year_weights = weights[rows] if weights is not None else None
+            table = _top_pairs(a[rows], b[rows], a_names, b_names, year_weights, symmetric, yearly_top,
+                               min_count)
+            if len(table['count']):
+                yearly[year] = _finish(table, scale)
+        results[name] = {'overall': _finish(overall, scale), 'yearly': yearly}
+        logger.info(f"标签共现 {name}: {len(overall['count'])} 个组合（{len(yearly)} 个年份）")
+    return results
@@ -0,0 +1,85 @@
+"""
+固定内存的高频元素计数（Space-Saving 算法），用于词表几乎无限的自由标签。
+
+    sketch = SpaceSaving(capacity=2000)
+    for tag in tags:
+        sketch.add(tag)
+    counts, errors = sketch.top(500)
+
+最多保留 capacity 个计数器，与不同标签的数量无关。对每个保留的标签:
+    counts[x] - errors[x] <= 真实次数 <= counts[x]
+所有误差都不超过 total / capacity（max_error），真实次数超过这个值的标签一定会被保留。
+只输出前 top 个、计数器多留 SKETCH_OVERSAMPLING 倍，前 top 名的估计会准得多。
+"""
+import heapq
+
+# 计数器数量是输出条数的几倍
+SKETCH_OVERSAMPLING = 4
+
+
+class SpaceSaving:
+    """Space-Saving 计数：counts 是估计次数（只会多计），errors 是每个标签可能多计的上限"""
+
+    __slots__ = ("capacity", "counts", "errors", "total", "evictions", "_heap")
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError(f"计数器数量必须为正数: {capacity}")
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.total = 0
+        self.evictions = 0
+        # (计数下限, 标签)，每个保留的标签恰好一项；标签计数增加时不更新，弹出时再校正
+        self._heap = []
+
+    def add(self, item, weight=1):
+        self.total += weight
+        counts = self.counts
+        if item in counts:
+            counts[item] += weight
+            return
+        if len(counts) < self.capacity:
+            counts[item] = weight
+            self.errors[item] = 0
+            heapq.heappush(self._heap, (weight, item))
+            return
+
+        # 替换计数最小的标签，新标签继承它的计数作为误差
+        heap = self._heap
+        while True:
+            count, victim = heap[0]
+            current = counts[victim]
+            if current == count:
+                break
+            heapq.heapreplace(heap, (current, victim))
+        del counts[victim]
+        del self.errors[victim]
+        counts[item] = count + weight
+        self.errors[item] = count
+        heapq.heapreplace(heap, (count + weight, item))
+        self.evictions += 1
+
+    def __len__(self):
+        return len(self.counts)
+
+    @property
+    def max_error(self):
+        """任何标签估计次数的误差上限"""
+        return self.total / self.capacity if self.evictions else 0
+
+    @property
+    def exact(self):
+        """没有发生过替换时计数是精确的"""
+        return self.evictions == 0
+
+    def top(self, n=None):
+        """估计次数最高的 n 个标签，返回 ({标签: 次数}, {标签: 误差上限})，按次数从高到低"""
+        items = sorted(self.counts.items(), key=lambda x: x[1], reverse=True)
+        if n is not None:
+            items = items[:n]
+        return dict(items), {item: self.errors[item] for item, _ in items}
+
+
+def sketch_capacity(top):
+    return top * SKETCH_OVERSAMPLING
@@ -0,0 +1,137 @@
+import lxml.html
+from lxml import etree
+
+from parser_folder.work_schema import (BLURB_CLASS_RE, YEAR_RE, STAT_FIELDS, new_work,
+                                       absolute_url, parse_stat_int, tag_kind)
+
+
+def _has_class(name):
+    """与 BeautifulSoup 的 class_="name" 一致：class 属性中含有这个词"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# 预编译的 XPath，所有页面共用
+_LI_WITH_CLASS = etree.XPath("//li[@class]")
+_TITLE_HEADING = etree.XPath(f"(.//h4[{_has_class('heading')}])[1]")
+_FIRST_LINK = etree.XPath("(.//a)[1]")
+_AUTHOR = etree.XPath("(.//a[contains(concat(' ', normalize-space(@rel), ' '), ' author ')])[1]")
+_REQUIRED_TAGS = etree.XPath(f"(.//ul[{_has_class('required-tags')}])[1]")
+_RATING = etree.XPath(f"(.//span[{_has_class('rating')}])[1]")
+_WARNINGS = etree.XPath(f".//span[{_has_class('warnings')}]")
+_CATEGORIES = etree.XPath(f".//span[{_has_class('category')}]")
+_FANDOM_HEADING = etree.XPath(f"(.//h5[{_has_class('fandoms')}])[1]")
+_TAG_LINKS = etree.XPath(f".//a[{_has_class('tag')}]")
+_FIRST_TAG_LINK = etree.XPath(f"(.//a[{_has_class('tag')}])[1]")
+_TAG_SECTION = etree.XPath(f"(.//ul[{_has_class('tags')}])[1]")
+_TAG_ITEMS = etree.XPath(".//li")
+_STATS = etree.XPath(f"(.//dl[{_has_class('stats')}])[1]")
+_STAT_DD = {field: etree.XPath(f"(.//dd[{_has_class(field)}])[1]")
+            for field in STAT_FIELDS + ("chapters",)}
+_DATETIME = etree.XPath(f"(.//p[{_has_class('datetime')}])[1]")
+
+
+def _first(xpath, elem):
+    found = xpath(elem)
+    return found[0] if found else None
+
+
+def _text(elem):
+    # str() 去掉 lxml 的字符串子类，结果可以直接 pickle / 跨进程传递
+    return str(elem.text_content())
+
+
+def extract_works_lxml(html_content, filename):
+    """lxml 实现：输出与 extract_works_bs4 完全一致，但快得多"""
+    if not html_content or not html_content.strip():
+        return []
+    root = lxml.html.fromstring(html_content)
+
+    works = []
+    for elem in _LI_WITH_CLASS(root):
+        # 与 bs4 的正则 class 匹配一致：对规整后的整串 class 做 search
+        if not BLURB_CLASS_RE.search(" ".join(elem.get("class").split())):
+            continue
+        data = work_from_lxml_elem(elem, filename)
+        if data is not None:
+            works.append(data)
+    return works
+
+
+def work_from_lxml_elem(elem, filename):
+    """从单个作品 li 中提取数据；没有标题时返回 None"""
+    data = new_work(filename)
+
+    # 标题 & URL
+    h = _first(_TITLE_HEADING, elem)
+    if h is not None:
+        a = _first(_FIRST_LINK, h)
+        if a is not None:
+            data["title"] = _text(a).strip()
+            data["url"] = absolute_url(a.get("href", ""))
+
+    # 必须有标题才视为有效作品
+    if not data["title"]:
+        return None
+
+    # 作者
+    author = _first(_AUTHOR, elem)
+    if author is not None:
+        data["author"] = _text(author).strip()
+
+    # 必需标签（rating / warnings / categories）
+    tags = _first(_REQUIRED_TAGS, elem)
+    if tags is not None:
+        rating = _first(_RATING, tags)
+        if rating is not None:
+            data["rating"] = _text(rating).strip()
+
+        for w in _WARNINGS(tags):
+            wt = _text(w).strip()
+            if wt and wt != "No Archive Warnings Apply":
+                data["warnings"].append(wt)
+
+        for c in _CATEGORIES(tags):
+            ct = _text(c).strip()
+            if ct:
+                data["categories"].append(ct)
+
+    fandom_h5 = _first(_FANDOM_HEADING, elem)
+    if fandom_h5 is not None:
+        for a in _TAG_LINKS(fandom_h5):
+            fandom_text = _text(a).strip()
+            if fandom_text:
+                data["fandoms"].append(fandom_text)
+
+    # AO3 标签（relationship / character / freeform）
+    tag_section = _first(_TAG_SECTION, elem)
+    if tag_section is not None:
+        for li in _TAG_ITEMS(tag_section):
+            a = _first(_FIRST_TAG_LINK, li)
+            if a is None:
+                continue
+            text = _text(a).strip()
+            if not text:
+                continue
+            kind = tag_kind(li.get("class", ""))
+            if kind:
+                data[kind].append(text)
+
+    # Stats 区域（字数 / kudos / 收藏等）
+    stats = _first(_STATS, elem)
+    if stats is not None:
+        for field in STAT_FIELDS:
+            dd = _first(_STAT_DD[field], stats)
+            data[field] = parse_stat_int(_text(dd)) if dd is not None else 0
+
+        chapters_dd = _first(_STAT_DD["chapters"], stats)
+        if chapters_dd is not None:
+            data["chapters"] = _text(chapters_dd).strip()
+
+    # 年份提取
+    date = _first(_DATETIME, elem)
+    if date is not None:
+        m = YEAR_RE.search(_text(date))
+        if m:
+            data["year"] = m.group(1)
+
+    return data
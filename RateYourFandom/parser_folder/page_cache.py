@@ -0,0 +1,74 @@
+import os
+import shutil
+import pickle
+import hashlib
+
+from parser_folder import work_schema, works_extractor
+
+CACHE_DIR_NAME = ".parse_cache"
+# 改变解析结果结构时手动加一；解析器源码的改动会被下面的指纹自动识别
+PARSER_VERSION = 1
+
+_fingerprints = {}
+
+
+def extractor_fingerprint(backend):
+    """解析器指纹：版本号 + 后端名 + 解析相关源码的哈希，任何一处变化都会让旧缓存失效"""
+    if backend not in _fingerprints:
+        digest = hashlib.sha1(f"{PARSER_VERSION}:{backend}".encode("utf-8"))
+        source_files = [work_schema.__file__, works_extractor.__file__]
+        if backend.startswith("lxml"):
+            from parser_folder import lxml_extractor
+            source_files.append(lxml_extractor.__file__)
+        if backend.endswith("-split"):
+            from parser_folder import blurb_splitter
+            source_files.append(blurb_splitter.__file__)
+        for path in source_files:
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        _fingerprints[backend] = digest.hexdigest()[:16]
+    return _fingerprints[backend]
+
+
+class PageCache:
+    """
+    按页面内容哈希缓存 extract_works_data 的结果，存放在 HTML 目录下的 .parse_cache/<后端>-<指纹>/ 中。
+    解析器变化后指纹不同，同一后端的旧目录在分析开始时自动清理。
+    """
+
+    def __init__(self, folder, backend):
+        self.root = os.path.join(folder, CACHE_DIR_NAME)
+        self.backend = backend
+        self.name = f"{backend}-{extractor_fingerprint(backend)}"
+        self.dir = os.path.join(self.root, self.name)
+
+    def prune(self):
+        """删除同一后端旧版本解析器留下的缓存"""
+        if not os.path.isdir(self.root):
+            return
+        for name in os.listdir(self.root):
+            # 目录名是 <后端>-<指纹>，后端名本身可能带 "-"（lxml-split），按最后一个 "-" 拆分
+            if name.rsplit("-", 1)[0] == self.backend and name != self.name:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    @staticmethod
+    def content_key(raw):
+        return hashlib.sha256(raw).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.dir, key + ".pkl")
+
+    def load(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def store(self, key, works):
+        os.makedirs(self.dir, exist_ok=True)
+        # 多个解析进程可能同时写，先写临时文件再原子替换
+        tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(works, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._path(key))
@@ -1,8 +1,27 @@
 # tag_statistics.py
 import os
 import re
+import logging
 from collections import defaultdict, Counter
 
+logger = logging.getLogger(__name__)
+
+# numpy 在第一次批量计数时才导入，只读写报表的命令不必付出导入开销
+np = None
+
+TAG_FIELDS = ('characters', 'relationships', 'fandoms')
+
+def _load_numpy():
+    """按需导入 numpy；没有安装时返回 None，只能用逐个作品计数的实现"""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return None
+        np = numpy
+    return np
+
 def _normalize_tag(tag):
     """标准化标签文本：去首尾空白，collapse 多个空格。保留原大小写（AO3 标签大小写有意义），
     但去除不可见字符。返回原始字符串（如果为空则返回 None）。"""
@@ -11,8 +30,134 @@ def _normalize_tag(tag):
     text = re.sub(r'\s+', ' ', str(tag)).strip()
     return text if text else None
 
+def _normalize_and_filter(tag_list):
+    normalized = []
+    for t in tag_list:
+        nt = _normalize_tag(t)
+        if nt:
+            normalized.append(nt)
+    return normalized
+
+def _explode_tags(works, field):
+    """
+    把一个标签字段展开成 (标签 ID 数组, 每个作品的偏移数组, 原始标签表)。
+    WorkStore 直接复用其中的列；普通作品 dict 列表则在这里驻留一次。
+    """
+    if hasattr(works, 'tag_column'):
+        ids, offsets = works.tag_column(field)
+        return (np.frombuffer(ids, dtype=np.int32) if len(ids) else np.zeros(0, dtype=np.int32),
+                np.frombuffer(offsets, dtype=np.int64), works.vocab.names)
+
+    vocab = {}
+    ids = []
+    offsets = [0]
+    for work in works:
+        for tag in work.get(field) or []:
+            tag_id = vocab.get(tag)
+            if tag_id is None:
+                tag_id = vocab[tag] = len(vocab)
+            ids.append(tag_id)
+        offsets.append(len(ids))
+    return np.asarray(ids, dtype=np.int64), np.asarray(offsets, dtype=np.int64), list(vocab)
+
+def _year_labels(works):
+    """每个作品的年份编码及编码对应的年份标签（按首次出现顺序）"""
+    if hasattr(works, 'column'):
+        raw = np.frombuffer(works.column('year'), dtype=np.int64) if len(works) else np.zeros(0, dtype=np.int64)
+        values, first, codes = np.unique(raw, return_index=True, return_inverse=True)
+        order = np.argsort(first, kind='stable')
+        remap = np.empty(len(order), dtype=np.int64)
+        remap[order] = np.arange(len(order))
+        labels = [str(v) if v else '未知' for v in values[order].tolist()]
+        return remap[codes], labels
+
+    codes = []
+    label_ids = {}
+    for work in works:
+        year = work.get('year') or '未知'
+        code = label_ids.get(year)
+        if code is None:
+            code = label_ids[year] = len(label_ids)
+        codes.append(code)
+    return np.asarray(codes, dtype=np.int64), list(label_ids)
+
+def _ordered_counts(keys, first_positions, counts, names):
+    """按首次出现顺序生成 {名称: 次数}，与逐个作品累加的 Counter 插入顺序一致"""
+    order = np.argsort(first_positions, kind='stable')
+    return dict(zip([names[k] for k in keys[order].tolist()], counts[order].tolist()))
+
+def count_tags_vectorized(works, fields=TAG_FIELDS, count_once_per_work=True, weights=None):
+    """
+    批量计数：把作品展开成 (作品, 年份, 标签) 行，一次 unique/bincount 得到总计数和分年份计数。
+    与逐个作品计数的结果完全一致（标签先标准化，count_once_per_work 时同一作品内去重）。
+    weights: 可选，每个作品的权重（长度等于作品数），计数变为权重之和
+    返回 ({字段: {标签: 次数}}, {字段: {年份: {标签: 次数}}})
+    """
+    if _load_numpy() is None:
+        raise ImportError("count_tags_vectorized 需要 numpy")
+
+    year_codes, year_names = _year_labels(works)
+    n_works = len(year_codes)
+    weight_arr = None if weights is None else np.asarray(weights, dtype=np.float64)
+
+    overall = {}
+    yearly = {}
+    for field in fields:
+        raw_ids, offsets, raw_names = _explode_tags(works, field)
+
+        # 每个不同的原始标签只标准化一次，再映射到标准化后的 ID（空标签为 -1）
+        norm_ids = {}
+        norm_map = np.empty(len(raw_names), dtype=np.int64)
+        for raw_id, name in enumerate(raw_names):
+            nt = _normalize_tag(name)
+            norm_map[raw_id] = -1 if nt is None else norm_ids.setdefault(nt, len(norm_ids))
+        names = list(norm_ids)
+        vocab_size = max(len(names), 1)
+
+        tag_ids = norm_map[raw_ids] if len(raw_ids) else np.zeros(0, dtype=np.int64)
+        work_idx = np.repeat(np.arange(n_works, dtype=np.int64), np.diff(offsets))
+        keep = tag_ids >= 0
+        tag_ids, work_idx = tag_ids[keep], work_idx[keep]
+
+        # 行的原始顺序即"作品顺序 + 作品内顺序"，用它的下标表示首次出现的位置
+        pair_keys = work_idx * vocab_size + tag_ids
+        if count_once_per_work:
+            pair_keys, pair_first = np.unique(pair_keys, return_index=True)
+            tag_ids = pair_keys % vocab_size
+            work_idx = pair_keys // vocab_size
+        else:
+            pair_first = np.arange(len(pair_keys))
+        row_weights = None if weight_arr is None else weight_arr[work_idx]
+
+        def tally(keys):
+            uniq, first_idx, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            if row_weights is None:
+                counts = np.bincount(inverse, minlength=len(uniq))
+            else:
+                counts = np.bincount(inverse, weights=row_weights, minlength=len(uniq))
+            return uniq, pair_first[first_idx], counts
+
+        uniq, first, counts = tally(tag_ids)
+        overall[field] = _ordered_counts(uniq, first, counts, names)
+
+        year_of_row = year_codes[work_idx]
+        uniq, first, counts = tally(year_of_row * vocab_size + tag_ids)
+        uniq_years = uniq // vocab_size
+        uniq_tags = uniq % vocab_size
+        per_year = {}
+        # 年份按首次出现顺序排列
+        year_first = {}
+        for y, pos in zip(uniq_years.tolist(), first.tolist()):
+            year_first[y] = min(pos, year_first.get(y, pos))
+        for y in sorted(year_first, key=year_first.get):
+            mask = uniq_years == y
+            per_year[year_names[y]] = _ordered_counts(uniq_tags[mask], first[mask], counts[mask], names)
+        yearly[field] = per_year
+
+    return overall, yearly
+
 def analyze_characters_relationships_fandoms(works, download_info=None, filter_stats=None,
-                                             count_once_per_work=True):
+                                             count_once_per_work=True, engine='auto'):
     """
     分析 AO3 作品列表中的 characters/relationships/fandoms。
     参数:
@@ -20,6 +165,7 @@ def analyze_characters_relationships_fandoms(works, download_info=None, filter_s
       - download_info: 可选 dict，包含 'is_sampling' 和 'sampling_factor' 等
       - filter_stats: 可选 dict，用于后续对比（仅存回传，不在此函数自动使用）
       - count_once_per_work: 如果 True，则一个作品内重复出现的同一标签只计 1 次（通常需要）
+      - engine: 'vectorized' 用 numpy 批量计数，'python' 逐个作品计数，'auto' 有 numpy 时用前者
     返回:
       dict with keys: characters, relationships, fandoms, works, download_info, filter_stats, yearly_stats
     """
@@ -52,60 +198,64 @@ def analyze_characters_relationships_fandoms(works, download_info=None, filter_s
     except Exception:
         sampling_factor = 1.0
 
-    print(f"开始分析角色、关系和fandom数据（作品数={len(works)}) ...")
-
-    # 遍历作品
-    for i, work in enumerate(works):
-        year = work.get('year') or '未知'
-
-        # optional: 有时 works 的标签可能是 None 或字符串，强制成 list
-        characters = work.get('characters') or []
-        relationships = work.get('relationships') or []
-        fandoms = work.get('fandoms') or []
-
-        # 标准化并去重（在单个作品内）以避免一篇作品多次列出同一标签时被重复计数
-        def normalize_and_filter(tag_list):
-            normalized = []
-            for t in tag_list:
-                nt = _normalize_tag(t)
-                if nt:
-                    normalized.append(nt)
-            return normalized
-
-        norm_chars = normalize_and_filter(characters)
-        norm_rels = normalize_and_filter(relationships)
-        norm_fans = normalize_and_filter(fandoms)
+    logger.info(f"开始分析角色、关系和fandom数据（作品数={len(works)}) ...")
 
-        if count_once_per_work:
-            # 只在该作品内计数一次
-            unique_chars = set(norm_chars)
-            unique_rels = set(norm_rels)
-            unique_fans = set(norm_fans)
-        else:
-            unique_chars = norm_chars
-            unique_rels = norm_rels
-            unique_fans = norm_fans
-
-        # 增加计数
-        for ch in unique_chars:
-            all_characters[ch] += 1
-            yearly_characters[year][ch] += 1
+    if engine == 'auto':
+        engine = 'vectorized' if _load_numpy() is not None else 'python'
 
-        for rel in unique_rels:
-            all_relationships[rel] += 1
-            yearly_relationships[year][rel] += 1
-
-        for fan in unique_fans:
-            all_fandoms[fan] += 1
-            yearly_fandoms[year][fan] += 1
-
-        # 进度打印（每100条）
-        if (i + 1) % 100 == 0:
-            print(f"已处理 {i + 1}/{len(works)} 个作品")
+    if engine == 'vectorized':
+        overall, yearly = count_tags_vectorized(works, TAG_FIELDS, count_once_per_work)
+        all_characters = overall['characters']
+        all_relationships = overall['relationships']
+        all_fandoms = overall['fandoms']
+        yearly_characters = yearly['characters']
+        yearly_relationships = yearly['relationships']
+        yearly_fandoms = yearly['fandoms']
+    else:
+        # 遍历作品
+        for i, work in enumerate(works):
+            year = work.get('year') or '未知'
+
+            # optional: 有时 works 的标签可能是 None 或字符串，强制成 list
+            characters = work.get('characters') or []
+            relationships = work.get('relationships') or []
+            fandoms = work.get('fandoms') or []
+
+            # 标准化并去重（在单个作品内）以避免一篇作品多次列出同一标签时被重复计数
+            norm_chars = _normalize_and_filter(characters)
+            norm_rels = _normalize_and_filter(relationships)
+            norm_fans = _normalize_and_filter(fandoms)
+
+            if count_once_per_work:
+                # 只在该作品内计数一次（dict 去重保持出现顺序）
+                unique_chars = dict.fromkeys(norm_chars)
+                unique_rels = dict.fromkeys(norm_rels)
+                unique_fans = dict.fromkeys(norm_fans)
+            else:
+                unique_chars = norm_chars
+                unique_rels = norm_rels
+                unique_fans = norm_fans
+
+            # 增加计数
+            for ch in unique_chars:
+                all_characters[ch] += 1
+                yearly_characters[year][ch] += 1
+
+            for rel in unique_rels:
+                all_relationships[rel] += 1
+                yearly_relationships[year][rel] += 1
+
+            for fan in unique_fans:
+                all_fandoms[fan] += 1
+                yearly_fandoms[year][fan] += 1
+
+            # 进度打印（每100条）
+            if (i + 1) % 100 == 0:
+                logger.debug(f"已处理 {i + 1}/{len(works)} 个作品")
 
     # 如果抽样模式并且需要估算，则对计数做放大
     if is_sampling and sampling_factor and sampling_factor > 1.0:
-        print(f"抽样模式：对统计数据应用抽样倍数 {sampling_factor:.2f}")
+        logger.info(f"抽样模式：对统计数据应用抽样倍数 {sampling_factor:.2f}")
 
         def scale_counter(counter_obj, factor):
             return {k: int(v * factor) for k, v in counter_obj.items()}
@@ -133,10 +283,10 @@ def analyze_characters_relationships_fandoms(works, download_info=None, filter_s
         yearly_relationships_dict = {y: dict(c) for y, c in yearly_relationships.items()}
         yearly_fandoms_dict = {y: dict(c) for y, c in yearly_fandoms.items()}
 
-    print("角色、关系和fandom分析完成：")
-    print(f"  角色: {len(characters_dict)} 个不同角色")
-    print(f"  关系: {len(relationships_dict)} 个不同关系")
-    print(f"  同人圈: {len(fandoms_dict)} 个不同同人圈")
+    logger.info("角色、关系和fandom分析完成：")
+    logger.info(f"  角色: {len(characters_dict)} 个不同角色")
+    logger.info(f"  关系: {len(relationships_dict)} 个不同关系")
+    logger.info(f"  同人圈: {len(fandoms_dict)} 个不同同人圈")
 
     return {
         'characters': characters_dict,
@@ -166,7 +316,7 @@ def apply_sampling_to_tag_stats(tag_stats, sampling_factor):
     if factor <= 1.0:
         return tag_stats
 
-    print(f"对标签统计应用抽样补偿因子: {factor}")
+    logger.info(f"对标签统计应用抽样补偿因子: {factor}")
 
     def apply_factor(d):
         if isinstance(d, dict):
@@ -218,10 +368,10 @@ def create_tag_analysis_csvs(analysis_data, output_folder):
     filter_stats = analysis_data.get('filter_stats', {}) or {}
     yearly_stats = analysis_data.get('yearly_stats', {})
 
-    print(f"正在生成角色、关系和fandom的CSV文件到: {os.path.abspath(output_folder)}")
-    print(f"分析模式: {sampling_mode}")
+    logger.info(f"正在生成角色、关系和fandom的CSV文件到: {os.path.abspath(output_folder)}")
+    logger.info(f"分析模式: {sampling_mode}")
     if is_sampling:
-        print(f"抽样倍数: {sampling_factor:.2f}")
+        logger.info(f"抽样倍数: {sampling_factor:.2f}")
 
     # 1. 角色统计CSV
     characters = analysis_data.get('characters', {}) or {}
@@ -239,7 +389,7 @@ def create_tag_analysis_csvs(analysis_data, output_folder):
             })
         pd.DataFrame(characters_list).to_csv(os.path.join(output_folder, '角色统计.csv'),
                                              index=False, encoding='utf-8-sig')
-        print(f"角色统计: {len(characters_list)} 条记录")
+        logger.info(f"角色统计: {len(characters_list)} 条记录")
 
     # 2. 关系统计CSV
     relationships = analysis_data.get('relationships', {}) or {}
@@ -257,7 +407,7 @@ def create_tag_analysis_csvs(analysis_data, output_folder):
             })
         pd.DataFrame(relationships_list).to_csv(os.path.join(output_folder, '关系统计.csv'),
                                                 index=False, encoding='utf-8-sig')
-        print(f"关系统计: {len(relationships_list)} 条记录")
+        logger.info(f"关系统计: {len(relationships_list)} 条记录")
 
     # 3. 同人圈统计CSV
     fandoms = analysis_data.get('fandoms', {}) or {}
@@ -271,7 +421,7 @@ def create_tag_analysis_csvs(analysis_data, output_folder):
             })
         pd.DataFrame(fandoms_list).to_csv(os.path.join(output_folder, '同人圈统计.csv'),
                                           index=False, encoding='utf-8-sig')
-        print(f"同人圈统计: {len(fandoms_list)} 条记录")
+        logger.info(f"同人圈统计: {len(fandoms_list)} 条记录")
 
     # 4. 分年份统计
     create_tag_yearly_statistics(yearly_stats, output_folder, is_sampling, sampling_factor)
@@ -287,7 +437,7 @@ def create_tag_yearly_statistics(yearly_stats, output_folder, is_sampling=False,
     yearly_folder = os.path.join(output_folder, "分年份统计")
     os.makedirs(yearly_folder, exist_ok=True)
 
-    print("生成分年份统计...")
+    logger.info("生成分年份统计...")
 
     y_chars = yearly_stats.get('characters', {}) or {}
     if y_chars:
@@ -302,7 +452,7 @@ def create_tag_yearly_statistics(yearly_stats, output_folder, is_sampling=False,
                 })
         pd.DataFrame(rows).to_csv(os.path.join(yearly_folder, '分年份角色统计.csv'),
                                  index=False, encoding='utf-8-sig')
-        print(f"分年份角色统计: {len(rows)} 条记录")
+        logger.info(f"分年份角色统计: {len(rows)} 条记录")
 
     y_rels = yearly_stats.get('relationships', {}) or {}
     if y_rels:
@@ -317,7 +467,7 @@ def create_tag_yearly_statistics(yearly_stats, output_folder, is_sampling=False,
                 })
         pd.DataFrame(rows).to_csv(os.path.join(yearly_folder, '分年份关系统计.csv'),
                                  index=False, encoding='utf-8-sig')
-        print(f"分年份关系统计: {len(rows)} 条记录")
+        logger.info(f"分年份关系统计: {len(rows)} 条记录")
 
     y_fans = yearly_stats.get('fandoms', {}) or {}
     if y_fans:
@@ -332,7 +482,7 @@ def create_tag_yearly_statistics(yearly_stats, output_folder, is_sampling=False,
                 })
         pd.DataFrame(rows).to_csv(os.path.join(yearly_folder, '分年份同人圈统计.csv'),
                                  index=False, encoding='utf-8-sig')
-        print(f"分年份同人圈统计: {len(rows)} 条记录")
+        logger.info(f"分年份同人圈统计: {len(rows)} 条记录")
 
     # 年份作品数量估计：选择 characters/relationships/fandoms 中的最大总数作为该年作品数估计
     yearly_works_count = {}
@@ -355,7 +505,7 @@ def create_tag_yearly_statistics(yearly_stats, output_folder, is_sampling=False,
         })
     pd.DataFrame(rows).to_csv(os.path.join(yearly_folder, '分年份作品数量.csv'),
                              index=False, encoding='utf-8-sig')
-    print(f"分年份作品数量: {len(rows)} 条记录")
+    logger.info(f"分年份作品数量: {len(rows)} 条记录")
 
 
 def create_tag_comparison_report(analysis_data, output_folder):
@@ -369,7 +519,7 @@ def create_tag_comparison_report(analysis_data, output_folder):
     comparison_folder = os.path.join(output_folder, "对比分析")
     os.makedirs(comparison_folder, exist_ok=True)
 
-    print("生成对比分析报告...")
+    logger.info("生成对比分析报告...")
 
     if filter_stats.get('characters') and analysis_data.get('characters'):
         rows = []
@@ -385,7 +535,7 @@ def create_tag_comparison_report(analysis_data, output_folder):
             })
         pd.DataFrame(rows).to_csv(os.path.join(comparison_folder, '角色对比分析.csv'),
                                  index=False, encoding='utf-8-sig')
-        print(f"角色对比分析: {len(rows)} 条记录")
+        logger.info(f"角色对比分析: {len(rows)} 条记录")
 
     if filter_stats.get('relationships') and analysis_data.get('relationships'):
         rows = []
@@ -401,7 +551,7 @@ def create_tag_comparison_report(analysis_data, output_folder):
             })
         pd.DataFrame(rows).to_csv(os.path.join(comparison_folder, '关系对比分析.csv'),
                                  index=False, encoding='utf-8-sig')
-        print(f"关系对比分析: {len(rows)} 条记录")
+        logger.info(f"关系对比分析: {len(rows)} 条记录")
 
     # 对比总结
     create_tag_comparison_summary(analysis_data, comparison_folder)
@@ -449,7 +599,7 @@ def create_tag_comparison_summary(analysis_data, comparison_folder):
         os.makedirs(comparison_folder, exist_ok=True)
         pd.DataFrame(summary_data).to_csv(os.path.join(comparison_folder, '对比总结报告.csv'),
                                           index=False, encoding='utf-8-sig')
-        print("对比总结报告已生成")
+        logger.info("对比总结报告已生成")
 
 
 def get_top_tags_summary(tag_stats, top_n=10):
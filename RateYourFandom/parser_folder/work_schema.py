@@ -0,0 +1,71 @@
+import re
+
+# 各解析后端共用的作品字段定义，保证输出的 dict 完全一致
+BLURB_CLASS_RE = re.compile(r"work.*blurb.*group")
+YEAR_RE = re.compile(r"(20\d{2})")
+STAT_FIELDS = ("words", "comments", "bookmarks", "kudos", "hits")
+AO3_BASE_URL = "https://archiveofourown.org"
+_WORK_URL_RE = re.compile(re.escape(AO3_BASE_URL) + r"/works/(\d+)$")
+
+
+def new_work(filename):
+    """空白作品记录（键的顺序即 CSV 之外各处看到的顺序）"""
+    return {
+        "source_file": filename,
+        "title": "",
+        "author": "",
+        "url": "",
+
+        "rating": "",
+        "warnings": [],
+        "categories": [],
+        "fandoms": [],
+        "relationships": [],
+        "characters": [],
+        "freeforms": [],
+
+        "words": 0,
+        "chapters": "0",
+        "kudos": 0,
+        "hits": 0,
+        "bookmarks": 0,
+        "comments": 0,
+
+        "year": "未知",
+    }
+
+
+def absolute_url(href):
+    if href.startswith("/"):
+        return AO3_BASE_URL + href
+    return href
+
+
+def work_id_from_url(url):
+    """作品链接中的数字编号；不是 AO3 作品链接时返回 None"""
+    match = _WORK_URL_RE.match(url or "")
+    return int(match.group(1)) if match else None
+
+
+def parse_stat_int(text):
+    """'1,234' -> 1234；'2/?' 取斜杠前；无法解析返回 0"""
+    if text is None:
+        return 0
+    text = text.replace(",", "").strip()
+    if "/" in text:
+        text = text.split("/")[0]
+    return int(text) if text.isdigit() else 0
+
+
+def tag_kind(li_class):
+    """根据 ul.tags 下 li 的 class 判断标签类型"""
+    # relationship / relationships
+    if "relationship" in li_class:
+        return "relationships"
+    # character / characters
+    if "character" in li_class:
+        return "characters"
+    # freeform / freeforms
+    if "freeform" in li_class:
+        return "freeforms"
+    return None
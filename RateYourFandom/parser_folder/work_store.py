@@ -0,0 +1,153 @@
+from array import array
+from collections.abc import Mapping, Sequence
+
+from parser_folder.work_schema import new_work, work_id_from_url, AO3_BASE_URL
+
+# 作品字段按存储方式分组
+INT_COLUMNS = ("words", "kudos", "hits", "bookmarks", "comments", "year")
+TAG_COLUMNS = ("warnings", "categories", "fandoms", "relationships", "characters", "freeforms")
+INTERNED_COLUMNS = ("source_file", "author", "rating", "chapters")
+WORK_KEYS = tuple(new_work("").keys())
+
+UNKNOWN_YEAR = "未知"
+
+
+class TagVocab:
+    """字符串驻留表：同一个标签在所有作品中只存一份，作品里只记整数 ID"""
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def intern(self, name):
+        tag_id = self.ids.get(name)
+        if tag_id is None:
+            tag_id = len(self.names)
+            self.ids[name] = tag_id
+            self.names.append(name)
+        return tag_id
+
+    def __getitem__(self, tag_id):
+        return self.names[tag_id]
+
+    def __len__(self):
+        return len(self.names)
+
+
+class WorkStore(Sequence):
+    """
+    列式作品存储：
+      - 数值列（字数、kudos、年份等）存为 array('q')，年份未知记 0
+      - 标签列存为 驻留 ID 数组 + 偏移数组，第 i 个作品的标签是 ids[offsets[i]:offsets[i+1]]
+      - 评级、作者、章节、来源文件等重复率高的字符串也驻留
+      - AO3 作品链接只存作品编号
+    下标访问返回 WorkRow 懒加载视图，用起来和原来的作品 dict 一样。
+    """
+
+    def __init__(self, works=()):
+        self.vocab = TagVocab()
+        self.ints = {column: array("q") for column in INT_COLUMNS}
+        self.interned = {column: array("i") for column in INTERNED_COLUMNS}
+        self.tag_ids = {column: array("i") for column in TAG_COLUMNS}
+        self.tag_offsets = {column: array("q", [0]) for column in TAG_COLUMNS}
+        self.titles = []
+        self.work_ids = array("q")
+        self._other_urls = {}
+        self.extend(works)
+
+    def append(self, work):
+        index = len(self.titles)
+        intern = self.vocab.intern
+        for column in INT_COLUMNS:
+            value = work[column]
+            if column == "year":
+                value = int(value) if str(value).isdigit() else 0
+            self.ints[column].append(value)
+        for column in INTERNED_COLUMNS:
+            self.interned[column].append(intern(work[column]))
+        for column in TAG_COLUMNS:
+            ids = self.tag_ids[column]
+            ids.extend(intern(tag) for tag in work[column])
+            self.tag_offsets[column].append(len(ids))
+        self.titles.append(work["title"])
+
+        url = work["url"]
+        work_id = work_id_from_url(url)
+        if work_id is not None:
+            self.work_ids.append(work_id)
+        else:
+            self.work_ids.append(-1)
+            self._other_urls[index] = url
+
+    def extend(self, works):
+        for work in works:
+            self.append(work)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [WorkRow(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("作品下标越界")
+        return WorkRow(self, index)
+
+    def column(self, name):
+        """数值列或驻留列的原始数组（可直接交给 numpy.frombuffer）"""
+        if name in self.ints:
+            return self.ints[name]
+        return self.interned[name]
+
+    def tag_column(self, name):
+        """返回 (标签 ID 数组, 偏移数组)"""
+        return self.tag_ids[name], self.tag_offsets[name]
+
+    def tags(self, name, index):
+        offsets = self.tag_offsets[name]
+        names = self.vocab.names
+        return [names[tag_id] for tag_id in self.tag_ids[name][offsets[index]:offsets[index + 1]]]
+
+    def value(self, index, key):
+        if key in self.tag_ids:
+            return self.tags(key, index)
+        if key == "year":
+            year = self.ints["year"][index]
+            return str(year) if year else UNKNOWN_YEAR
+        if key in self.ints:
+            return self.ints[key][index]
+        if key in self.interned:
+            return self.vocab.names[self.interned[key][index]]
+        if key == "title":
+            return self.titles[index]
+        if key == "url":
+            work_id = self.work_ids[index]
+            return f"{AO3_BASE_URL}/works/{work_id}" if work_id >= 0 else self._other_urls[index]
+        raise KeyError(key)
+
+
+class WorkRow(Mapping):
+    """WorkStore 中单个作品的只读视图，按需从各列取值"""
+
+    __slots__ = ("store", "index")
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, key):
+        return self.store.value(self.index, key)
+
+    def __iter__(self):
+        return iter(WORK_KEYS)
+
+    def __len__(self):
+        return len(WORK_KEYS)
+
+    def to_dict(self):
+        return {key: self[key] for key in WORK_KEYS}
+
+    def __repr__(self):
+        return f"WorkRow({self.to_dict()!r})"
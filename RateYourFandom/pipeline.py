@@ -0,0 +1,186 @@
+"""
+边下载边解析的流水线。
+
+    抓取线程 --on_page--> 有界队列 --> 解析进程池 --> 重排缓冲 --> 统计器
+
+每保存一页就把解析任务交给解析进程（或线程），汇总线程按页码顺序把解析结果并入 WorkAggregator，
+所以 CPU 在抓取期间就开始工作，总耗时约为 max(抓取, 解析) 而不是两者之和。
+队列满时 on_page 会阻塞抓取线程（背压），内存中待处理的页数不超过 max_pending。
+
+统计结果与先下载再 analyze_folder 完全相同：
+  - 解析结果按页码顺序并入统计器；乱序到达的页先放在重排缓冲中，抽样时不连续的页在下载结束后按顺序并入
+  - 分层抽样的页权重要到下载结束才确定，这种情况下解析照常并行，只是并入统计器推迟到最后
+  - 本次没有下载的页（续传跳过的、目录里原有的）在下载结束后补充解析
+"""
+import os
+import queue
+import time
+import threading
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from download.downloader import download_ao3_pages
+from parser_folder.analyzer import _parse_page_file, load_download_info, finalize_stats, record_parsed_page
+from parser_folder.aggregator import WorkAggregator
+from parser_folder.page_cache import PageCache
+from parser_folder.works_extractor import default_backend
+from utils.page_storage import PAGE_FILE_RE, list_pages
+from utils.metrics import METRICS
+from utils.profiling import PROFILER
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+# on_page 在队列满时每隔这么多秒检查一次汇总线程是否还在运行
+_PUT_TIMEOUT = 1.0
+
+
+class ParsePipeline:
+    """
+    把 on_page 交给 download_ao3_pages，下载结束后调用 finish(info) 得到与 analyze_folder 相同的 stats。
+    parse_workers: 解析进程数，默认为 CPU 核数；1 表示用一个后台线程解析
+    max_pending: 已交给解析但还没并入统计器的最多页数，默认为解析进程数的 4 倍
+    stream_aggregate: False 时解析结果全部缓存到 finish 再并入统计器（分层抽样需要最终的页权重）
+    freeform_top: 见 analyze_folder
+    """
+
+    def __init__(self, folder, parse_workers=None, parser_backend=None, use_cache=True,
+                 keep_works=True, tag_engine="stream", stream_aggregate=True, max_pending=None,
+                 freeform_top=None):
+        self.folder = folder
+        self.parser_backend = parser_backend or default_backend()
+        self.use_cache = use_cache
+        self.keep_works = keep_works
+        self.tag_engine = tag_engine
+        self.freeform_top = freeform_top
+        if parse_workers is None:
+            parse_workers = os.cpu_count() or 1
+        if parse_workers > 1:
+            self.executor = ProcessPoolExecutor(max_workers=parse_workers)
+            # 在抓取线程启动前先把解析进程都创建好，避免在多线程进程里 fork
+            self.executor.submit(os.getpid).result()
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        self.pending = queue.Queue(maxsize=max_pending or max(4, parse_workers * 4))
+        self.aggregator = (WorkAggregator(keep_works=keep_works, tag_engine=tag_engine, freeform_top=freeform_top)
+                           if stream_aggregate else None)
+        if use_cache:
+            PageCache(folder, self.parser_backend).prune()
+
+        self.submitted = set()
+        self.buffer = {}
+        self.next_page = 1
+        self.cache_hits = 0
+        # 汇总线程里并入统计器时的异常，在 on_page / finish 中重新抛出
+        self.error = None
+        self.collector = threading.Thread(target=self._collect, daemon=True)
+        self.collector.start()
+
+    def on_page(self, page, html=None):
+        """抓取线程的回调：页面已经保存到磁盘，提交解析任务；队列满时阻塞"""
+        if page in self.submitted:
+            return
+        self.submitted.add(page)
+        # 解析进程从磁盘读取保存后的页面（可能已裁剪），与 analyze_folder 解析的内容一致，也能共用解析缓存
+        task = (self.folder, f"page_{page}.html", self.parser_backend, self.use_cache)
+        item = (page, self.executor.submit(_parse_page_file, task))
+        while True:
+            self._raise_if_failed()
+            try:
+                self.pending.put(item, timeout=_PUT_TIMEOUT)
+                return
+            except queue.Full:
+                if not self.collector.is_alive():
+                    raise RuntimeError("解析汇总线程已经退出，无法继续提交解析任务")
+
+    def _raise_if_failed(self):
+        if self.error is not None:
+            raise RuntimeError(f"汇总解析结果时出错: {self.error}") from self.error
+
+    def _collect(self):
+        while True:
+            item = self.pending.get()
+            if item is _DONE:
+                return
+            page, future = item
+            start = time.perf_counter()
+            try:
+                self.buffer[page] = future.result()
+            except Exception as e:
+                # 解析进程异常退出等情况只记为这一页出错，汇总线程继续运行，抓取线程不会卡在队列上
+                self.buffer[page] = (f"page_{page}.html", [], str(e), False)
+            METRICS.add_time("parse", time.perf_counter() - start)
+            if self.error is not None:
+                # 已经出错：只继续取走队列中的任务，不再并入，抓取线程不会因为队列满而卡住
+                self.buffer.clear()
+                continue
+            if self.aggregator is not None:
+                try:
+                    self._release()
+                except Exception as e:
+                    logger.error(f"汇总解析结果时出错: {e}")
+                    self.error = e
+
+    def _release(self):
+        """把从 next_page 起连续的已解析页按顺序并入统计器"""
+        while self.next_page in self.buffer:
+            self._aggregate(self.buffer.pop(self.next_page))
+            self.next_page += 1
+
+    def _aggregate(self, result):
+        filename, works, error, cached = result
+        if not record_parsed_page(works, error, cached):
+            logger.warning(f"处理文件 {filename} 时出错: {error}")
+            return
+        self.cache_hits += cached
+        with METRICS.stage("aggregate"):
+            self.aggregator.add_many(works)
+
+    def finish(self, info=None):
+        """补充解析本次没有下载的页，等待全部解析完成，返回 stats"""
+        info = info or load_download_info(self.folder)
+        html_files = list_pages(self.folder)
+        for filename in html_files:
+            self.on_page(int(PAGE_FILE_RE.match(filename).group(1)))
+        self.pending.put(_DONE)
+        self.collector.join()
+        self.executor.shutdown()
+        self._raise_if_failed()
+
+        if self.aggregator is None:
+            self.aggregator = WorkAggregator(keep_works=self.keep_works, tag_engine=self.tag_engine,
+                                             page_weights=info.get("page_weights"),
+                                             freeform_top=self.freeform_top)
+        # 抽样时不连续的页和延后并入的页，按页码顺序并入
+        for page in sorted(self.buffer):
+            self._aggregate(self.buffer[page])
+        self.buffer.clear()
+
+        logger.info(f"共解析 {len(html_files)} 个HTML文件，总共提取到 {self.aggregator.work_count} 个作品")
+        if self.use_cache:
+            logger.info(f"解析缓存命中: {self.cache_hits}/{len(html_files)} 个文件")
+        return finalize_stats(self.aggregator, info, info.get("filter_stats", {}))
+
+    def close(self):
+        """出错时停止后台线程和解析进程"""
+        if self.collector.is_alive():
+            self.pending.put(_DONE)
+            self.collector.join()
+        self.executor.shutdown(cancel_futures=True)
+
+
+@PROFILER.profiled("run_pipeline")
+def run_pipeline(tag_url, save_folder, parse_workers=None, parser_backend=None, use_cache=True,
+                 keep_works=True, tag_engine="stream", max_pending=None, freeform_top=None, **download_options):
+    """
+    下载并同时解析统计，返回与 analyze_folder 相同的 stats。
+    download_options 原样传给 download_ao3_pages（workers、rate、backend、sampling、storage 等）。
+    """
+    stream_aggregate = download_options.get("sampling", "uniform") != "stratified"
+    pipeline = ParsePipeline(save_folder, parse_workers, parser_backend, use_cache, keep_works, tag_engine,
+                             stream_aggregate, max_pending, freeform_top)
+    try:
+        info = download_ao3_pages(tag_url, save_folder, on_page=pipeline.on_page, **download_options)
+        return pipeline.finish(info)
+    finally:
+        pipeline.close()
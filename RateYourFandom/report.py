@@ -0,0 +1,68 @@
+"""
+只分析、不下载：对已经下载好的页面目录重新生成报表。
+
+用法（在 RateYourFandom 目录下）:
+    python report.py ao3_html_pages
+    python report.py ao3_html_pages --output ao3_csv_output --workers 1 --formats csv parquet
+
+这个入口不导入任何抓取相关的模块（selenium、requests），pandas 只在写对比报告时才导入，
+没有安装 selenium 也能运行。启动开销见 benchmarks/bench_startup.py。
+"""
+import os
+import sys
+import argparse
+
+from parser_folder.analyzer import analyze_folder
+from output.csv_writer import write_csv
+from utils.metrics import METRICS
+from utils.log import setup_logging, add_log_level_argument
+from utils.profiling import PROFILER, add_profile_argument, profile_modes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="分析已下载的页面目录并生成报表（不联网）")
+    parser.add_argument("folder", nargs="?", default="ao3_html_pages", help="下载的页面目录")
+    parser.add_argument("--output", default="ao3_csv_output", help="报表输出目录")
+    parser.add_argument("--workers", type=int, default=None, help="解析进程数，默认为 CPU 核数；1 表示串行")
+    parser.add_argument("--parser", default=None, help="解析后端（lxml / bs4 / lxml-split / bs4-split）")
+    parser.add_argument("--no-cache", action="store_true", help="不使用解析缓存")
+    parser.add_argument("--no-works", action="store_true", help="不保留作品列表（不输出作品详细信息），适合大型分析")
+    parser.add_argument("--tag-engine", default="stream", choices=("stream", "vectorized"))
+    parser.add_argument("--freeform-top", type=int, default=None, metavar="N",
+                        help="自由标签只近似统计前 N 个（总体和每年），内存固定，报表附带误差上限")
+    parser.add_argument("--cooccurrence", action="store_true",
+                        help="输出标签共现表（角色 × 角色、关系 × 自由标签，含 lift / PMI），需要 scipy")
+    parser.add_argument("--cooccurrence-top", type=int, default=1000, metavar="N", help="共现表输出的组合数")
+    parser.add_argument("--formats", nargs="+", default=["csv"], help="输出格式：csv / parquet / arrow")
+    parser.add_argument("--db", default=None, help="同时写入的 SQLite 作品库路径")
+    parser.add_argument("--prom-file", default=None,
+                        help="Prometheus 文本文件路径（例如 node_exporter 的 textfile 目录），默认写在输出目录")
+    add_log_level_argument(parser)
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+    if args.cooccurrence and args.no_works:
+        parser.error("--cooccurrence 需要保留作品列表，不能与 --no-works 同时使用")
+    setup_logging(args.log_level)
+    METRICS.reset()
+    if profile_modes(args):
+        PROFILER.start(os.path.join(args.output, "profile"), profile_modes(args))
+
+    try:
+        stats = analyze_folder(args.folder, workers=args.workers, parser_backend=args.parser,
+                               keep_works=not args.no_works, use_cache=not args.no_cache,
+                               tag_engine=args.tag_engine, db_path=args.db, freeform_top=args.freeform_top)
+        if args.cooccurrence:
+            from parser_folder.cooccurrence import compute_cooccurrence
+            stats['cooccurrence'] = compute_cooccurrence(stats['works'], stats['download_info'],
+                                                         top=args.cooccurrence_top)
+        write_csv(stats, args.output, formats=tuple(args.formats))
+    finally:
+        PROFILER.stop()
+    METRICS.write_report(args.output, labels={"entry": "report", "folder": os.path.abspath(args.folder)},
+                         prom_path=args.prom_file)
+    print("完成！报表已生成在", args.output, "文件夹中。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,8 @@
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 
+from utils.http_session import USER_AGENT
+
 def create_driver(headless=True):
     options = Options()
     if headless:
@@ -8,5 +10,5 @@ def create_driver(headless=True):
     options.add_argument("--disable-blink-features=AutomationControlled")
     options.add_argument("--disable-dev-shm-usage")
     options.add_argument("--no-sandbox")
-    options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
+    options.add_argument(f"--user-agent={USER_AGENT}")
     return webdriver.Chrome(options=options)
\ No newline at end of file
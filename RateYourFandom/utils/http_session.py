@@ -0,0 +1,41 @@
+# 与 chrome_driver 使用同一个 UA，保证两个后端在服务器看来是同一个客户端
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+DEFAULT_HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+def create_session(pool_size=4):
+    """创建保持长连接的 requests 会话（requests 只在需要时导入）"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def copy_cookies_to_driver(session, driver, base_url):
+    """把会话 cookie 同步到浏览器（浏览器需先打开同域页面才能写 cookie）"""
+    driver.get(base_url)
+    for cookie in session.cookies:
+        data = {"name": cookie.name, "value": cookie.value, "path": cookie.path or "/"}
+        if cookie.secure:
+            data["secure"] = True
+        try:
+            driver.add_cookie(data)
+        except Exception:
+            continue
+
+
+def copy_cookies_from_driver(driver, session):
+    """把浏览器里的 cookie（例如通过验证后拿到的）写回会话"""
+    for cookie in driver.get_cookies():
+        session.cookies.set(cookie["name"], cookie["value"],
+                            domain=cookie.get("domain"), path=cookie.get("path", "/"))
@@ -0,0 +1,36 @@
+import sys
+import logging
+
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+
+
+class _ConsoleFormatter(logging.Formatter):
+    """INFO 只输出消息本身（与原来的 print 一致），其他级别加上级别前缀"""
+
+    def format(self, record):
+        message = super().format(record)
+        if record.levelno == logging.INFO:
+            return message
+        return f"[{record.levelname}] {message}"
+
+
+def setup_logging(level="INFO"):
+    """
+    命令行入口调用：把各模块的日志输出到标准输出。
+    DEBUG 额外输出逐页、逐文件的进度；WARNING 只输出问题。
+    """
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(_ConsoleFormatter("%(message)s"))
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    # 第三方库（selenium、urllib3 等）的调试日志太多，只保留警告
+    for name in ("selenium", "urllib3", "charset_normalizer"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+
+def add_log_level_argument(parser):
+    parser.add_argument("--log-level", default="INFO", choices=LOG_LEVELS,
+                        help="日志级别；DEBUG 输出逐页进度，WARNING 只输出问题")
@@ -0,0 +1,180 @@
+"""
+运行指标：各阶段累计耗时、计数器和峰值内存，运行结束时写成机器可读的报告。
+
+    from utils.metrics import METRICS
+    with METRICS.stage("export"):
+        ...
+    METRICS.count("pages_fetched")
+    METRICS.write_report(folder, labels={"entry": "report"})
+
+阶段（STAGES）：fetch 抓取、parse 解析、aggregate 汇总统计、export 写报表。
+耗时是各次进入该阶段的墙钟时间之和；流水线和批量任务里阶段会互相重叠，
+所以各阶段之和可能大于 wall_seconds。
+多进程解析时，解析进程内的工作不会计入这里的计数器，主进程按返回的结果计数；
+parse 记录的是主进程等待解析结果的时间。
+
+报告写两份：
+  - run_report.json：完整的阶段耗时、计数器和内存
+  - run_report.prom：Prometheus 文本格式，可放进 node_exporter 的 textfile 目录
+"""
+import os
+import sys
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，不记录峰值内存
+    resource = None
+
+STAGES = ("fetch", "parse", "aggregate", "export")
+# 报告中始终出现的计数器（没有发生时为 0），其他名字用到时自动加入
+COUNTERS = (
+    "pages_fetched", "bytes_fetched", "fetch_retries", "fetch_errors", "rate_limited", "captcha_hits",
+    "pages_saved", "bytes_saved",
+    "pages_parsed", "parse_errors", "parse_cache_hits", "works_parsed",
+    "files_exported", "rows_exported",
+)
+REPORT_NAME = "run_report.json"
+PROM_NAME = "run_report.prom"
+PROM_PREFIX = "ryf_"
+
+
+def peak_rss_bytes(children=False):
+    """本进程（children=True 时为已结束的子进程中最大的一个）的峰值常驻内存，无法获取时返回 None"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # Linux 上 ru_maxrss 的单位是 KB，macOS 上是字节
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_label_value(value)}"' for key, value in sorted(labels.items())) + "}"
+
+
+class RunMetrics:
+    """线程安全的阶段计时器和计数器，一次运行一个实例（通常用模块级的 METRICS）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self._start_clock = time.perf_counter()
+            self.stage_seconds = dict.fromkeys(STAGES, 0.0)
+            self.stage_calls = dict.fromkeys(STAGES, 0)
+            self.counters = dict.fromkeys(COUNTERS, 0)
+
+    def add_time(self, stage, seconds, calls=1):
+        with self._lock:
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+            self.stage_calls[stage] = self.stage_calls.get(stage, 0) + calls
+
+    @contextmanager
+    def stage(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def timed(self, stage):
+        """装饰器：函数每次调用的耗时计入 stage"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def timed_iter(self, stage, iterable):
+        """逐个产出 iterable 的元素，把等待每个元素的时间计入 stage（调用方处理元素的时间不计入）"""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(stage, time.perf_counter() - start, calls=0)
+                return
+            self.add_time(stage, time.perf_counter() - start)
+            yield item
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self):
+        """当前指标的 dict，即 run_report.json 的内容"""
+        with self._lock:
+            return {
+                "started_at": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+                "wall_seconds": round(time.perf_counter() - self._start_clock, 3),
+                "stages": {stage: {"seconds": round(seconds, 3), "calls": self.stage_calls.get(stage, 0)}
+                           for stage, seconds in self.stage_seconds.items()},
+                "counters": dict(self.counters),
+                "peak_rss_bytes": peak_rss_bytes(),
+                "children_peak_rss_bytes": peak_rss_bytes(children=True),
+            }
+
+    def prometheus_text(self, labels=None, snapshot=None):
+        """Prometheus 文本格式；labels 会加到每个指标上，用来区分不同的任务"""
+        snapshot = snapshot or self.snapshot()
+        labels = dict(labels or {})
+        lines = []
+
+        def gauge(name, help_text, samples):
+            lines.append(f"# HELP {PROM_PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {PROM_PREFIX}{name} gauge")
+            for extra, value in samples:
+                lines.append(f"{PROM_PREFIX}{name}{_labels_text(dict(labels, **extra))} {value}")
+
+        gauge("run_started_timestamp_seconds", "Unix time the run started.", [({}, round(self.started, 3))])
+        gauge("run_wall_seconds", "Wall-clock duration of the run.", [({}, snapshot["wall_seconds"])])
+        gauge("stage_seconds", "Accumulated wall-clock seconds spent in each stage.",
+              [({"stage": stage}, data["seconds"]) for stage, data in snapshot["stages"].items()])
+        for name, value in snapshot["counters"].items():
+            gauge(name, f"{name.replace('_', ' ')} during the run.", [({}, value)])
+        for key in ("peak_rss_bytes", "children_peak_rss_bytes"):
+            if snapshot[key] is not None:
+                gauge(key, f"{key.replace('_', ' ')} (ru_maxrss).", [({}, snapshot[key])])
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, folder, labels=None, prom_path=None, extra=None):
+        """
+        写出 folder/run_report.json 和 Prometheus 文本文件（默认 folder/run_report.prom）。
+        extra 会并入 JSON 报告（例如下载信息）；两个文件都先写临时文件再替换，采集方不会读到半个文件。
+        """
+        os.makedirs(folder, exist_ok=True)
+        snapshot = self.snapshot()
+        report = dict(snapshot, labels=dict(labels or {}), **(extra or {}))
+        json_path = os.path.join(folder, REPORT_NAME)
+        if prom_path:
+            os.makedirs(os.path.dirname(os.path.abspath(prom_path)), exist_ok=True)
+        else:
+            prom_path = os.path.join(folder, PROM_NAME)
+        for path, text in ((json_path, json.dumps(report, indent=2, ensure_ascii=False)),
+                           (prom_path, self.prometheus_text(labels, snapshot))):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        return json_path
+
+
+# 整个进程共用的指标；一次运行开始时调用 METRICS.reset()
+METRICS = RunMetrics()
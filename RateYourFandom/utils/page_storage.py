@@ -0,0 +1,174 @@
+import os
+import re
+import gzip
+import importlib.util
+
+from utils.metrics import METRICS
+
+# 'raw' 原样保存整页 HTML；'gzip' / 'zstd' 压缩保存（zstd 需要安装 zstandard）
+STORAGE_FORMATS = ("raw", "gzip", "zstd")
+EXTENSIONS = {"raw": ".html", "gzip": ".html.gz", "zstd": ".html.zst"}
+# 同一页有多种格式的文件时按这个顺序取
+_READ_ORDER = ("zstd", "gzip", "raw")
+
+PAGE_FILE_RE = re.compile(r"^page_(\d+)\.html(\.gz|\.zst)?$")
+
+# 属性值可能用双引号、单引号或不加引号
+_HEADING_RE = re.compile(r'<h2\b[^>]*\sclass\s*=\s*["\']?[^"\'>]*\bheading\b[^>]*>.*?</h2\s*>', re.S | re.I)
+_PAGINATION_RE = re.compile(r'<ol\b[^>]*\sclass\s*=\s*["\']?[^"\'>]*\bpagination\b[^>]*>', re.I)
+_FILTERS_RE = re.compile(r'<form\b[^>]*\sid\s*=\s*["\']?work-filters\b[^>]*>', re.I)
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstd 格式需要安装 zstandard")
+    return zstandard
+
+
+def _whole_page_backend():
+    """不切分、直接解析整页的后端，用来确认切不出 blurb 的页面确实没有作品"""
+    return "lxml" if importlib.util.find_spec("lxml") is not None else "bs4"
+
+
+def trim_page(html, keep_filters=False):
+    """
+    只保留分析需要的片段：列表标题、分页、每个作品 blurb（第一页另外保留筛选栏）。
+    blurb 的判断与解析器相同（li 的 class 依次含 work / blurb / group）。
+    页面结构不完整（找不到配对的结束标签）时原样返回，宁可不裁剪也不丢数据；
+    一个 blurb 都没切出来时，只有整页解析也确认没有作品才裁剪，否则原样保存。
+    """
+    from parser_folder.blurb_splitter import SCRIPT_RE, balanced_end, split_blurbs
+    from parser_folder.works_extractor import extract_works_data
+
+    body = SCRIPT_RE.sub("", html)
+    parts = []
+
+    heading = _HEADING_RE.search(body)
+    if heading:
+        parts.append(heading.group(0))
+    for pattern, tag in ((_PAGINATION_RE, "ol"),) + (((_FILTERS_RE, "form"),) if keep_filters else ()):
+        m = pattern.search(body)
+        if m:
+            end = balanced_end(body, m.start(), tag)
+            if end < 0:
+                return html
+            parts.append(body[m.start():end])
+
+    blurbs = split_blurbs(body)
+    if blurbs is None:
+        return html
+    if not blurbs and extract_works_data(html, "trim_check", backend=_whole_page_backend()):
+        return html
+    parts.append('<ol class="work index group">\n' + "\n".join(blurbs) + "\n</ol>")
+
+    return ('<!DOCTYPE html>\n<html><head><meta charset="utf-8"></head><body><div id="main">\n'
+            + "\n".join(parts) + "\n</div></body></html>\n")
+
+
+def page_filename(page, fmt="raw"):
+    return f"page_{page}{EXTENSIONS[fmt]}"
+
+
+def logical_name(filename):
+    """page_3.html.gz -> page_3.html；作品的 source_file 始终用这个名字"""
+    m = PAGE_FILE_RE.match(filename)
+    return f"page_{m.group(1)}.html" if m else filename
+
+
+def find_page_file(folder, name):
+    """按逻辑文件名（page_N.html）找到磁盘上实际的文件路径，不存在时返回 None"""
+    for fmt in _READ_ORDER:
+        path = os.path.join(folder, name + EXTENSIONS[fmt][len(".html"):])
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def list_pages(folder):
+    """目录中所有页面的逻辑文件名，按页码排序；同一页有多种格式时只列一次"""
+    pages = set()
+    for filename in os.listdir(folder):
+        m = PAGE_FILE_RE.match(filename)
+        if m:
+            pages.add(int(m.group(1)))
+    return [f"page_{page}.html" for page in sorted(pages)]
+
+
+def read_page_bytes(folder, name):
+    """读取一页（自动解压），返回 UTF-8 字节"""
+    path = find_page_file(folder, name)
+    if path is None:
+        raise FileNotFoundError(os.path.join(folder, name))
+    with open(path, "rb") as f:
+        data = f.read()
+    if path.endswith(".gz"):
+        return gzip.decompress(data)
+    if path.endswith(".zst"):
+        return _zstd().ZstdDecompressor().decompress(data)
+    return data
+
+
+def read_page(folder, name):
+    return read_page_bytes(folder, name).decode("utf-8")
+
+
+def iter_pages(folder, names=None):
+    """逐页读取，产出 (逻辑文件名, HTML)；不会一次把所有页面读进内存"""
+    for name in names if names is not None else list_pages(folder):
+        yield name, read_page(folder, name)
+
+
+class PageStorage:
+    """
+    下载目录的页面存储。
+    fmt: 'raw' / 'gzip' / 'zstd'；trim=True 时只保存分析需要的片段（见 trim_page）
+    保存时删掉同一页其他格式的旧文件，读取不受格式限制。
+    """
+
+    def __init__(self, folder, fmt="gzip", trim=True):
+        if fmt not in STORAGE_FORMATS:
+            raise ValueError(f"不支持的存储格式: {fmt}（可选: {', '.join(STORAGE_FORMATS)}）")
+        if fmt == "zstd":
+            _zstd()
+        self.folder = folder
+        self.fmt = fmt
+        self.trim = trim
+
+    def path(self, page):
+        return os.path.join(self.folder, page_filename(page, self.fmt))
+
+    def exists(self, page):
+        return find_page_file(self.folder, page_filename(page)) is not None
+
+    def read(self, page):
+        return read_page(self.folder, page_filename(page))
+
+    def save(self, page, html):
+        if self.trim:
+            html = trim_page(html, keep_filters=page == 1)
+        data = html.encode("utf-8")
+        if self.fmt == "gzip":
+            # mtime 固定为 0，内容相同的页面压缩结果也相同
+            data = gzip.compress(data, compresslevel=6, mtime=0)
+        elif self.fmt == "zstd":
+            data = _zstd().ZstdCompressor(level=10).compress(data)
+
+        path = self.path(page)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        METRICS.count("pages_saved")
+        METRICS.count("bytes_saved", len(data))
+        self.remove(page, keep=self.fmt)
+        return path
+
+    def remove(self, page, keep=None):
+        """删除这一页所有格式的文件（keep 格式除外）"""
+        for fmt in STORAGE_FORMATS:
+            if fmt != keep:
+                stale = os.path.join(self.folder, page_filename(page, fmt))
+                if os.path.exists(stale):
+                    os.remove(stale)
@@ -0,0 +1,352 @@
+"""
+可选的性能剖析：按阶段记录 cProfile、采样调用栈和内存分配。默认关闭，关闭时每次进入阶段只多一次判断。
+
+    from utils.profiling import PROFILER
+    PROFILER.start("ao3_csv_output/profile")     # 默认三种方式全开，也可只选 modes=("sample",)
+    ...                                          # 被 @PROFILER.profiled(...) 装饰的函数按阶段记录
+    PROFILER.stop()                              # 写出剖析文件
+
+命令行入口用 --profile [MODE ...] 打开（见 add_profile_argument），结果写在输出目录的 profile/ 下。
+剖析的阶段：download_ao3_pages、run_pipeline、analyze_folder、write_csv、create_comparison_report。
+每个阶段写出:
+  <阶段>.pstats         cProfile 结果，可用 python -m pstats 或 snakeviz 查看
+  <阶段>.collapsed.txt  采样得到的折叠调用栈（每行 "线程;外层函数;...;内层函数 次数"），
+                        可直接交给 flamegraph.pl 或 speedscope
+  <阶段>.alloc.txt      tracemalloc：该阶段净分配内存最多的代码行
+  profile_summary.json  各阶段调用次数、耗时、采样数和 Python 内存峰值
+限制:
+  - cProfile 只记录进入阶段的那个线程。阶段嵌套时内层单独记录、外层暂停，所以各 .pstats 互不重复；
+    其他线程同时进入的阶段不记 cProfile（Python 3.12 起同一时间只能有一个 cProfile），采样仍然覆盖它们。
+  - 采样器按墙钟时间采本进程的所有线程（包括在等待网络的抓取线程），样本归到最近进入、尚未结束的阶段。
+    多进程解析时子进程里的解析不会被记录，要剖析解析请用 --workers 1。
+  - tracemalloc 会让分配密集的阶段（解析、导入 pandas）慢数倍，只看耗时时用 --profile cprofile sample；
+    内存峰值是开启追踪后 Python 分配的内存，不是 RSS（RSS 见 run_report.json）。
+"""
+import os
+import sys
+import json
+import time
+import threading
+import functools
+import logging
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("cprofile", "sample", "memory")
+SUMMARY_NAME = "profile_summary.json"
+# 采样间隔（秒）
+DEFAULT_INTERVAL = 0.005
+# .alloc.txt 中列出的代码行数
+TOP_ALLOCATIONS = 50
+# 不计入 .alloc.txt 的文件（剖析器和 tracemalloc 自己的分配，开启 memory 时加入 tracemalloc.py）；
+# 用 Snapshot.filter_traces 过滤要慢得多
+_IGNORED_FILES = {__file__}
+
+
+class _StageRecord:
+    """一个阶段（可能进入多次）累计的剖析数据"""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        self.profile = None
+        self.samples = 0
+        self.stacks = Counter()
+        self.peak_bytes = 0
+        self.net_bytes = 0
+        self.allocations = Counter()
+        self.allocation_counts = Counter()
+
+
+class _ActiveStage:
+    """一次进入阶段的状态"""
+
+    def __init__(self, record):
+        self.record = record
+        self.thread = threading.get_ident()
+        self.start = time.perf_counter()
+        self.cprofile = False
+        self.snapshot = None
+        self.start_bytes = 0
+        self.peak_bytes = 0
+
+
+def _frame_label(code):
+    # 用函数首行而不是当前行，同一个函数的样本才会合并成火焰图上的一个方块
+    label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return label.replace(";", ":")
+
+
+def _collapse(frame, thread_name):
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.append(thread_name.replace(";", ":").replace(" ", "_"))
+    return ";".join(reversed(labels))
+
+
+class StageProfiler:
+    """按阶段记录 cProfile / 采样调用栈 / tracemalloc，一个进程一个实例（通常用模块级的 PROFILER）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._reset()
+
+    def _reset(self):
+        self.folder = None
+        self.modes = ()
+        self.interval = DEFAULT_INTERVAL
+        self._records = {}
+        self._active = []
+        self._cprofile_thread = None
+        self._sampler = None
+        self._stop_sampler = None
+        self._started_tracemalloc = False
+
+    @property
+    def enabled(self):
+        return self.folder is not None
+
+    def start(self, folder, modes=PROFILE_MODES, interval=DEFAULT_INTERVAL):
+        """开始剖析，stop() 时把结果写到 folder"""
+        unknown = set(modes) - set(PROFILE_MODES)
+        if unknown:
+            raise ValueError(f"未知的剖析方式: {', '.join(sorted(unknown))}（可选: {', '.join(PROFILE_MODES)}）")
+        if self.enabled:
+            self.stop()
+        self.folder = folder
+        self.modes = tuple(modes)
+        self.interval = interval
+        if "memory" in self.modes:
+            import tracemalloc
+            _IGNORED_FILES.add(tracemalloc.__file__)
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+        if "sample" in self.modes:
+            self._stop_sampler = threading.Event()
+            self._sampler = threading.Thread(target=self._sample_loop, name="ryf-profiler", daemon=True)
+            self._sampler.start()
+        logger.info(f"性能剖析已开启（{', '.join(self.modes)}），结果将写入 {folder}")
+
+    def stop(self):
+        """停止剖析并写出结果，返回 profile_summary.json 的路径；未开启时返回 None"""
+        if not self.enabled:
+            return None
+        if self._sampler is not None:
+            self._stop_sampler.set()
+            self._sampler.join()
+        path = self._write()
+        if self._started_tracemalloc:
+            import tracemalloc
+            tracemalloc.stop()
+        self._reset()
+        logger.info(f"性能剖析结果已写入 {os.path.dirname(path)}")
+        return path
+
+    @contextmanager
+    def stage(self, name):
+        """把其中的代码记为阶段 name"""
+        if not self.enabled:
+            yield
+            return
+        entry = self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit(entry)
+
+    def profiled(self, name):
+        """装饰器：函数每次调用记为阶段 name；剖析未开启时直接调用"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.stage(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # ---------- 进入 / 退出阶段 ----------
+
+    def _enter(self, name):
+        with self._lock:
+            record = self._records.get(name)
+            if record is None:
+                record = self._records[name] = _StageRecord(name)
+            entry = _ActiveStage(record)
+            if "memory" in self.modes:
+                self._start_memory(entry)
+            self._active.append(entry)
+        if "cprofile" in self.modes:
+            self._start_cprofile(entry)
+        return entry
+
+    def _exit(self, entry):
+        seconds = time.perf_counter() - entry.start
+        if entry.cprofile:
+            self._stop_cprofile(entry)
+        # 比较快照比较慢，不占着锁，采样线程可以继续
+        allocations = self._stop_memory(entry) if entry.snapshot is not None else None
+        with self._lock:
+            self._active.remove(entry)
+            record = entry.record
+            record.calls += 1
+            record.seconds += seconds
+            if allocations is not None:
+                current, peak, diff = allocations
+                record.peak_bytes = max(record.peak_bytes, entry.peak_bytes, peak)
+                record.net_bytes += current - entry.start_bytes
+                for stat in diff:
+                    frame = stat.traceback[0]
+                    if frame.filename in _IGNORED_FILES:
+                        continue
+                    location = f"{frame.filename}:{frame.lineno}"
+                    record.allocations[location] += stat.size_diff
+                    record.allocation_counts[location] += stat.count_diff
+
+    def _start_cprofile(self, entry):
+        stack = getattr(self._local, "cprofile_stack", None)
+        if stack is None:
+            stack = self._local.cprofile_stack = []
+        with self._lock:
+            if self._cprofile_thread not in (None, entry.thread):
+                return
+            self._cprofile_thread = entry.thread
+        if stack:
+            stack[-1].record.profile.disable()
+        record = entry.record
+        if record.profile is None:
+            import cProfile
+            record.profile = cProfile.Profile()
+        try:
+            record.profile.enable()
+        except ValueError as e:
+            # 已经有别的剖析工具（调试器、coverage 等）在运行
+            logger.debug(f"阶段 {record.name} 无法开启 cProfile: {e}")
+            if stack:
+                stack[-1].record.profile.enable()
+            else:
+                with self._lock:
+                    self._cprofile_thread = None
+            return
+        entry.cprofile = True
+        stack.append(entry)
+
+    def _stop_cprofile(self, entry):
+        stack = self._local.cprofile_stack
+        entry.record.profile.disable()
+        stack.remove(entry)
+        if stack:
+            stack[-1].record.profile.enable()
+        else:
+            with self._lock:
+                self._cprofile_thread = None
+
+    def _start_memory(self, entry):
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            return
+        # reset_peak 之后外层阶段看不到之前的峰值，先记下来
+        peak = tracemalloc.get_traced_memory()[1]
+        for active in self._active:
+            active.peak_bytes = max(active.peak_bytes, peak)
+        tracemalloc.reset_peak()
+        entry.snapshot = tracemalloc.take_snapshot()
+        entry.start_bytes = tracemalloc.get_traced_memory()[0]
+
+    @staticmethod
+    def _stop_memory(entry):
+        """返回 (当前内存, 峰值, 与进入时快照的逐行差异)；追踪已经停止时返回 None"""
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            return None
+        current, peak = tracemalloc.get_traced_memory()
+        diff = tracemalloc.take_snapshot().compare_to(entry.snapshot, "lineno")
+        entry.snapshot = None
+        return current, peak, diff
+
+    # ---------- 采样 ----------
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while not self._stop_sampler.wait(self.interval):
+            with self._lock:
+                if not self._active:
+                    continue
+                record = self._active[-1].record
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = [_collapse(frame, names.get(ident, str(ident)))
+                      for ident, frame in sys._current_frames().items() if ident != own]
+            with self._lock:
+                record.samples += 1
+                record.stacks.update(stacks)
+
+    # ---------- 输出 ----------
+
+    def _write(self):
+        os.makedirs(self.folder, exist_ok=True)
+        stages = {}
+        for name, record in self._records.items():
+            files = []
+            if record.profile is not None:
+                path = os.path.join(self.folder, f"{name}.pstats")
+                record.profile.dump_stats(path)
+                files.append(os.path.basename(path))
+            if record.stacks:
+                path = os.path.join(self.folder, f"{name}.collapsed.txt")
+                with open(path, "w", encoding="utf-8") as f:
+                    for stack, count in sorted(record.stacks.items()):
+                        f.write(f"{stack} {count}\n")
+                files.append(os.path.basename(path))
+            if record.allocations:
+                path = os.path.join(self.folder, f"{name}.alloc.txt")
+                self._write_allocations(record, path)
+                files.append(os.path.basename(path))
+            stages[name] = {
+                "calls": record.calls,
+                "seconds": round(record.seconds, 3),
+                "samples": record.samples,
+                "peak_traced_bytes": record.peak_bytes if "memory" in self.modes else None,
+                "net_traced_bytes": record.net_bytes if "memory" in self.modes else None,
+                "files": files,
+            }
+        summary = {"modes": list(self.modes), "interval": self.interval, "stages": stages}
+        path = os.path.join(self.folder, SUMMARY_NAME)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        return path
+
+    @staticmethod
+    def _write_allocations(record, path):
+        top = sorted(record.allocations.items(), key=lambda item: item[1], reverse=True)[:TOP_ALLOCATIONS]
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"# 阶段 {record.name}: 调用 {record.calls} 次，Python 内存峰值 {record.peak_bytes / 1024 / 1024:.1f} MB，"
+                    f"净增加 {record.net_bytes / 1024 / 1024:.1f} MB\n")
+            f.write(f"# 净分配最多的 {len(top)} 行（阶段结束时仍存活的内存）\n")
+            f.write(f"{'KiB':>12} {'块数':>10}  位置\n")
+            for location, size in top:
+                f.write(f"{size / 1024:>12.1f} {record.allocation_counts[location]:>10}  {location}\n")
+
+
+def add_profile_argument(parser):
+    parser.add_argument("--profile", nargs="*", choices=PROFILE_MODES, default=None, metavar="MODE",
+                        help="按阶段剖析性能并写到输出目录的 profile/ 下；"
+                             f"可选 {' / '.join(PROFILE_MODES)}，不写则全部开启")
+
+
+def profile_modes(args):
+    """--profile 的取值：未开启时返回 None"""
+    if args.profile is None:
+        return None
+    return tuple(args.profile) or PROFILE_MODES
+
+
+# 整个进程共用的剖析器；命令行入口用 --profile 时 start()，结束时 stop()
+PROFILER = StageProfiler()